@@ -0,0 +1,66 @@
+"""
+Tests for the change notification transactions.
+"""
+
+import pytest
+
+from wxOpenGL.geometry import notify
+
+
+class _Value(notify.Notifier):
+
+    def __init__(self):
+        self._init_notifier()
+
+    def changed(self):
+        self._process_update()
+
+
+class _Listener:
+
+    def __init__(self, calls, fail=False):
+        self.calls = calls
+        self.fail = fail
+
+    def __call__(self, emitter):
+        self.calls.append(self)
+        if self.fail:
+            raise ValueError('listener failed')
+
+
+def test_listeners_run_after_one_raises():
+    calls = []
+    value = _Value()
+    listeners = [_Listener(calls), _Listener(calls, fail=True), _Listener(calls)]
+
+    for listener in listeners:
+        value.bind(listener)
+
+    with pytest.raises(ValueError):
+        with notify.batch():
+            value.changed()
+
+    assert calls == listeners
+
+    # the transaction is cleaned up, the next change is dispatched again
+    calls.clear()
+    listeners[1].fail = False
+    value.changed()
+    assert calls == listeners
+
+
+def test_deferred_listeners_run_after_one_raises():
+    calls = []
+    value = _Value()
+    listeners = [_Listener(calls, fail=True), _Listener(calls)]
+
+    for listener in listeners:
+        value.bind(listener, deferred=True)
+
+    value.changed()
+    assert calls == []
+
+    with pytest.raises(ValueError):
+        notify.flush_deferred()
+
+    assert calls == listeners
@@ -0,0 +1,130 @@
+"""
+Headless tests for the CPU occlusion culler.
+
+`occlusion` only needs numpy so it is loaded straight from the file, which
+keeps wx and PyOpenGL out of the test.
+"""
+
+import importlib.util
+import math
+import os
+
+import numpy as np
+
+
+_spec = importlib.util.spec_from_file_location(
+    'occlusion', os.path.join(os.path.dirname(__file__), '..', 'wxOpenGL', 'occlusion.py'))
+occlusion = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(occlusion)
+
+
+_WIDTH = 1920
+_HEIGHT = 1080
+
+
+class _Point:
+
+    def __init__(self, x, y, z):
+        self.as_numpy = np.array([x, y, z], dtype=np.float64)
+
+
+class _Renderer:
+    is_opaque = True
+
+    def __init__(self, tris):
+        tris = np.asarray(tris, dtype=np.float64).reshape(-1, 3)
+        self.data = [[tris, np.zeros_like(tris), len(tris)]]
+
+
+class _Object:
+
+    def __init__(self, tris):
+        tris = np.asarray(tris, dtype=np.float64).reshape(-1, 3)
+        mn = tris.min(axis=0)
+        mx = tris.max(axis=0)
+
+        self.rect = [(_Point(*mn), _Point(*mx))]
+        self.triangles = [_Renderer(tris)]
+
+
+def _quad(x0, x1, y0, y1, z):
+    a = [x0, y0, z]
+    b = [x1, y0, z]
+    c = [x1, y1, z]
+    d = [x0, y1, z]
+    return [a, b, c, a, c, d]
+
+
+def _box(x0, x1, y0, y1, z0, z1):
+    # only the front face matters for the test, the box is tested with its
+    # bounding box
+    return _quad(x0, x1, y0, y1, z1) + _quad(x0, x1, y0, y1, z0)
+
+
+def _view_projection():
+    # camera at the origin looking down -z
+    fov = 65.0
+    near = 0.1
+    far = 100.0
+    aspect = _WIDTH / _HEIGHT
+
+    f = 1.0 / math.tan(math.radians(fov) / 2.0)
+    res = np.zeros((4, 4), dtype=np.float64)
+    res[0, 0] = f / aspect
+    res[1, 1] = f
+    res[2, 2] = (far + near) / (near - far)
+    res[2, 3] = 2.0 * far * near / (near - far)
+    res[3, 2] = -1.0
+    return res
+
+
+def _world_per_pixel(distance):
+    return 2.0 * distance * math.tan(math.radians(65.0) / 2.0) / _HEIGHT
+
+
+def _cull(objects):
+    culler = occlusion.OcclusionCuller(256, 128)
+    return culler.cull(objects, _view_projection())
+
+
+def _hidden_box():
+    return _Object(_box(-1.0, 1.0, -1.0, 1.0, -21.0, -20.0))
+
+
+def test_fully_hidden_box_is_culled():
+    # a pixel is only covered when one triangle covers all of it so the
+    # wall is a single triangle, the edge between the 2 triangles of a quad
+    # would leave a line of pixels open
+    wall = _Object([[-40.0, -20.0, -5.0], [40.0, -20.0, -5.0], [0.0, 40.0, -5.0]])
+    box = _hidden_box()
+
+    visible = _cull([wall, box])
+
+    assert wall in visible
+    assert box not in visible
+
+
+def test_box_seen_through_gap_is_kept():
+    pixel = _world_per_pixel(5.0)
+
+    for pixels in (1.0, 2.6, 6.5, 13.0):
+        half = pixel * pixels / 2.0
+        left = _Object(_quad(-20.0, -half, -20.0, 20.0, -5.0))
+        right = _Object(_quad(half, 20.0, -20.0, 20.0, -5.0))
+        box = _hidden_box()
+
+        assert box in _cull([left, right, box]), pixels
+
+
+def test_box_seen_through_thin_slot_is_kept():
+    pixel = _world_per_pixel(5.0)
+
+    for pixels in (1.0, 2.6, 6.5):
+        half = pixel * pixels / 2.0
+        # a slot across a wall that is built from one piece above and one
+        # below it
+        top = _Object(_quad(-20.0, 20.0, half, 20.0, -5.0))
+        bottom = _Object(_quad(-20.0, 20.0, -20.0, -half, -5.0))
+        box = _hidden_box()
+
+        assert box in _cull([top, bottom, box]), pixels
@@ -0,0 +1,245 @@
+"""
+Frame times of the fixed function pipeline against `pipeline.ShaderPipeline`.
+
+The scene is a grid of spheres drawn offscreen with OSMesa, which renders on
+the CPU with llvmpipe, so the numbers can be compared from one machine to
+the next. They are not the numbers a video card gives.
+
+    python -m wxOpenGL.benchmark --objects 2000 --segments 24
+
+`--unique` gives every sphere its own vertices so nothing gets drawn with
+instancing, that is how a scene of parts that are all different behaves.
+
+The benchmark runs in a new process so PyOpenGL can be pointed at OSMesa
+before it gets imported, see `thumbnails`.
+"""
+
+import argparse
+import concurrent.futures
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+
+_WIDTH = 800
+_HEIGHT = 600
+_FIELD_OF_VIEW = 65.0
+
+
+def _make_sphere(segments: int, offset: float) -> tuple[np.ndarray, np.ndarray]:
+    # (N, 3, 3) triangles and normals of a unit sphere
+    theta = np.linspace(0.0, math.pi, segments + 1)
+    phi = np.linspace(0.0, 2.0 * math.pi, segments * 2 + 1) + offset
+
+    t, p = np.meshgrid(theta, phi, indexing='ij')
+    points = np.stack([np.sin(t) * np.cos(p), np.cos(t), np.sin(t) * np.sin(p)], axis=-1)
+
+    a = points[:-1, :-1].reshape(-1, 3)
+    b = points[1:, :-1].reshape(-1, 3)
+    c = points[1:, 1:].reshape(-1, 3)
+    d = points[:-1, 1:].reshape(-1, 3)
+
+    tris = np.concatenate([np.stack([a, b, c], axis=1),
+                           np.stack([a, c, d], axis=1)])
+
+    return tris, tris.copy()
+
+
+def _make_renderers(count: int, segments: int, unique: bool) -> tuple[list, int]:
+    from . import gl_materials as _glm
+    from . import vertex_format as _vertex_format
+    from .objects import base3d as _base3d
+
+    side = int(math.ceil(math.sqrt(count)))
+    renderers = []
+    triangles = 0
+
+    sphere = None
+
+    for i in range(count):
+        if sphere is None or unique:
+            # a small turn makes the vertices of every sphere different
+            tris, nrmls = _make_sphere(segments, i * 1e-3 if unique else 0.0)
+            positions, matrix = _vertex_format.quantize_positions(tris)
+            sphere = (positions, _vertex_format.quantize_normals(nrmls), len(tris) * 3, matrix)
+
+        positions, nrmls, vertex_count, matrix = sphere
+
+        model = np.identity(4, dtype=np.float64)
+        model[3, :3] = ((i % side) - side / 2.0) * 3.0, 0.0, -(i // side) * 3.0
+
+        color = [(i % 7) / 7.0, 0.5, 1.0 - (i % 5) / 5.0, 1.0]
+        renderers.append(_base3d.TriangleRenderer(
+            [[positions, nrmls, vertex_count, matrix @ model]],
+            _glm.PlasticMaterial(color)))
+
+        triangles += vertex_count // 3
+
+    return renderers, triangles
+
+
+def _init_context():
+    from OpenGL import GL
+    from OpenGL import arrays
+    from OpenGL import osmesa
+
+    from .errors import ShaderError
+
+    context = None
+
+    create = getattr(osmesa, 'OSMesaCreateContextAttribs', None)
+    if create is not None:
+        # GLSL 3.30 needs a 3.3 compatibility profile, the default context
+        # is an older version
+        attribs = [osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+                   osmesa.OSMESA_DEPTH_BITS, 24,
+                   osmesa.OSMESA_PROFILE, osmesa.OSMESA_COMPAT_PROFILE,
+                   osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+                   osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+                   0]
+        context = create(attribs, None)
+
+    if not context:
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+
+    if not context:
+        raise ShaderError('unable to create an OSMesa context')
+
+    buffer = arrays.GLubyteArray.zeros((_HEIGHT, _WIDTH, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, _WIDTH, _HEIGHT):
+        raise ShaderError('unable to make the OSMesa context current')
+
+    # the state `Canvas.InitGL` sets up
+    GL.glEnable(GL.GL_DEPTH_TEST)
+    GL.glEnable(GL.GL_LIGHTING)
+    GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+    GL.glEnable(GL.GL_BLEND)
+    GL.glShadeModel(GL.GL_SMOOTH)
+    GL.glColorMaterial(GL.GL_FRONT, GL.GL_AMBIENT_AND_DIFFUSE)
+    GL.glEnable(GL.GL_COLOR_MATERIAL)
+    GL.glEnable(GL.GL_RESCALE_NORMAL)
+
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_DIFFUSE, [0.3, 0.3, 0.3, 1.0])
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_SPECULAR, [0.5, 0.5, 0.5, 1.0])
+    GL.glEnable(GL.GL_LIGHT0)
+
+    GL.glViewport(0, 0, _WIDTH, _HEIGHT)
+
+    return context, buffer
+
+
+def _time_frames(draw, frames: int, warmup: int) -> float:
+    from OpenGL import GL
+
+    def _frame():
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+        draw()
+        GL.glFinish()
+
+    for _ in range(warmup):
+        _frame()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        _frame()
+
+    return (time.perf_counter() - start) / frames
+
+
+def _run(objects: int, segments: int, frames: int, warmup: int, unique: bool) -> dict:
+    from OpenGL import GL
+
+    from . import camera as _camera
+    from . import pipeline as _pipeline
+
+    _context = _init_context()  # NOQA
+
+    renderers, triangles = _make_renderers(objects, segments, unique)
+
+    side = int(math.ceil(math.sqrt(objects)))
+    eye = np.array([0.0, side * 1.5, side * 1.5], dtype=np.float64)
+    center = np.array([0.0, 0.0, -side * 1.5], dtype=np.float64)
+    view = _camera.look_at(eye, center, np.array([0.0, 1.0, 0.0], dtype=np.float64))
+
+    GL.glMatrixMode(GL.GL_PROJECTION)
+    GL.glLoadMatrixd(np.ascontiguousarray(
+        _camera.perspective(_FIELD_OF_VIEW, _WIDTH / _HEIGHT, 0.1, side * 10.0).T))
+    GL.glMatrixMode(GL.GL_MODELVIEW)
+    GL.glLoadMatrixd(np.ascontiguousarray(view.T))
+
+    def _draw_fixed():
+        for renderer in renderers:
+            renderer()
+
+    pipeline = _pipeline.ShaderPipeline()
+
+    def _draw_shaders():
+        pipeline.begin_frame(view, None)
+        pipeline.draw(renderers)
+
+    res = dict(
+        renderer=GL.glGetString(GL.GL_RENDERER).decode('utf-8'),
+        version=GL.glGetString(GL.GL_VERSION).decode('utf-8'),
+        objects=objects,
+        triangles=triangles,
+        fixed=_time_frames(_draw_fixed, frames, warmup)
+    )
+
+    if pipeline.begin_frame(view, None):
+        pipeline.draw_calls = 0
+        res['shaders'] = _time_frames(_draw_shaders, frames, warmup)
+        res['draw_calls'] = pipeline.draw_calls // (frames + warmup)
+    else:
+        res['shaders'] = None
+        res['draw_calls'] = None
+
+    return res
+
+
+def run_benchmark(objects: int = 1000, segments: int = 16, frames: int = 50,
+                  warmup: int = 5, unique: bool = False, platform: str = 'osmesa') -> dict:
+    """
+    Seconds per frame for both pipelines.
+
+    Returns a dict with `fixed` and `shaders` (`None` when the shaders could
+    not be used) along with the OpenGL renderer and the size of the scene.
+    """
+    from . import thumbnails as _thumbnails
+
+    with _thumbnails._Platform(platform):  # NOQA
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            return executor.submit(_run, objects, segments, frames, warmup, unique).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--segments', type=int, default=16)
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--unique', action='store_true')
+    parser.add_argument('--platform', default='osmesa')
+    args = parser.parse_args()
+
+    res = run_benchmark(args.objects, args.segments, args.frames,
+                        unique=args.unique, platform=args.platform)
+
+    print(f'renderer:  {res["renderer"]} ({res["version"]})')
+    print(f'scene:     {res["objects"]} objects, {res["triangles"]} triangles')
+    print(f'fixed:     {res["fixed"] * 1000.0:.2f} ms per frame')
+
+    if res['shaders'] is None:
+        print('shaders:   not supported')
+    else:
+        print(f'shaders:   {res["shaders"] * 1000.0:.2f} ms per frame, '
+              f'{res["draw_calls"]} draw calls '
+              f'({res["fixed"] / res["shaders"]:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
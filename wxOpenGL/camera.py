@@ -174,10 +174,8 @@ Common camera movement terms
 
 from typing import TYPE_CHECKING
 
-import wx
 import math
 from OpenGL import GL
-from OpenGL import GLU
 
 import numpy as np
 
@@ -185,17 +183,56 @@ from .geometry import point as _point
 from .geometry import angle as _angle
 from .geometry import line as _line
 from . import focal_target as _focal_target
-from .wrappers.decimal import Decimal as _decimal
-from . import Config
+from . import occlusion as _occlusion
+from . import config as _config
 from . import debug as _debug
 
 
 if TYPE_CHECKING:
     from . import canvas as _canvas
 
+Config = _config.Config
+
 ZERO_POINT = _point.ZERO_POINT
 
 
+def look_at(eye: np.ndarray, center: np.ndarray, up: np.ndarray) -> np.ndarray:
+    """
+    The same matrix `gluLookAt` makes, for column vectors.
+    """
+    forward = center - eye
+    forward = forward / np.linalg.norm(forward)
+
+    side = np.cross(forward, up)  # NOQA
+    side = side / np.linalg.norm(side)
+
+    up = np.cross(side, forward)  # NOQA
+
+    res = np.identity(4, dtype=np.float64)
+    res[0, :3] = side
+    res[1, :3] = up
+    res[2, :3] = -forward
+    res[:3, 3] = -(res[:3, :3] @ eye)
+
+    return res
+
+
+def perspective(fov: float, aspect: float, z_near: float, z_far: float) -> np.ndarray:
+    """
+    The same matrix `gluPerspective` makes, for column vectors.
+    """
+    f = 1.0 / math.tan(math.radians(fov) / 2.0)
+
+    res = np.zeros((4, 4), dtype=np.float64)
+    res[0, 0] = f / aspect
+    res[1, 1] = f
+    res[2, 2] = (z_far + z_near) / (z_near - z_far)
+    res[2, 3] = (2.0 * z_far * z_near) / (z_near - z_far)
+    res[3, 2] = -1.0
+
+    return res
+
+
 class Camera:
     __doc__ = __doc__
 
@@ -204,10 +241,18 @@ class Camera:
         self._context = canvas.context
 
         self._is_dirty = True
+        # bumped every time the camera moves, anything that caches
+        # something that depends on the view can compare against it.
+        self._version = 0
         self._projection = None
         self._modelview = None
         self._viewport = None
+        # fov, aspect, near, far of the projection, see `SetProjection`
+        self._perspective = None
         self._clip = None
+        # made from the matrices above every time they change
+        self._view_projection = None
+        self._inverse_view_projection = None
         self._up = None
         self._right = None
         self._forward = None
@@ -218,6 +263,13 @@ class Camera:
         self._frustum_planes = None
         self._focal_target = None
 
+        self._occlusion = None
+        self._occlusion_key = None
+        self._occluded = set()
+
+        self._small = set()
+        self._small_objects = []
+
         self._position = _point.Point(0.0, Config.eye_height, 0.0)
 
         self._eye = _point.Point(0.0, Config.eye_height + 100.0, 75.0)
@@ -241,8 +293,14 @@ class Camera:
     def eye(self):
         return self._eye
 
+    @property
+    def version(self) -> int:
+        return self._version
+
     def Reset(self):
-        with self._position and self._eye:
+        # both points are changed in a single transaction so the camera
+        # only gets updated one time
+        with self._position, self._eye:
             self._position.x = 0.0
             self._position.y = Config.eye_height
             self._position.z = 0.0
@@ -251,11 +309,11 @@ class Camera:
             self._eye.y = Config.eye_height + 100.0
             self._eye.z = 75.0
 
-        self._update_camera(None)
-
     def _update_camera(self, _=None):
-        if self._eye.y < Config.ground_height + 0.05:
-            self._eye.y = Config.ground_height + 0.05
+        self._version += 1
+
+        if self._eye.y < Config.floor.ground_height + 0.05:
+            self._eye.y = Config.floor.ground_height + 0.05
             return
 
         if Config.camera.focal_target_visible and self._focal_target is None:
@@ -266,7 +324,7 @@ class Camera:
         if self._context.is_locked:
             self._is_dirty = True
         else:
-            wx.CallAfter(self.canvas.Refresh, False)
+            self.canvas.Refresh(False)
 
     @property
     def orthonormalized_axes(self):  # NOQA
@@ -282,7 +340,7 @@ class Camera:
         return f, r, u
 
     @_debug.logfunc
-    def GetObjectsInView(self, objs: list) -> list:
+    def GetObjectsInView(self, objs: list, sort_transparent: bool = True) -> list:
         if self._clip is None:
             self._is_dirty = True
 
@@ -292,16 +350,27 @@ class Camera:
         planes = self._frustum_planes
         aabb_in_frustum_planes = self._aabb_in_frustum_planes
         res = [
-            [_line.Line(self._eye, obj.position).length(), obj] for obj in objs
+            obj for obj in objs
             if isinstance(obj, _focal_target.FocalPoint) or
             any(aabb_in_frustum_planes(mn.as_float, mx.as_float, planes) for mn, mx in obj.rect)]
 
-        # sort the objects by distance from the camera
-        res = sorted(res, key=lambda o: o[0])
+        if Config.small_features.enabled:
+            res = self._cull_small(res)
+        else:
+            self._small_objects = []
+
+        if Config.occlusion.enabled and len(res) >= Config.occlusion.min_objects:
+            res = self._cull_occluded(res)
 
-        # we need to have the order as far -> near, we also trim off the distance
-        # that was used for saorting
-        res = [res[i][1] for i in range(len(res) - 1, -1, -1)]
+        # when order independent transparency is being used the order of the
+        # translucent objects doesn't matter so there is no need to sort them.
+        if sort_transparent and res:
+            # we need to have the order as far -> near
+            eye = self._eye.as_numpy
+            positions = np.array([obj.position.as_float for obj in res],
+                                 dtype=np.float64)
+            distances = np.linalg.norm(positions - eye, axis=1)
+            res = [res[i] for i in np.argsort(-distances, kind='stable')]
 
         ret = []
         offset = 0
@@ -315,6 +384,88 @@ class Camera:
 
         return ret
 
+    @property
+    def small_objects(self) -> list:
+        """
+        Objects that were left out of the last `GetObjectsInView` because
+        they are too small on screen.
+        """
+        return self._small_objects
+
+    @_debug.logfunc
+    def _cull_small(self, objs: list) -> list:
+        # Objects that end up smaller than the threshold (in pixels) don't get
+        # drawn. Once an object has been culled it has to grow past the
+        # threshold times the hysteresis before it gets drawn again, without
+        # that objects right at the threshold flicker while the camera moves.
+        threshold = Config.small_features.pixel_threshold
+
+        candidates = [obj for obj in objs if obj.rect and not obj.is_selected and
+                      not isinstance(obj, _focal_target.FocalPoint)]
+
+        if threshold <= 0.0 or not candidates:
+            self._small = set()
+            self._small_objects = []
+            return objs
+
+        mn = np.array([np.min([p1.as_numpy for p1, _ in obj.rect], axis=0)
+                       for obj in candidates], dtype=np.float64)
+        mx = np.array([np.max([p2.as_numpy for _, p2 in obj.rect], axis=0)
+                       for obj in candidates], dtype=np.float64)
+
+        # bounding sphere of every object
+        center = (mn + mx) / 2.0
+        radius = np.linalg.norm(mx - mn, axis=1) / 2.0
+
+        depth = -(center @ self._modelview[:3, :3].T + self._modelview[:3, 3])[:, 2]
+        _, _, _, height = [int(item) for item in self._viewport]
+
+        # diameter in pixels, the camera being inside of the sphere counts
+        # as being huge
+        scale = self._projection[1, 1] * height
+        size = np.full(len(candidates), np.inf, dtype=np.float64)
+        outside = depth > radius
+        size[outside] = radius[outside] * scale / depth[outside]
+
+        was_small = np.array([id(obj) in self._small for obj in candidates], dtype=bool)
+        limit = np.where(was_small, threshold * Config.small_features.hysteresis, threshold)
+        small = size < limit
+
+        self._small_objects = [obj for obj, flag in zip(candidates, small) if flag]
+        self._small = {id(obj) for obj in self._small_objects}
+
+        return [obj for obj in objs if id(obj) not in self._small]
+
+    @_debug.logfunc
+    def _cull_occluded(self, objs: list) -> list:
+        # nothing that is hidden changes unless the camera or the scene does
+        key = (self._version, self.canvas.scene_version)
+
+        if key != self._occlusion_key:
+            _, _, vw, vh = [int(item) for item in self._viewport]
+            width = Config.occlusion.resolution
+            height = max(1, int(round(width * vh / max(vw, 1))))
+
+            culler = self._occlusion
+            if culler is None:
+                culler = _occlusion.OcclusionCuller(width, height)
+                self._occlusion = culler
+
+            culler.width = width
+            culler.height = height
+            culler.max_occluders = Config.occlusion.max_occluders
+            culler.occluder_triangles = Config.occlusion.occluder_triangles
+
+            visible = culler.cull(
+                objs, self._clip,
+                lambda obj: isinstance(obj, _focal_target.FocalPoint))
+
+            visible = {id(obj) for obj in visible}
+            self._occluded = {id(obj) for obj in objs if id(obj) not in visible}
+            self._occlusion_key = key
+
+        return [obj for obj in objs if id(obj) not in self._occluded]
+
     @staticmethod
     @_debug.logfunc
     def _aabb_in_frustum_planes(mn_xyz, mx_xyz, planes: np.ndarray) -> bool:
@@ -437,11 +588,40 @@ class Camera:
         # none of the AABBs intersect
         return False
 
-    def Set(self):
+    def Set(self, update_views: bool = True):
+        """
+        Multiply the view onto the current matrix.
+
+        `update_views=False` leaves the matrices the camera culls with alone,
+        that is used when drawing into offscreen buffers that have a
+        different projection than the canvas.
+        """
         self._calculate_camera()
-        camera = self._eye.as_float + self._position.as_float + tuple(self._up.tolist())
-        GLU.gluLookAt(*camera)
-        self._update_views()
+
+        # OpenGL wants the matrix in column-major order
+        GL.glMultMatrixd(np.ascontiguousarray(self._look_at().T))
+
+        if update_views:
+            self._update_views()
+
+    def SetProjection(self, fov: float, aspect: float, z_near: float, z_far: float):
+        """
+        Load a perspective projection into the current matrix.
+
+        The camera keeps the values so it can make the projection matrix
+        itself when it needs it.
+        """
+        values = (float(fov), float(aspect), float(z_near), float(z_far))
+
+        if values != self._perspective:
+            self._perspective = values
+            self._version += 1
+            self._is_dirty = True
+
+        GL.glLoadMatrixd(np.ascontiguousarray(perspective(*values).T))
+
+    def _look_at(self) -> np.ndarray:
+        return look_at(self._eye.as_numpy, self._position.as_numpy, self._up)
 
     @_debug.logfunc
     def _calculate_camera(self):
@@ -503,14 +683,27 @@ class Camera:
         if not self._is_dirty:
             return
 
+        if self._perspective is None:
+            # the canvas hasn't set up the projection yet
+            return
+
+        # the matrices are made here instead of being read back from
+        # OpenGL, nothing in here needs a context
         self._calculate_camera()
-        with self._context:
-            self._is_dirty = False
-            self._viewport = np.ascontiguousarray(GL.glGetIntegerv(GL.GL_VIEWPORT))
-            self._projection = np.ascontiguousarray(np.array(GL.glGetDoublev(GL.GL_PROJECTION_MATRIX)).reshape((4, 4), order="F").T)
-            self._modelview = np.ascontiguousarray(np.array(GL.glGetDoublev(GL.GL_MODELVIEW_MATRIX)).reshape((4, 4), order="F").T)
-            self._clip = (self._projection @ self._modelview).astype(np.float32)
-            self._frustum_planes = self._extract_frustum_planes(self._clip)
+        self._is_dirty = False
+
+        if self.canvas.size is None:
+            width, height = self.canvas.GetSize() * self.canvas.GetContentScaleFactor()
+        else:
+            width, height = self.canvas.size
+
+        self._viewport = np.array([0, 0, width, height], dtype=np.int32)
+        self._projection = perspective(*self._perspective)
+        self._modelview = self._look_at()
+        self._view_projection = self._projection @ self._modelview
+        self._inverse_view_projection = None
+        self._clip = self._view_projection.astype(np.float32)
+        self._frustum_planes = self._extract_frustum_planes(self._clip)
 
     @_debug.logfunc
     def Rotate(self, dx, dy):
@@ -653,7 +846,7 @@ class Camera:
         move = move_dir * (input_mag * speed)
 
         self._is_dirty = True
-        with self._eye and self._position:
+        with self._eye, self._position:
             self._eye += move
             self._position += move
 
@@ -679,82 +872,122 @@ class Camera:
 
         move = move_dir * (input_mag * speed)
 
-        with self._eye:
+        self._is_dirty = True
+        with self._eye, self._position:
             self._eye += move
+            self._position += move
+
+    @property
+    def viewport(self) -> np.ndarray:
+        """
+        x, y, width, height of the viewport the matrices were made for.
+        """
+        return self._viewport
+
+    @property
+    def view_matrix(self) -> np.ndarray:
+        return self._modelview
+
+    @property
+    def projection_matrix(self) -> np.ndarray:
+        return self._projection
+
+    @property
+    def view_projection_matrix(self) -> np.ndarray:
+        """
+        projection @ view, for column vectors.
+        """
+        return self._view_projection
+
+    @property
+    def inverse_view_projection_matrix(self) -> np.ndarray:
+        # only made when something unprojects, most frames never do
+        if self._inverse_view_projection is None and self._view_projection is not None:
+            self._inverse_view_projection = np.linalg.inv(self._view_projection)
+
+        return self._inverse_view_projection
 
+    def ViewportChanged(self):
+        """
+        Called by the canvas when the size of the viewport changes, the
+        projection changes along with it.
+        """
+        self._version += 1
         self._is_dirty = True
-        self._position += move
 
-    @_debug.logfunc
-    def ProjectPoint(self, point: _point.Point) -> _point.Point:
+    def project_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Project (..., 3) world points to (..., 3) window coordinates.
 
-        # Step 1: Convert to homogeneous world position (4D vector)
-        # Add W=1 for homogeneous coords
-        world_point = np.array([point.x, point.y, point.z, 1.0])
+        x and y have the origin at the top left, z is the depth from 0 to 1.
+        Points that are on the plane of the camera come back as nan.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        matrix = self._view_projection
 
-        # Step 2: Transform to view space using the modelview matrix
-        view_point = np.dot(self._modelview, world_point)  # World space → View space
+        clip = points @ matrix[:3, :3].T + matrix[:3, 3]
+        w = points @ matrix[3, :3] + matrix[3, 3]
 
-        # Step 3: Transform to clip space using the projection matrix
-        clip_point = np.dot(self._projection, view_point)  # View space → Clip space
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ndc = clip / np.where(w == 0.0, np.nan, w)[..., None]
 
-        # Perspective division: Normalize by the W component
-        if clip_point[3] == 0.0:
-            raise ValueError("Perspective division failed (W=0 in clip space).")
+        vx, vy, vw, vh = (float(item) for item in self._viewport)
+
+        res = np.empty_like(ndc)
+        res[..., 0] = vx + (ndc[..., 0] + 1.0) * 0.5 * vw
+        res[..., 1] = vy + (1.0 - ndc[..., 1]) * 0.5 * vh
+        res[..., 2] = (ndc[..., 2] + 1.0) * 0.5
 
-        # Normalize X, Y, Z by W in clip space
-        ndc_point = clip_point[:3] / clip_point[3]
+        return res
 
-        # Step 4: Map from NDC [-1, 1] to screen space (viewport mapping)
-        # Map X
-        screen_x = (_decimal(self._viewport[0]) +
-                    ((_decimal(ndc_point[0]) + _decimal(1.0)) *
-                     _decimal(0.5) * _decimal(self._viewport[2])))
+    def unproject_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        The opposite of `project_points`, (..., 3) window coordinates with
+        the depth in z to (..., 3) world points.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        vx, vy, vw, vh = (float(item) for item in self._viewport)
 
-        # Map Y
-        screen_y = (_decimal(self._viewport[1]) +
-                    ((_decimal(1.0) - _decimal(ndc_point[1])) *
-                     _decimal(0.5) * _decimal(self._viewport[3])))
+        ndc = np.empty(points.shape[:-1] + (4,), dtype=np.float64)
+        ndc[..., 0] = (points[..., 0] - vx) / vw * 2.0 - 1.0
+        ndc[..., 1] = (vh - points[..., 1] - vy) / vh * 2.0 - 1.0
+        ndc[..., 2] = points[..., 2] * 2.0 - 1.0
+        ndc[..., 3] = 1.0
 
-        # Map Z from [-1, 1] to [0, 1]
-        screen_z = (_decimal(ndc_point[2]) + _decimal(1.0)) * _decimal(0.5)
+        world = ndc @ self.inverse_view_projection_matrix.T
 
-        # Step 5: Return the screen-space coordinates
-        return _point.Point(screen_x, screen_y, screen_z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return world[..., :3] / np.where(world[..., 3] == 0.0, np.nan, world[..., 3])[..., None]
+
+    def screen_ray(self, x: float, y: float) -> tuple[np.ndarray, np.ndarray] | tuple[None, None]:
+        """
+        World space origin and unit direction of the ray under a window
+        position (top left origin). `None, None` if there isn't one.
+        """
+        near, far = self.unproject_points(np.array([[x, y, 0.0], [x, y, 1.0]], dtype=np.float64))
+
+        direction = far - near
+        length = np.linalg.norm(direction)
+
+        if not np.isfinite(length) or length < 1e-12:
+            return None, None
+
+        return near, direction / length
+
+    @_debug.logfunc
+    def ProjectPoint(self, point: _point.Point) -> _point.Point:
+        res = self.project_points(np.array(point.as_float, dtype=np.float64))
+
+        if np.isnan(res[0]):
+            raise ValueError("Perspective division failed (W=0 in clip space).")
+
+        return _point.Point(*res.tolist())
 
     @_debug.logfunc
     def UnprojectPoint(self, point: _point.Point) -> _point.Point:
-        # Step 1: Map screen space [x, y, z] to normalized device coordinates (NDC)
-        ndc_x = ((_decimal(point.x) - _decimal(self._viewport[0])) /
-                 _decimal(self._viewport[2]) * _decimal(2.0) - _decimal(1.0))
-
-        # ndc_y = ((_decimal(point.y) - _decimal(self._viewport[1])) /
-        #          _decimal(self._viewport[3]) * _decimal(2.0) - _decimal(1.0))
-        ndc_y = ((_decimal(self._viewport[3]) -
-                  _decimal(point.y) -
-                  _decimal(self._viewport[1])) /
-                 _decimal(self._viewport[3]) * _decimal(2.0) - _decimal(1.0))
-
-        # Depth is mapped [0, 1] → [-1, 1]
-        ndc_z = _decimal(point.z) * _decimal(2.0) - _decimal(1.0)
-        # Homogeneous NDC
-        ndc_point = np.array([float(ndc_x), float(ndc_y), float(ndc_z), 1.0])
-
-        # Step 2: Compute the inverse of the projection * modelview matrix
-        # Combine projection and modelview
-        clip_matrix = np.dot(self._projection, self._modelview)
-
-        # Invert the combined matrix
-        inverse_clip_matrix = np.linalg.inv(clip_matrix)
-
-        # Step 3: Transform from NDC to clip space
-        clip_point = np.dot(inverse_clip_matrix, ndc_point)
-
-        # Step 4: Perspective division to get world-space coordinates
-        if clip_point[3] == 0.0:
+        res = self.unproject_points(np.array(point.as_float, dtype=np.float64))
+
+        if np.isnan(res[0]):
             raise ValueError("Perspective division failed (W=0 in clip space).")
 
-        # Normalize by W in homogeneous space
-        world_coords = clip_point[:3] / clip_point[3]
-        # Return unprojected world-space coordinates
-        return _point.Point(*world_coords)
+        return _point.Point(*res.tolist())
@@ -5,19 +5,34 @@ import wx
 import numpy as np
 from wx import glcanvas
 from OpenGL import GL
-from OpenGL import GLU
 from PIL import Image
 import ctypes
 
 
 from .geometry import point as _point
+from .geometry import notify as _notify
 from . import headlight as _headlight
+from . import oit as _oit
+from . import pipeline as _pipeline
+from . import reflection as _reflection
+from . import frame_cache as _frame_cache
+from . import selection as _selection
+from . import object_picker as _object_picker
+from . import frame_scheduler as _frame_scheduler
+from . import scene as _scene
+from . import tessellation as _tessellation
 from . import debug as _debug
 from .config import Config
 from .config import MOUSE_REVERSE_Y_AXIS
 from .config import MOUSE_REVERSE_X_AXIS
 
 
+# vertical field of view of the camera in degrees
+FIELD_OF_VIEW = 65.0
+# near and far clipping planes
+Z_NEAR = 0.1
+Z_FAR = 1000.0
+
 def _pil_image_2_wx_bitmap(img: Image.Image) -> wx.Bitmap:
     rgb_data = img.convert('RGB').tobytes()
     alpha_data = img.convert('RGBA').tobytes()[3::4]
@@ -106,7 +121,8 @@ class Canvas(glcanvas.GLCanvas):
     possible objects that might exist which would impact the program performance
     if it is done on the same core that the UI is running on.
     """
-    def __init__(self, parent, size=wx.DefaultSize, pos=wx.DefaultPosition):
+    def __init__(self, parent, size=wx.DefaultSize, pos=wx.DefaultPosition,
+                 scene: _scene.Scene | None = None, share: Self | None = None):
         glcanvas.GLCanvas.__init__(self, parent, -1, size=size, pos=pos)
 
         self._view_offset = None
@@ -114,8 +130,22 @@ class Canvas(glcanvas.GLCanvas):
         from . import context as _context
         from . import camera as _camera
 
+        if scene is None:
+            if share is None:
+                scene = _scene.Scene()
+            else:
+                scene = share.scene
+
+        # objects that only this canvas renders (the focal target)
+        self._local_objects = []
+        self._local_version = 0
+        self._scene = scene
+        self._ref_count = 0
+
         self._init = False
-        self.context = _context.GLContext(self)
+        self._scheduler = _frame_scheduler.FrameScheduler(self)
+        self.context = _context.GLContext(self, None if share is None else share.context)
+        scene.attach(self)
         self.camera = _camera.Camera(self)
         self._angle_overlay = None
 
@@ -124,10 +154,15 @@ class Canvas(glcanvas.GLCanvas):
         self.Bind(wx.EVT_SIZE, self._on_size)
         self.Bind(wx.EVT_PAINT, self._on_paint)
         self.Bind(wx.EVT_ERASE_BACKGROUND, self._on_erase_background)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self._on_destroy)
 
         self._selected = None
-        self._objects = []
-        self._ref_count = 0
+        # everything that is selected, `selected` is only set when there is
+        # a single object selected
+        self._selection = []
+        self._selector = _selection.Selector(self)
+        self._picker = _object_picker.PickCache(self)
+        self._selection_tool: _selection.SelectionTool = None
         self.grid_data = None
         self.grid_lines_stipple = None
         self.grid_lines_solid = None
@@ -136,10 +171,18 @@ class Canvas(glcanvas.GLCanvas):
 
         from . import key_handler as _key_handler
         from . import mouse_handler as _mouse_handler
+        from . import hover_picker as _hover_picker
 
+        self._hover_picker = _hover_picker.HoverPicker(self)
         self._key_handler = _key_handler.KeyHandler(self)
         self._mouse_handler = _mouse_handler.MouseHandler(self)
         self._headlight: _headlight.Headlight = None
+        self._oit = _oit.OITRenderer()
+        self._pipeline = _pipeline.ShaderPipeline(self.context.resources)
+        self._reflection = _reflection.FloorReflection(self)
+        self._frame_cache = _frame_cache.FrameCache(self)
+        # `capture.FrameRecorder` objects that read back every frame
+        self._recorders = []
 
         font = self.GetFont()
         font.SetPointSize(15)
@@ -185,6 +228,68 @@ class Canvas(glcanvas.GLCanvas):
     @selected.setter
     def selected(self, value):
         self._selected = value
+        self._selection = [] if value is None else [value]
+
+    @property
+    def selection(self) -> list:
+        return self._selection[:]
+
+    @property
+    def selector(self) -> _selection.Selector:
+        return self._selector
+
+    @property
+    def picker(self) -> _object_picker.PickCache:
+        return self._picker
+
+    @property
+    def selection_tool(self) -> _selection.SelectionTool | None:
+        return self._selection_tool
+
+    @selection_tool.setter
+    def selection_tool(self, value: _selection.SelectionTool | None):
+        self._selection_tool = value
+        self.InvalidateLocal()
+        self.Refresh(False)
+
+    @_debug.logfunc
+    def SetSelection(self, objects: list, add: bool = False):
+        """
+        Select a group of objects.
+
+        Anything that was selected and isn't in `objects` gets unselected
+        unless `add` is set. The materials are all changed before the scene
+        gets invalidated a single time.
+        """
+        objects = list(objects)
+
+        if add:
+            current = {id(obj) for obj in self._selection}
+            objects = self._selection + [obj for obj in objects if id(obj) not in current]
+
+        keep = {id(obj) for obj in objects}
+
+        for obj in self._selection:
+            if id(obj) not in keep:
+                obj.set_selected(False, invalidate=False)
+
+        for obj in objects:
+            if not obj.is_selected:
+                obj.set_selected(True, invalidate=False)
+
+        self._selection = objects
+        self._selected = objects[0] if len(objects) == 1 else None
+
+        self.InvalidateScene()
+        self.Refresh(False)
+
+        from . import mouse_handler as _mouse_handler
+
+        event = _mouse_handler.GLSelectionEvent(_mouse_handler.wxEVT_GL_SELECTION_CHANGED)
+        event.SetId(self.GetId())
+        event.SetEventObject(self)
+        event.SetGLObjects(objects[:])
+        self.GetEventHandler().ProcessEvent(event)
 
     @classmethod
     def GetViewSize(cls) -> _point.Point:
@@ -212,19 +317,62 @@ class Canvas(glcanvas.GLCanvas):
 
         return _point.Point(Config.virtual_canvas.width, Config.virtual_canvas.height)
 
+    @property
+    def scene(self) -> _scene.Scene:
+        return self._scene
+
+    @property
+    def objects(self) -> list:
+        """
+        Everything this canvas renders, canvas local objects first.
+        """
+        if self._local_objects:
+            return self._local_objects + self._scene.objects
+
+        return self._scene.objects
+
+    # kept for the code that reaches into the canvas for the object list
+    _objects = objects
+
+    @property
+    def scene_version(self) -> int:
+        return self._scene.version + self._local_version
+
+    def InvalidateScene(self):
+        """
+        Tells the canvas that something in the scene has changed.
+
+        Anything that gets cached between frames (the floor reflection) is
+        rendered again the next time the canvas is drawn. Every canvas that
+        shares the scene is invalidated.
+        """
+        self._scene.InvalidateScene()
+
+    def InvalidateLocal(self):
+        """
+        Same as `InvalidateScene` but only for this canvas.
+
+        Used by objects that only get drawn in this canvas.
+        """
+        self._local_version += 1
+
     def AddObject(self, obj):
-        with self:
-            self._objects.insert(0, obj)
+        if getattr(obj, 'canvas_local', False):
+            with self:
+                self._local_objects.insert(0, obj)
 
-        self.Refresh(False)
+            self.InvalidateLocal()
+            self.Refresh(False)
+        else:
+            self._scene.AddObject(obj)
 
     def RemoveObject(self, obj):
-        try:
-            self._objects.remove(obj)
-        except:  # NOQA
-            return
-
-        self.Refresh(False)
+        if obj in self._local_objects:
+            self._local_objects.remove(obj)
+            self.InvalidateLocal()
+            self.Refresh(False)
+        else:
+            self._scene.RemoveObject(obj)
 
     def __enter__(self) -> Self:
         self._ref_count += 1
@@ -234,10 +382,27 @@ class Canvas(glcanvas.GLCanvas):
         self._ref_count -= 1
 
     def Refresh(self, *args, **kwargs):
+        # the refresh requests are coalesced and paced by the frame
+        # scheduler, this is safe to call from any thread.
         if self._ref_count:
             return
 
-        glcanvas.GLCanvas.Refresh(self, *args, **kwargs)
+        self._scheduler.request()
+
+    @property
+    def scheduler(self) -> _frame_scheduler.FrameScheduler:
+        return self._scheduler
+
+    @property
+    def hover_picker(self):
+        return self._hover_picker
+
+    @property
+    def hovered(self):
+        """
+        The object that is under the mouse, `None` if there isn't one.
+        """
+        return self._hover_picker.hovered
 
     @_debug.logfunc
     def TruckPedestal(self, dx: float, dy: float) -> None:
@@ -307,6 +472,14 @@ class Canvas(glcanvas.GLCanvas):
         dy *= sens
         self.camera.PanTilt(dx, dy)
 
+    def _on_destroy(self, evt):
+        if evt.GetEventObject() is self:
+            self._scheduler.stop()
+            self._hover_picker.stop()
+            self._scene.detach(self)
+
+        evt.Skip()
+
     def _on_erase_background(self, _):
         pass
 
@@ -319,16 +492,20 @@ class Canvas(glcanvas.GLCanvas):
         with self.context:
             GL.glViewport(0, 0, width, height)
 
+        self.camera.ViewportChanged()
+        self._frame_cache.invalidate()
+
     @_debug.logfunc
     def _on_paint(self, _):
         pdc = wx.PaintDC(self)
+        requested = self._scheduler.begin_frame()
 
         with self.context:
             if not self._init:
                 self.InitGL()
                 self._init = True
 
-            self.OnDraw()
+            self.OnDraw(requested)
 
             if self._angle_overlay_bitmap.IsOk():
                 w, h = self._angle_overlay_bitmap.GetSize()
@@ -411,16 +588,18 @@ class Canvas(glcanvas.GLCanvas):
         GL.glMaterialf(GL.GL_FRONT, GL.GL_SHININESS, 80.0)
 
         GL.glEnable(GL.GL_LIGHT0)
-        self.camera.Set()
 
         w, h = self.GetSize()
 
         aspect = w / float(h)
 
+        # the camera needs the projection before it can make its matrices
         GL.glMatrixMode(GL.GL_PROJECTION)
-        GLU.gluPerspective(65, aspect, 0.1, 1000.0)
+        self.camera.SetProjection(FIELD_OF_VIEW, aspect, Z_NEAR, Z_FAR)
         GL.glMatrixMode(GL.GL_MODELVIEW)
 
+        self.camera.Set()
+
         def _do():
             self.camera.Zoom(1.0)
 
@@ -747,13 +926,20 @@ class Canvas(glcanvas.GLCanvas):
                 GL.glVertex3f(x2, y2, z2)
                 GL.glEnd()
 
-    @staticmethod
     @_debug.logfunc
-    def draw_scene(objects):
-        for obj in objects:
-            for renderer in obj.triangles:
+    def draw_scene(self, objects):
+        renderers = [renderer for obj in objects for renderer in obj.triangles]
+
+        if not (self._use_shaders and self._pipeline.draw(renderers)):
+            for renderer in renderers:
                 renderer()
 
+        self.draw_selection_outlines(objects)
+
+    @staticmethod
+    @_debug.logfunc
+    def draw_selection_outlines(objects):
+        for obj in objects:
             if obj.is_selected and obj.rect:
                 GL.glColor4f(1.0, 0.4, 0.4, 1.0)
                 GL.glLineWidth(2.0)
@@ -773,16 +959,165 @@ class Canvas(glcanvas.GLCanvas):
                 GL.glVertex3f(p1.x, 0.20, p1.z)
                 GL.glEnd()
 
+    # corners of a bounding box are ordered x, y, z with z changing the
+    # fastest, these are the pairs that make up the 12 edges.
+    _BOX_EDGES = np.array([0, 1, 2, 3, 4, 5, 6, 7, 0, 2, 1, 3,
+                           4, 6, 5, 7, 0, 4, 1, 5, 2, 6, 3, 7], dtype=np.int32)
+
+    @staticmethod
+    @_debug.logfunc
+    def _draw_small_objects(objects):
+        # stand ins for the objects that are too small on screen to be drawn
+        mode = Config.small_features.mode
+        if not objects or mode not in ('point', 'box'):
+            return
+
+        colors = [obj.triangles[0].material.color if obj.triangles else (1.0, 1.0, 1.0, 1.0)
+                  for obj in objects]
+
+        if mode == 'point':
+            vertices = np.array([(p1.as_numpy + p2.as_numpy) / 2.0
+                                 for p1, p2 in (obj.rect[0] for obj in objects)],
+                                dtype=np.float64)
+            colors = np.array(colors, dtype=np.float32)
+            primitive = GL.GL_POINTS
+        else:
+            vertices = np.concatenate([bb[Canvas._BOX_EDGES] for obj in objects
+                                       for bb in obj.bb]).astype(np.float64)
+            colors = np.repeat(np.array([color for obj, color in zip(objects, colors)
+                                         for _ in obj.bb], dtype=np.float32),
+                               len(Canvas._BOX_EDGES), axis=0)
+            primitive = GL.GL_LINES
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_POINT_BIT | GL.GL_LINE_BIT | GL.GL_CURRENT_BIT)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glPointSize(2.0)
+        GL.glLineWidth(1.0)
+
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+        GL.glVertexPointer(3, GL.GL_DOUBLE, 0, vertices)
+        GL.glColorPointer(4, GL.GL_FLOAT, 0, colors)
+        GL.glDrawArrays(primitive, 0, len(vertices))
+        GL.glDisableClientState(GL.GL_COLOR_ARRAY)
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
+        GL.glPopAttrib()
+
+    @_debug.logfunc
+    def _draw_hover(self, objects):
+        obj = self._hover_picker.hovered
+        if obj is None or not obj.bb or obj not in objects:
+            return
+
+        vertices = np.concatenate([bb[self._BOX_EDGES] for bb in obj.bb]).astype(np.float64)
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_LINE_BIT | GL.GL_CURRENT_BIT)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glLineWidth(2.0)
+        GL.glColor4f(*Config.hover.color)
+
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glVertexPointer(3, GL.GL_DOUBLE, 0, vertices)
+        GL.glDrawArrays(GL.GL_LINES, 0, len(vertices))
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
+        GL.glPopAttrib()
+
+    @property
+    def _use_oit(self) -> bool:
+        return Config.transparency.order_independent and self._oit.is_supported
+
+    @property
+    def _use_shaders(self) -> bool:
+        return Config.rendering.shaders and self._pipeline.is_supported
+
+    @_debug.logfunc
+    def _draw_objects(self, objects):
+        if not self._use_oit:
+            self.draw_scene(objects)
+            return
+
+        opaque = []
+        translucent = []
+
+        for obj in objects:
+            for renderer in obj.triangles:
+                if renderer.is_opaque:
+                    opaque.append(renderer)
+                else:
+                    translucent.append((obj, renderer))
+
+        # the OIT shader gets the material and the lights from the fixed
+        # function state so only the opaque objects can use the pipeline
+        if not (self._use_shaders and self._pipeline.draw(opaque)):
+            for renderer in opaque:
+                renderer()
+
+        def _draw_translucent():
+            for _, r in translucent:
+                r()
+
+        if translucent and not self._oit.render(_draw_translucent):
+            # OIT isn't supported on this machine. Draw them the old way,
+            # the objects were not sorted by the camera because OIT was
+            # expected so they get sorted far -> near here.
+            eye = self.camera.eye.as_numpy
+            positions = np.array([obj.position.as_float for obj, _ in translucent],
+                                 dtype=np.float64)
+            distances = np.linalg.norm(positions - eye, axis=1)
+            translucent = [translucent[i] for i in np.argsort(-distances, kind='stable')]
+            _draw_translucent()
+
+        self.draw_selection_outlines(objects)
+
     @_debug.logfunc
-    def OnDraw(self):
+    def _draw_reflection(self, objects):
+        ground_height = Config.floor.ground_height
+
+        GL.glPushMatrix()
+
+        # Reflect across the floor plane (flip the Y-axis)
+        GL.glTranslatef(0.0, ground_height, 0.0)
+        GL.glScalef(1.0, -1.0, 1.0)
+        GL.glTranslatef(0.0, -ground_height, 0.0)
+
+        # Enable clipping to avoid rendering below the floor
+        GL.glEnable(GL.GL_CLIP_PLANE0)
+        clipping_plane = [0.0, 1.0, 0.0, -ground_height]  # Clipping plane: y >= ground_height
+        GL.glClipPlane(GL.GL_CLIP_PLANE0, clipping_plane)
+        self._draw_objects(objects)
+        GL.glDisable(GL.GL_CLIP_PLANE0)
+        GL.glPopMatrix()
+
+    @_debug.logfunc
+    def OnDraw(self, requested: bool = True):
+        # listeners that only need to be current when a frame is drawn
+        _notify.flush_deferred()
+
         with self.context:
             w, h = self.GetSize()
+
+            # the back buffer is in physical pixels, the logical size is
+            # only used for the aspect ratio
+            if self.size is None:
+                width, height = self.GetSize() * self.GetContentScaleFactor()
+            else:
+                width, height = self.size
+
+            key = self._frame_cache.make_key(int(width), int(height))
+
+            # nothing has changed since the last frame, the window only
+            # needs the pixels put back
+            if not requested and self._frame_cache.present(key):
+                self.SwapBuffers()
+                return
+
             aspect = w / float(h)
 
             GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
             GL.glMatrixMode(GL.GL_PROJECTION)
-            GL.glLoadIdentity()
-            GLU.gluPerspective(65, aspect, 0.1, 1000.0)
+            self.camera.SetProjection(FIELD_OF_VIEW, aspect, Z_NEAR, Z_FAR)
 
             GL.glMatrixMode(GL.GL_MODELVIEW)
             GL.glLoadIdentity()
@@ -794,28 +1129,48 @@ class Canvas(glcanvas.GLCanvas):
             elif not Config.headlight and self._headlight is not None:
                 self._headlight = None
 
-            if self._headlight is not None:
-                self._headlight()
+            objs = self.camera.GetObjectsInView(self._objects, not self._use_oit)
+            _tessellation.update(self, objs, h, FIELD_OF_VIEW)
 
-            GL.glPushMatrix()
+            self.draw_frame(objs)
 
-            # Reflect across the y = 0 plane (flip the Y-axis)
-            GL.glScalef(1.0, -1.0, 1.0)
+            if self._selection_tool is not None:
+                self._selection_tool.draw(w, h)
 
-            # Enable clipping to avoid rendering below the floor
-            GL.glEnable(GL.GL_CLIP_PLANE0)
-            clipping_plane = [0.0, 1.0, 0.0, 0.0]  # Clipping plane: y >= 0
-            GL.glClipPlane(GL.GL_CLIP_PLANE0, clipping_plane)
-            objs = self.camera.GetObjectsInView(self._objects)
-            self.draw_scene(objs)
-            GL.glDisable(GL.GL_CLIP_PLANE0)
-            GL.glPopMatrix()
+            self._frame_cache.store(key)
 
-            GL.glPushMatrix()
-            objs = self.camera.GetObjectsInView(self._objects)
-            self.DrawGrid()
-            self.draw_scene(objs)
-            # self._render_bounding_boxes()
-            GL.glPopMatrix()
+            for recorder in self._recorders[:]:
+                recorder.capture()
 
             self.SwapBuffers()
+
+    @_debug.logfunc
+    def draw_frame(self, objs: list):
+        """
+        Draw the lighting, the floor, the grid and `objs`.
+
+        The projection and the camera need to be set before this gets called.
+        The frame isn't cleared and the buffers are not swapped, this is what
+        gets used to draw into offscreen buffers as well.
+        """
+        if self._headlight is not None:
+            self._headlight()
+
+        if self._use_shaders:
+            self._pipeline.begin_frame(self.camera.view_matrix, self._headlight)
+
+        if Config.floor.reflections and not self._reflection.update(objs):
+            # rendering to a texture is not supported, draw the mirrored
+            # scene straight into the frame like it used to be done.
+            self._draw_reflection(objs)
+
+        GL.glPushMatrix()
+        if Config.floor.reflections:
+            self._reflection.draw()
+
+        self.DrawGrid()
+        self._draw_objects(objs)
+        self._draw_small_objects(self.camera.small_objects)
+        self._draw_hover(objs)
+        # self._render_bounding_boxes()
+        GL.glPopMatrix()
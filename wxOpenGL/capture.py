@@ -0,0 +1,499 @@
+"""
+Reading frames back from the video card.
+
+Screenshots
+    `screenshot` renders the scene into an offscreen framebuffer, the image
+    can be larger than the window. Images that are larger than
+    `Config.capture.tile_size` get rendered in tiles, every tile uses the
+    part of the view frustum that it covers so the tiles line up without any
+    seams. `save_screenshot` does the same thing and then encodes and saves
+    the image in a worker thread.
+
+Recording
+    `FrameRecorder` reads back every frame the canvas draws. `glReadPixels`
+    into client memory waits for the video card to finish the frame, that
+    stalls the render thread every single frame. The recorder reads into a
+    pair of pixel buffer objects instead. A frame is read into one buffer
+    while the other one, which holds the previous frame and has had a whole
+    frame of time to finish, gets mapped and copied out. The copies are
+    handed to a worker thread that does the encoding and saving.
+
+    recorder = wxOpenGL.FrameRecorder(canvas, 'frames')
+    recorder.start()
+    ...
+    recorder.stop()
+
+Only frames that actually get drawn are recorded, a canvas that is sitting
+idle doesn't produce any frames.
+"""
+
+from typing import TYPE_CHECKING, Callable
+
+import ctypes
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import wx
+from OpenGL import GL
+from PIL import Image
+
+from .errors import CaptureError
+from .geometry import notify as _notify
+from . import config as _config
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+
+class _Offscreen:
+    # multisampled framebuffer that gets drawn into and a single sample
+    # framebuffer that it gets resolved into for reading
+
+    def __init__(self, width: int, height: int, samples: int):
+        self.width = width
+        self.height = height
+        self._buffers = []
+        self._renderbuffers = []
+
+        prev_fbo = int(GL.glGetIntegerv(GL.GL_DRAW_FRAMEBUFFER_BINDING))
+
+        try:
+            self.draw_fbo = self._make_fbo(samples)
+            if samples > 0:
+                self.read_fbo = self._make_fbo(0)
+            else:
+                self.read_fbo = self.draw_fbo
+        except:  # NOQA
+            self.delete()
+            raise
+        finally:
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, prev_fbo)
+
+    def _make_renderbuffer(self, internal_format, samples: int) -> int:
+        rb = GL.glGenRenderbuffers(1)
+        self._renderbuffers.append(rb)
+
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, rb)
+        if samples > 0:
+            GL.glRenderbufferStorageMultisample(GL.GL_RENDERBUFFER, samples, internal_format,
+                                                self.width, self.height)
+        else:
+            GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, internal_format, self.width, self.height)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, 0)
+
+        return rb
+
+    def _make_fbo(self, samples: int) -> int:
+        fbo = GL.glGenFramebuffers(1)
+        self._buffers.append(fbo)
+
+        color = self._make_renderbuffer(GL.GL_RGBA8, samples)
+        depth = self._make_renderbuffer(GL.GL_DEPTH_COMPONENT24, samples)
+
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, fbo)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                     GL.GL_RENDERBUFFER, color)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_DEPTH_ATTACHMENT,
+                                     GL.GL_RENDERBUFFER, depth)
+
+        status = GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER)
+        if status != GL.GL_FRAMEBUFFER_COMPLETE:
+            raise CaptureError(f'capture framebuffer is incomplete ({status})')
+
+        return fbo
+
+    def resolve(self):
+        if self.read_fbo == self.draw_fbo:
+            return
+
+        GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, self.draw_fbo)
+        GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, self.read_fbo)
+        GL.glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height,
+                             GL.GL_COLOR_BUFFER_BIT, GL.GL_NEAREST)
+
+    def read(self, width: int, height: int) -> np.ndarray:
+        GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, self.read_fbo)
+        GL.glReadBuffer(GL.GL_COLOR_ATTACHMENT0)
+        GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+
+        data = GL.glReadPixels(0, 0, width, height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+    def delete(self):
+        if self._buffers:
+            GL.glDeleteFramebuffers(len(self._buffers), self._buffers)
+        if self._renderbuffers:
+            GL.glDeleteRenderbuffers(len(self._renderbuffers), self._renderbuffers)
+
+        self._buffers = []
+        self._renderbuffers = []
+
+
+def _max_tile_size() -> int:
+    size = int(Config.capture.tile_size)
+    size = min(size, int(GL.glGetIntegerv(GL.GL_MAX_RENDERBUFFER_SIZE)))
+    size = min(size, *(int(item) for item in GL.glGetIntegerv(GL.GL_MAX_VIEWPORT_DIMS)))
+    return max(16, size)
+
+
+def _samples() -> int:
+    samples = int(Config.capture.samples)
+    if samples <= 0:
+        return 0
+
+    return min(samples, int(GL.glGetIntegerv(GL.GL_MAX_SAMPLES)))
+
+
+@_debug.logfunc
+def screenshot(canvas: "_canvas.Canvas", width: int | None = None,
+               height: int | None = None, transparent: bool = False) -> Image.Image:
+    """
+    Render the view of a canvas into an image.
+
+    `width` and `height` default to the size of the canvas. When only one of
+    them is given the other one keeps the aspect ratio of the canvas. The
+    view is the same as the canvas, a larger image has more detail and not
+    more of the scene in it.
+
+    With `transparent` set the background is left transparent and an RGBA
+    image is returned.
+    """
+    from . import canvas as _canvas
+
+    cw, ch = canvas.GetSize()
+    cw = max(cw, 1)
+    ch = max(ch, 1)
+
+    if width is None and height is None:
+        width, height = cw, ch
+    elif width is None:
+        width = max(1, int(round(height * cw / ch)))
+    elif height is None:
+        height = max(1, int(round(width * ch / cw)))
+
+    width = int(width)
+    height = int(height)
+
+    if width <= 0 or height <= 0:
+        raise CaptureError(f'invalid image size ({width}x{height})')
+
+    image = np.empty((height, width, 4), dtype=np.uint8)
+
+    # listeners that only need to be current when a frame is drawn
+    _notify.flush_deferred()
+
+    with canvas.context:
+        tile_size = _max_tile_size()
+        tw = min(tile_size, width)
+        th = min(tile_size, height)
+
+        offscreen = _Offscreen(tw, th, _samples())
+
+        # the view frustum of the whole image, every tile gets its piece of it
+        top = _canvas.Z_NEAR * np.tan(np.radians(_canvas.FIELD_OF_VIEW) / 2.0)
+        right = top * width / height
+
+        prev_fbo = int(GL.glGetIntegerv(GL.GL_DRAW_FRAMEBUFFER_BINDING))
+        prev_read = int(GL.glGetIntegerv(GL.GL_READ_FRAMEBUFFER_BINDING))
+
+        GL.glPushAttrib(GL.GL_VIEWPORT_BIT | GL.GL_COLOR_BUFFER_BIT |
+                        GL.GL_DEPTH_BUFFER_BIT | GL.GL_PIXEL_MODE_BIT)
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glPushMatrix()
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+        GL.glPushMatrix()
+
+        try:
+            # the objects are culled against the view of the canvas, that is
+            # the same view so nothing that is in the image gets left out.
+            objs = canvas.camera.GetObjectsInView(canvas.objects, not canvas._use_oit)  # NOQA
+
+            for y in range(0, height, th):
+                for x in range(0, width, tw):
+                    w = min(tw, width - x)
+                    h = min(th, height - y)
+
+                    GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, offscreen.draw_fbo)
+                    GL.glViewport(0, 0, w, h)
+
+                    if transparent:
+                        color = GL.glGetFloatv(GL.GL_COLOR_CLEAR_VALUE)
+                        GL.glClearColor(color[0], color[1], color[2], 0.0)
+
+                    GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+
+                    GL.glMatrixMode(GL.GL_PROJECTION)
+                    GL.glLoadIdentity()
+                    GL.glFrustum(-right + 2.0 * right * x / width,
+                                 -right + 2.0 * right * (x + w) / width,
+                                 -top + 2.0 * top * y / height,
+                                 -top + 2.0 * top * (y + h) / height,
+                                 _canvas.Z_NEAR, _canvas.Z_FAR)
+
+                    GL.glMatrixMode(GL.GL_MODELVIEW)
+                    GL.glLoadIdentity()
+                    canvas.camera.Set(update_views=False)
+
+                    # every tile has its own frustum, the reflection has to
+                    # be rendered again for each one and without waiting on
+                    # the update rate
+                    canvas._reflection.invalidate()  # NOQA
+                    canvas.draw_frame(objs)
+
+                    offscreen.resolve()
+                    image[y:y + h, x:x + w] = offscreen.read(w, h)
+        finally:
+            GL.glMatrixMode(GL.GL_PROJECTION)
+            GL.glPopMatrix()
+            GL.glMatrixMode(GL.GL_MODELVIEW)
+            GL.glPopMatrix()
+            GL.glPopAttrib()
+
+            GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, prev_fbo)
+            GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, prev_read)
+            offscreen.delete()
+
+            # the texture holds the reflection of the last tile
+            canvas._reflection.invalidate()  # NOQA
+
+    # OpenGL puts the first row at the bottom
+    image = np.flipud(image)
+
+    if transparent:
+        return Image.fromarray(image, 'RGBA')
+
+    return Image.fromarray(np.ascontiguousarray(image[:, :, :3]), 'RGB')
+
+
+def _save_image(image: Image.Image, file: str, image_format: str | None = None):
+    if image_format is None:
+        image_format = os.path.splitext(file)[1][1:] or None
+
+    # jpeg has no alpha channel
+    if image_format is not None and image_format.lower() in ('jpg', 'jpeg') and image.mode == 'RGBA':
+        image = image.convert('RGB')
+        image_format = 'jpeg'
+
+    image.save(file, format=image_format)
+
+
+@_debug.logfunc
+def save_screenshot(canvas: "_canvas.Canvas", file: str | os.PathLike,
+                    width: int | None = None, height: int | None = None,
+                    transparent: bool = False,
+                    callback: Callable[[str, Exception | None], None] | None = None) -> threading.Thread:
+    """
+    Render a screenshot and save it to a file.
+
+    The rendering is done right away, encoding and saving the image is done
+    in a worker thread. `callback` gets called on the main thread with the
+    file name and the exception if saving failed (`None` if it didn't).
+    """
+    image = screenshot(canvas, width, height, transparent)
+    file = os.fspath(file)
+
+    def _run():
+        error = None
+        try:
+            _save_image(image, file)
+        except Exception as err:  # NOQA
+            error = err
+
+        if callback is not None:
+            wx.CallAfter(callback, file, error)
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+
+    return thread
+
+
+class FrameRecorder:
+    """
+    Records the frames that a canvas draws.
+
+    `sink` is either a directory the frames get saved into as numbered
+    image files or a callable. A callable gets called from the worker thread
+    with the PIL image, the frame number and the time (in seconds) since the
+    recording started.
+
+    The readback is double buffered so every frame is handed to the worker
+    one frame late, `stop` reads the last one.
+    """
+
+    def __init__(self, canvas: "_canvas.Canvas",
+                 sink: str | os.PathLike | Callable[[Image.Image, int, float], None],
+                 image_format: str | None = None):
+
+        self.canvas = canvas
+
+        if callable(sink):
+            self._sink = sink
+            self._directory = None
+        else:
+            self._sink = None
+            self._directory = os.fspath(sink)
+
+        self._image_format = image_format or Config.capture.image_format
+
+        self._pbos = None
+        self._size = (0, 0)
+        self._index = 0
+        # (pbo index, frame number, timestamp) of the frame that is
+        # waiting to be read out of a pixel buffer
+        self._pending = None
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_time = 0.0
+
+        self.frame_count = 0
+        self.saved_count = 0
+        self.error = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self in self.canvas._recorders  # NOQA
+
+    def start(self):
+        if self.is_recording:
+            return
+
+        if self._directory is not None:
+            os.makedirs(self._directory, exist_ok=True)
+
+        self._start_time = time.perf_counter()
+        self.frame_count = 0
+        self.saved_count = 0
+        self.error = None
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+        self.canvas._recorders.append(self)  # NOQA
+        self.canvas.Refresh(False)
+
+    def stop(self, wait: bool = True):
+        """
+        Stop recording. With `wait` set this returns once all of the frames
+        have been saved.
+        """
+        if not self.is_recording:
+            return
+
+        self.canvas._recorders.remove(self)  # NOQA
+
+        with self.canvas.context:
+            self._flush()
+            self._delete_buffers()
+
+        self._queue.put(None)
+
+        if wait:
+            self._worker.join()
+
+        self._worker = None
+
+    def _delete_buffers(self):
+        if self._pbos is not None:
+            GL.glDeleteBuffers(2, self._pbos)
+
+        self._pbos = None
+        self._size = (0, 0)
+
+    def _ensure_buffers(self, width: int, height: int):
+        if self._pbos is not None and self._size == (width, height):
+            return
+
+        # whatever is still in the old buffers has to come out before they
+        # get thrown away
+        self._flush()
+        self._delete_buffers()
+
+        self._pbos = [int(item) for item in GL.glGenBuffers(2)]
+        for pbo in self._pbos:
+            GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, pbo)
+            GL.glBufferData(GL.GL_PIXEL_PACK_BUFFER, width * height * 4, None, GL.GL_STREAM_READ)
+
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        self._size = (width, height)
+
+    def _flush(self):
+        # copy the frame that is waiting in a pixel buffer out of it
+        if self._pending is None:
+            return
+
+        index, frame, timestamp = self._pending
+        self._pending = None
+
+        width, height = self._size
+        size = width * height * 4
+
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, self._pbos[index])
+        ptr = GL.glMapBuffer(GL.GL_PIXEL_PACK_BUFFER, GL.GL_READ_ONLY)
+
+        if ptr:
+            data = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(int(ptr)))
+            self._queue.put((data.reshape(height, width, 4).copy(), frame, timestamp))
+            GL.glUnmapBuffer(GL.GL_PIXEL_PACK_BUFFER)
+
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+
+    @_debug.logfunc
+    def capture(self):
+        """
+        Called by the canvas after a frame has been drawn and before the
+        buffers get swapped.
+        """
+        _, _, width, height = (int(v) for v in GL.glGetIntegerv(GL.GL_VIEWPORT))
+        if width <= 0 or height <= 0:
+            return
+
+        self._ensure_buffers(width, height)
+
+        index = self._index
+        self._index = 1 - index
+
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, self._pbos[index])
+        GL.glReadBuffer(GL.GL_BACK)
+        GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+        # with a pack buffer bound this only queues the copy
+        GL.glReadPixels(0, 0, width, height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+
+        # the previous frame has had a whole frame to finish copying
+        self._flush()
+
+        self._pending = (index, self.frame_count, time.perf_counter() - self._start_time)
+        self.frame_count += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            data, frame, timestamp = item
+            image = Image.fromarray(np.flipud(data), 'RGBA')
+
+            try:
+                if self._sink is not None:
+                    self._sink(image, frame, timestamp)
+                else:
+                    file = os.path.join(self._directory,
+                                        f'frame_{frame:06d}.{self._image_format}')
+                    _save_image(image, file, self._image_format)
+            except Exception as err:  # NOQA
+                # keep the first error, the rest are most likely the same
+                if self.error is None:
+                    self.error = err
+                continue
+
+            self.saved_count += 1
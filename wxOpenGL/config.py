@@ -1,8 +1,20 @@
 
-import wx
 import sqlite3
 import weakref
 
+try:
+    import wx
+except ImportError:
+    # processes without a GUI (the thumbnail and benchmark workers) only
+    # read the mesh settings
+    wx = None
+
+
+def _key(name: str) -> int | None:
+    # wx key code, `None` when wx isn't there to press keys with
+    return None if wx is None else getattr(wx, name)
+
+
 
 class _ConfigTable:
     """
@@ -257,6 +269,13 @@ class Config(metaclass=ConfigDB):
         ground_height = 0.0
         reflections = True
         reflection_strength = 50.0
+        # the reflection is rendered to a texture that is this fraction of the
+        # canvas size and it is only updated this many times a second while
+        # the camera or the scene is changing. Objects smaller than
+        # reflection_min_size (mm) are left out of the reflection.
+        reflection_scale = 0.5
+        reflection_update_rate = 15.0
+        reflection_min_size = 5.0
         distance = 1000
         primary_color = [0.2039, 0.2549, 0.2902, 0.8]
         secondary_color = [0.3058, 0.3843, 0.3804, 0.8]
@@ -306,21 +325,21 @@ class Config(metaclass=ConfigDB):
 
     class walk(metaclass=ConfigDB):
         mouse = MOUSE_WHEEL | MOUSE_SWAP_AXIS
-        forward_key = wx.WXK_UP
-        backward_key = wx.WXK_DOWN
-        left_key = wx.WXK_LEFT
-        right_key = wx.WXK_RIGHT
+        forward_key = _key('WXK_UP')
+        backward_key = _key('WXK_DOWN')
+        left_key = _key('WXK_LEFT')
+        right_key = _key('WXK_RIGHT')
         sensitivity = 1.0
         speed = 5.0
 
     class zoom(metaclass=ConfigDB):
         mouse = MOUSE_NONE  # | MOUSE_REVERSE_WHEEL_AXIS
-        in_key = wx.WXK_ADD
-        out_key = wx.WXK_SUBTRACT
+        in_key = _key('WXK_ADD')
+        out_key = _key('WXK_SUBTRACT')
         sensitivity = 5.0
 
     class reset(metaclass=ConfigDB):
-        key = wx.WXK_HOME
+        key = _key('WXK_HOME')
         mouse = MOUSE_NONE
 
     class debug(metaclass=ConfigDB):
@@ -336,3 +355,102 @@ class Config(metaclass=ConfigDB):
 
     class colors(metaclass=ConfigDB):
         custom_colors = ''
+
+    class rendering(metaclass=ConfigDB):
+        # frames are never drawn faster than this. With vsync turned on the
+        # refresh rate of the monitor is used if it is lower. 0 is unlimited.
+        max_fps = 60.0
+        vsync = True
+        # paints that didn't come from Refresh re-use the last frame when
+        # the camera and the scene haven't changed
+        frame_cache = True
+        # draw the objects with GLSL 3.30 shaders, buffers on the video card
+        # and instancing. The fixed function pipeline is used if the video
+        # card doesn't support it.
+        shaders = True
+
+    class hover(metaclass=ConfigDB):
+        # the object under the mouse gets a box drawn around it. Picking is
+        # done at most once every interval seconds.
+        enabled = True
+        interval = 0.03
+        color = [1.0, 1.0, 0.4, 1.0]
+
+    class selection(metaclass=ConfigDB):
+        # shift + left drag is a box, shift + control + left drag is a lasso
+        enabled = True
+        # check the meshes of objects that the bounding boxes say are touching
+        precise = False
+        lasso_crossing = True
+        color = [1.0, 1.0, 1.0, 1.0]
+
+    class capture(metaclass=ConfigDB):
+        # screenshots larger than this (in pixels) get rendered in tiles
+        tile_size = 2048
+        # multisampling used for screenshots, 0 turns it off
+        samples = 4
+        # file format frames get saved as when recording to a directory
+        image_format = 'png'
+
+    class thumbnails(metaclass=ConfigDB):
+        size = 256
+        # rendered this many times larger and then scaled down, OSMesa has
+        # no multisampling
+        supersample = 2
+        # space around the part, 1.0 fits the bounding sphere to the image
+        margin = 1.05
+        color = [0.6, 0.6, 0.65, 1.0]
+        background = [1.0, 1.0, 1.0, 0.0]
+        # number of worker processes, 0 is one per CPU
+        processes = 0
+        # PyOpenGL platform the worker processes use
+        platform = 'osmesa'
+
+    class mesh(metaclass=ConfigDB):
+        # clean up that is done to meshes when they are loaded. The weld
+        # tolerance is relative to the size of the mesh.
+        optimize = True
+        weld_tolerance = 1e-6
+        crease_angle = 45.0
+        # int16 positions and int8 normals, 1/4 of the memory
+        compact_vertices = False
+        # size (in triangles) and time (in seconds) that a streamed model
+        # gets broken up into
+        stream_chunk_size = 50000
+        stream_interval = 0.1
+
+    class tessellation(metaclass=ConfigDB):
+        # number of triangles a whole model gets tessellated to. The
+        # deflections are relative to the size of each solid.
+        triangle_budget = 500000
+        min_deflection = 0.0002
+        max_deflection = 0.01
+        angular_deflection = 0.1
+        max_angular_deflection = 0.5
+        # solids get tessellated again in the background when the camera
+        # gets close enough that the error is larger than this many pixels
+        refine = True
+        pixel_error = 0.5
+
+    class small_features(metaclass=ConfigDB):
+        # objects smaller than the threshold (in pixels) don't get drawn.
+        # mode is what gets drawn in place of them, 'hide', 'point' or 'box'
+        enabled = True
+        pixel_threshold = 2.0
+        hysteresis = 1.5
+        mode = 'point'
+
+    class occlusion(metaclass=ConfigDB):
+        # objects hidden behind other objects don't get drawn. Only used
+        # when at least `min_objects` objects are in view.
+        enabled = True
+        min_objects = 32
+        resolution = 256
+        max_occluders = 16
+        occluder_triangles = 2048
+
+    class transparency(metaclass=ConfigDB):
+        # weighted blended order independent transparency. When turned off
+        # (or not supported by the hardware) translucent objects get sorted
+        # by distance from the camera instead.
+        order_independent = True
@@ -915,6 +915,27 @@ class FloorTab(scrolledpanel.ScrolledPanel):
         self.reflection_strength.Enable(reflections)
         self.reflection_strength.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_reflection_strength)
 
+        self.reflection_scale = wx.SpinCtrlDouble(
+            self, wx.ID_ANY, value=str(round(Config.floor.reflection_scale, 2)),
+            min=0.05, max=1.0, inc=0.05, initial=round(Config.floor.reflection_scale, 2))
+
+        self.reflection_scale.Enable(reflections)
+        self.reflection_scale.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_reflection_scale)
+
+        self.reflection_update_rate = wx.SpinCtrlDouble(
+            self, wx.ID_ANY, value=str(round(Config.floor.reflection_update_rate, 1)),
+            min=0.0, max=240.0, inc=1.0, initial=round(Config.floor.reflection_update_rate, 1))
+
+        self.reflection_update_rate.Enable(reflections)
+        self.reflection_update_rate.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_reflection_update_rate)
+
+        self.reflection_min_size = wx.SpinCtrlDouble(
+            self, wx.ID_ANY, value=str(round(Config.floor.reflection_min_size, 1)),
+            min=0.0, max=1000.0, inc=0.5, initial=round(Config.floor.reflection_min_size, 1))
+
+        self.reflection_min_size.Enable(reflections)
+        self.reflection_min_size.Bind(wx.EVT_SPINCTRLDOUBLE, self.on_reflection_min_size)
+
         self.distance = wx.SpinCtrl(
             self, wx.ID_ANY, value=str(Config.floor.distance),
             min=100, max=10000, initial=Config.floor.distance)
@@ -951,6 +972,9 @@ class FloorTab(scrolledpanel.ScrolledPanel):
         secondary_color_sizer = HSizer(self, 'Secondary Color:', self.secondary_color)
         reflections_sizer = HSizer(self, 'Reflections:', self.reflections)
         reflection_strength_sizer = HSizer(self, 'Reflection Strength:', self.reflection_strength)
+        reflection_scale_sizer = HSizer(self, 'Reflection Scale:', self.reflection_scale)
+        reflection_update_rate_sizer = HSizer(self, 'Reflection Update Rate:', self.reflection_update_rate)
+        reflection_min_size_sizer = HSizer(self, 'Reflection Min Size:', self.reflection_min_size)
 
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(ground_height_sizer, 0, wx.ALL | 5)
@@ -961,6 +985,9 @@ class FloorTab(scrolledpanel.ScrolledPanel):
         sizer.Add(secondary_color_sizer, 0, wx.ALL | 5)
         sizer.Add(reflections_sizer, 0, wx.ALL | 5)
         sizer.Add(reflection_strength_sizer, 0, wx.ALL | 5)
+        sizer.Add(reflection_scale_sizer, 0, wx.ALL | 5)
+        sizer.Add(reflection_update_rate_sizer, 0, wx.ALL | 5)
+        sizer.Add(reflection_min_size_sizer, 0, wx.ALL | 5)
 
         self.SetSizer(sizer)
         self.SetupScrolling()
@@ -975,6 +1002,9 @@ class FloorTab(scrolledpanel.ScrolledPanel):
     def on_reflections(self, evt):
         value = self.reflections.GetValue()
         self.reflection_strength.Enable(value)
+        self.reflection_scale.Enable(value)
+        self.reflection_update_rate.Enable(value)
+        self.reflection_min_size.Enable(value)
         Config.floor.reflections = value
         evt.Skip()
 
@@ -1028,6 +1058,18 @@ class FloorTab(scrolledpanel.ScrolledPanel):
         Config.floor.reflection_strength = self.reflection_strength.GetValue()
         evt.Skip()
 
+    def on_reflection_scale(self, evt):
+        Config.floor.reflection_scale = self.reflection_scale.GetValue()
+        evt.Skip()
+
+    def on_reflection_update_rate(self, evt):
+        Config.floor.reflection_update_rate = self.reflection_update_rate.GetValue()
+        evt.Skip()
+
+    def on_reflection_min_size(self, evt):
+        Config.floor.reflection_min_size = self.reflection_min_size.GetValue()
+        evt.Skip()
+
     def on_grid_size(self, evt):
         Config.floor.grid_size = self.grid_size.GetValue()
         evt.Skip()
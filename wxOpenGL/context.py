@@ -8,50 +8,123 @@ if TYPE_CHECKING:
     from . import canvas as _canvas
 
 
+class _Current(threading.local):
+    """
+    The canvas and context that are current for a thread.
+
+    OpenGL keeps the current context per thread so this is tracked per thread
+    as well. As long as the pair doesn't change `SetCurrent` doesn't need to
+    be called again.
+    """
+
+    def __init__(self):
+        self.canvas = None
+        self.context = None
+
+
+_current = _Current()
+
+
 class GLContext:
+    """
+    Re-entrant GL context.
+
+    The first time a thread enters the context the lock gets acquired and the
+    context is made current if it isn't already. Nested entries by the thread
+    that is holding it only bump a counter, no locks are touched and there
+    are no calls into wx.
+
+    The counters can be used to see how much this is costing.
 
-    def __init__(self, canvas: "_canvas.Canvas"):
+        enter_count: number of times the context was entered
+        acquire_count: number of times the lock had to be acquired
+        set_current_count: number of times `SetCurrent` was called
+    """
+
+    def __init__(self, canvas: "_canvas.Canvas", share: "GLContext | None" = None):
         self.canvas = canvas
-        self.context = glcanvas.GLContext(canvas)
-        self._lock = threading.RLock()
-        self._refs_lock = threading.Lock()
-        self._refs = {}
-        self._refs_order = []
+
+        # contexts that share with each other use the same textures, buffers
+        # and shader programs. `resources` is where GL objects that are made
+        # for the whole group get stored so they only get made one time,
+        # `pipeline.ShaderPipeline` keeps the vertex buffers of the scene
+        # in it.
+        if share is None:
+            self.context = glcanvas.GLContext(canvas)
+            self.resources = {}
+        else:
+            self.context = glcanvas.GLContext(canvas, other=share.context)
+            self.resources = share.resources
+
+        self._lock = threading.Lock()
+        self._owner = None
+        self._depth = 0
+
+        self.enter_count = 0
+        self.acquire_count = 0
+        self.set_current_count = 0
 
     @property
     def is_locked(self):
-        cur_thread = threading.current_thread()
-
-        with self._refs_lock:
-            if not self._refs_order:
-                return False
-
-            if self._refs_order[0] == cur_thread:
-                return False
+        # only the owning thread is able to set the owner to its own
+        # ident so this doesn't need a lock
+        owner = self._owner
+        return owner is not None and owner != threading.get_ident()
 
-            return True
+    @property
+    def stats(self) -> dict:
+        return dict(
+            enter_count=self.enter_count,
+            acquire_count=self.acquire_count,
+            set_current_count=self.set_current_count
+        )
+
+    def reset_stats(self):
+        self.enter_count = 0
+        self.acquire_count = 0
+        self.set_current_count = 0
+
+    def make_current(self):
+        if _current.canvas is self.canvas and _current.context is self.context:
+            return
+
+        self.set_current_count += 1
+
+        # SetCurrent fails if the window has not been shown yet, it
+        # needs to be tried again the next time around if that happens.
+        if self.canvas.SetCurrent(self.context):
+            _current.canvas = self.canvas
+            _current.context = self.context
+        else:
+            _current.canvas = None
+            _current.context = None
 
     def __enter__(self):
-        cur_thread = threading.current_thread()
-
-        with self._refs_lock:
-            if cur_thread not in self._refs:
-                self._refs[cur_thread] = 0
-                self._refs_order.append(cur_thread)
+        self.enter_count += 1
+        ident = threading.get_ident()
 
-            self._refs[cur_thread] += 1
+        if self._owner == ident:
+            self._depth += 1
+            return self
 
         self._lock.acquire()
-        self.canvas.SetCurrent(self.context)
+        self.acquire_count += 1
+        self._owner = ident
+        self._depth = 1
+
+        try:
+            self.make_current()
+        except:  # NOQA
+            self._depth = 0
+            self._owner = None
+            self._lock.release()
+            raise
+
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._lock.release()
-        cur_thread = threading.current_thread()
-
-        with self._refs_lock:
-            self._refs[cur_thread] -= 1
+        self._depth -= 1
 
-            if self._refs[cur_thread] == 0:
-                del self._refs[cur_thread]
-                self._refs_order.remove(cur_thread)
+        if self._depth == 0:
+            self._owner = None
+            self._lock.release()
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING
 
+import numpy as np
 
 from .geometry import point as _point
 from . import debug as _debug
@@ -33,10 +34,13 @@ class DragObject:
         screen_new.z = depth  # Ensure consistent depth
 
         # Step 4: Unproject the screen position back to world space
-        world_hit = self.canvas.camera.UnprojectPoint(screen_new)
-
         # Step 5: Apply offset to maintain object position relative to pick point
-        pick_world = self.canvas.camera.UnprojectPoint(anchor_screen)
+        # both points are unprojected at the same time
+        world_hit, pick_world = self.canvas.camera.unproject_points(
+            np.array([screen_new.as_float, anchor_screen.as_float], dtype=np.float64))
+
+        world_hit = _point.Point(*world_hit.tolist())
+        pick_world = _point.Point(*pick_world.tolist())
 
         if self.pick_offset is None:
             self.pick_offset = self.selected.position - pick_world
@@ -5,3 +5,14 @@ class wxOpenGLException(Exception):
 class ModelLoadError(wxOpenGLException):
     pass
 
+
+class ShaderError(wxOpenGLException):
+    pass
+
+
+class SceneFileError(wxOpenGLException):
+    pass
+
+
+class CaptureError(wxOpenGLException):
+    pass
@@ -19,6 +19,9 @@ Config = _config.Config
 
 class FocalPoint(_base3d.Base3D):
 
+    # every canvas has a focal point of its own even when the scene is shared
+    canvas_local = True
+
     def __init__(self, canvas: "_canvas.Canvas"):
 
         material = _gl_materials.MetallicMaterial(Config.camera.focal_target_color)
@@ -29,6 +32,10 @@ class FocalPoint(_base3d.Base3D):
                                 data, canvas.camera.position, angle)
         self._rect = []
 
+    def _invalidate(self):
+        self._version += 1
+        self.canvas.InvalidateLocal()
+
     @staticmethod
     def _build_point(radius=1.0):
         resolution = int(max(20.0, _utils.remap(radius, 0.35, 19.0, 20.0, 30.0)))
@@ -0,0 +1,194 @@
+"""
+Cache of the last frame that was drawn.
+
+Every paint event used to run all of `Canvas.OnDraw`, the culling passes,
+the reflection, the grid and the scene. A lot of paint events have nothing
+to do with the scene: the window was uncovered, another pane got resized or
+the angle overlay changed. The finished frame is now copied into a texture
+along with the camera and scene versions it was drawn with. When the canvas
+gets painted again and nothing has changed the texture is drawn over the
+window and that is all that happens.
+
+A frame is only ever re-used for paints that didn't come from
+`Canvas.Refresh`. Anything that changes what is on the screen without
+changing the scene version (a material color, a config setting) still
+gets drawn properly as long as `Refresh` gets called, which already has to
+be done for the change to show up.
+
+The copy is done with `glBlitFramebuffer`, a multisampled window gets
+resolved by it. Presenting the cached frame draws a textured quad so it
+also works when the window is multisampled.
+"""
+
+from typing import TYPE_CHECKING
+
+from OpenGL import GL
+from OpenGL import error as _gl_error
+
+from .errors import ShaderError
+from . import config as _config
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+
+class FrameCache:
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+
+        self._fbo = None
+        self._color_tex = None
+        self._size = (0, 0)
+
+        self._key = None
+        self._supported = True
+
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @property
+    def is_supported(self) -> bool:
+        return self._supported
+
+    @property
+    def is_enabled(self) -> bool:
+        return Config.rendering.frame_cache and self._supported
+
+    def _delete_buffers(self):
+        if self._fbo is not None:
+            GL.glDeleteFramebuffers(1, [self._fbo])
+            GL.glDeleteTextures(1, [self._color_tex])
+
+        self._fbo = None
+        self._color_tex = None
+        self._size = (0, 0)
+
+    @_debug.logfunc
+    def _ensure_buffers(self, width: int, height: int, prev_fbo: int):
+        if self._fbo is not None and self._size == (width, height):
+            return
+
+        self._delete_buffers()
+
+        self._color_tex = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._color_tex)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, width, height,
+                        0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, None)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+        self._fbo = GL.glGenFramebuffers(1)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                  GL.GL_TEXTURE_2D, self._color_tex, 0)
+
+        status = GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, prev_fbo)
+
+        if status != GL.GL_FRAMEBUFFER_COMPLETE:
+            self._delete_buffers()
+            raise ShaderError(f'frame cache framebuffer is incomplete ({status})')
+
+        self._size = (width, height)
+
+    def make_key(self, width: int, height: int) -> tuple:
+        return self.canvas.camera.version, self.canvas.scene_version, width, height
+
+    @_debug.logfunc
+    def present(self, key: tuple) -> bool:
+        """
+        Draw the cached frame if it was drawn with `key`.
+
+        Returns `False` if the frame has to be drawn, nothing is touched in
+        that case.
+        """
+        if not self.is_enabled or self._fbo is None or key != self._key:
+            self.miss_count += 1
+            return False
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_DEPTH_BUFFER_BIT | GL.GL_TEXTURE_BIT)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glDisable(GL.GL_BLEND)
+        GL.glDisable(GL.GL_DEPTH_TEST)
+        GL.glDepthMask(GL.GL_FALSE)
+        GL.glEnable(GL.GL_TEXTURE_2D)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._color_tex)
+        GL.glTexEnvi(GL.GL_TEXTURE_ENV, GL.GL_TEXTURE_ENV_MODE, GL.GL_REPLACE)
+
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glPushMatrix()
+        GL.glLoadIdentity()
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+        GL.glPushMatrix()
+        GL.glLoadIdentity()
+
+        GL.glBegin(GL.GL_QUADS)
+        GL.glTexCoord2f(0.0, 0.0)
+        GL.glVertex2f(-1.0, -1.0)
+        GL.glTexCoord2f(1.0, 0.0)
+        GL.glVertex2f(1.0, -1.0)
+        GL.glTexCoord2f(1.0, 1.0)
+        GL.glVertex2f(1.0, 1.0)
+        GL.glTexCoord2f(0.0, 1.0)
+        GL.glVertex2f(-1.0, 1.0)
+        GL.glEnd()
+
+        GL.glPopMatrix()
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glPopMatrix()
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        GL.glPopAttrib()
+
+        self.hit_count += 1
+        return True
+
+    @_debug.logfunc
+    def store(self, key: tuple):
+        """
+        Copy the frame that was just drawn into the cache.
+
+        This needs to be called before the buffers get swapped.
+        """
+        if not self.is_enabled:
+            return
+
+        _, _, width, height = key
+        prev_draw = int(GL.glGetIntegerv(GL.GL_DRAW_FRAMEBUFFER_BINDING))
+        prev_read = int(GL.glGetIntegerv(GL.GL_READ_FRAMEBUFFER_BINDING))
+
+        try:
+            self._ensure_buffers(width, height, prev_draw)
+
+            GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, prev_draw)
+            if prev_draw == 0:
+                GL.glReadBuffer(GL.GL_BACK)
+
+            GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, self._fbo)
+            GL.glBlitFramebuffer(0, 0, width, height, 0, 0, width, height,
+                                 GL.GL_COLOR_BUFFER_BIT, GL.GL_NEAREST)
+        except (ShaderError, _gl_error.GLError):
+            self._supported = False
+            self._key = None
+            return
+        finally:
+            GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, prev_read)
+            GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, prev_draw)
+
+        self._key = key
+
+    def invalidate(self):
+        self._key = None
+
+    def delete(self):
+        self._delete_buffers()
+        self._key = None
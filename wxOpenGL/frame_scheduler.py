@@ -0,0 +1,166 @@
+"""
+Frame pacing for the canvas.
+
+Everything that wants the canvas redrawn calls `Canvas.Refresh`, and that
+used to queue a full paint every single time. A single drag step ended up
+drawing the scene several times. `Refresh` now only marks the canvas as
+dirty. The scheduler then issues one paint for all of the requests made
+before the next frame is due.
+
+Frames are paced to `Config.rendering.max_fps`. When `Config.rendering.vsync`
+is set the rate is also capped to the refresh rate of the display the canvas
+is on, there is no point in drawing frames the monitor is never going to
+show. When nothing is dirty there are no timers running at all.
+
+Things that move on their own (keyboard navigation) register an animator.
+Animators get called at the start of every frame with the number of seconds
+that have passed since the last frame and return `True` while they still
+need frames to be drawn.
+"""
+
+from typing import TYPE_CHECKING, Callable
+
+import time
+
+import wx
+from wx import glcanvas
+
+from . import config as _config
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+# the time step handed to animators is capped so a frame that took a long
+# time doesn't make the camera jump.
+_MAX_DT = 0.1
+_DEFAULT_DT = 1.0 / 60.0
+
+
+class FrameScheduler:
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+
+        self._dirty = False
+        self._pending = False
+        self._last_frame = 0.0
+        self._frame_count = 0
+        self._animators = []
+        self._animating = False
+
+        self._timer = wx.Timer(canvas)
+        canvas.Bind(wx.EVT_TIMER, self._on_timer, self._timer)
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    @property
+    def frame_count(self) -> int:
+        return self._frame_count
+
+    def _display_refresh_rate(self) -> float:
+        index = wx.Display.GetFromWindow(self.canvas)
+        if index == wx.NOT_FOUND:
+            return 0.0
+
+        return float(wx.Display(index).GetCurrentMode().refresh)
+
+    @property
+    def frame_interval(self) -> float:
+        """
+        Minimum number of seconds between 2 frames.
+        """
+        fps = Config.rendering.max_fps
+
+        if Config.rendering.vsync:
+            refresh = self._display_refresh_rate()
+            # some platforms report 0 when they don't know the refresh rate
+            if refresh > 0.0 and (fps <= 0.0 or refresh < fps):
+                fps = refresh
+
+        if fps <= 0.0:
+            return 0.0
+
+        return 1.0 / fps
+
+    def request(self):
+        """
+        Mark the canvas dirty and make sure a frame is going to be drawn.
+
+        This is safe to call from any thread.
+        """
+        if not wx.IsMainThread():
+            wx.CallAfter(self.request)
+            return
+
+        self._dirty = True
+
+        if self._pending:
+            # a frame is already on the way, it is going to pick this up
+            return
+
+        self._pending = True
+
+        wait = self.frame_interval - (time.perf_counter() - self._last_frame)
+        if wait > 0.001:
+            self._timer.StartOnce(max(1, int(wait * 1000)))
+        else:
+            self._paint()
+
+    def _paint(self):
+        glcanvas.GLCanvas.Refresh(self.canvas, False)
+
+    def _on_timer(self, _):
+        self._paint()
+
+    def add_animator(self, callback: Callable[[float], bool]):
+        if callback not in self._animators:
+            self._animators.append(callback)
+
+    def remove_animator(self, callback: Callable[[float], bool]):
+        if callback in self._animators:
+            self._animators.remove(callback)
+
+    def begin_frame(self) -> bool:
+        """
+        Called by the canvas when it starts to paint a frame.
+
+        Returns `True` if the frame was asked for with `Canvas.Refresh`,
+        `False` when the paint came from somewhere else (the window got
+        uncovered) and the last frame can be shown again.
+        """
+        now = time.perf_counter()
+        requested = self._dirty or self._pending
+
+        if self._animating:
+            dt = min(now - self._last_frame, _MAX_DT)
+        else:
+            # first frame of an animation, there is no previous frame
+            # that was drawn for it to measure against.
+            dt = self.frame_interval or _DEFAULT_DT
+
+        self._timer.Stop()
+        self._dirty = False
+        self._pending = False
+        self._last_frame = now
+        self._frame_count += 1
+
+        animating = False
+        for callback in self._animators[:]:
+            if callback(dt):
+                animating = True
+
+        self._animating = animating
+
+        if animating:
+            self.request()
+
+        return requested
+
+    def stop(self):
+        self._timer.Stop()
+        self._pending = False
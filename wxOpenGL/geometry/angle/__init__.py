@@ -1,9 +1,9 @@
-from typing import Self, Callable, Iterable, Union
-import weakref
+from typing import Self, Iterable, Union
 import numpy as np
 
 from . import quaternion as _quaternion
 from .. import point as _point
+from .. import notify as _notify
 from ...wrappers.decimal import Decimal as _decimal
 
 
@@ -11,7 +11,7 @@ ONE = _decimal(1.0)
 TWO = _decimal(2.0)
 
 
-class Angle:
+class Angle(_notify.Notifier):
 
     def __array_ufunc__(self, func, method, inputs, instance, **kwargs):  # NOQA
         # print('angle func:', func)
@@ -97,54 +97,7 @@ class Angle:
         self._q = q
         self.__euler_angles = euler_angles
 
-        self.__callbacks = []
-        self._ref_count = 0
-
-    def __enter__(self):
-        self._ref_count += 1
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._ref_count -= 1
-
-    def __remove_callback(self, ref):
-        try:
-            self.__callbacks.remove(ref)
-        except:  # NOQA
-            pass
-
-    def bind(self, cb: Callable[["Angle"], None]) -> bool:
-        # We don't explicitly check to see if a callback is already registered.
-        # What we care about is if a callback is called only one time and that
-        # check is done when the callbacks are being executed. If there happens
-        # to be a duplicate, the duplicate is then removed at that point in time.
-        ref = weakref.WeakMethod(cb, self.__remove_callback)
-        self.__callbacks.append(ref)
-        return True
-
-    def unbind(self, cb: Callable[["Angle"], None]) -> None:
-        for ref in self.__callbacks[:]:
-            callback = ref()
-            if callback is None:
-                self.__callbacks.remove(ref)
-            elif callback == cb:
-                # We don't return after locating a matching callback in the
-                # event a callback was registered more than one time. Duplicates
-                # are also removed at the time callbacks get called but if an update
-                # to an angle never occurs we want to make sure that we explicitly
-                # unbind all callbacks including duplicates.
-                self.__callbacks.remove(ref)
-
-    def _process_update(self):
-        if self._ref_count:
-            return
-
-        for ref in self.__callbacks[:]:
-            cb = ref()
-            if cb is None:
-                self.__callbacks.remove(ref)
-            else:
-                cb(self)
+        self._init_notifier()
 
     @property
     def inverse(self) -> "Angle":
@@ -260,8 +213,7 @@ class Angle:
             with other:
                 other.x = x
                 other.y = y
-
-            other.z = z
+                other.z = z
         else:
             raise RuntimeError('sanity check')
 
@@ -280,8 +232,7 @@ class Angle:
             with other:
                 other.x = x
                 other.y = y
-
-            other.z = z
+                other.z = z
         else:
             raise RuntimeError('sanity check')
 
@@ -0,0 +1,207 @@
+"""
+Change notifications for `Point` and `Angle`.
+
+Setting a single axis used to call every bound callback right away, so
+setting x, y and z of a position ended up rebuilding an object 3 times.
+Updates are now collected into a transaction and each listener gets called
+one time when the outermost transaction ends, no matter how many points or
+angles it is bound to have changed. The listener is handed the object that
+changed last.
+
+A transaction is opened with `batch()` or by using a point or angle as a
+context manager. Changes made inside of it are delayed, not dropped.
+
+    with notify.batch():
+        obj.position.x = 10.0
+        obj.position.y = 5.0
+        obj.angle.z = 90.0
+
+Listeners that only need to be up to date when a frame gets drawn can be
+bound with `deferred=True`. Those are collected across transactions and are
+called when `flush_deferred` is called at the start of a frame.
+
+Transactions are per thread.
+"""
+
+from typing import Callable, Any
+
+import threading
+import weakref
+
+
+# a listener modifying what it listens to over and over again would
+# otherwise never return
+_MAX_ROUNDS = 64
+
+
+class _Transaction(threading.local):
+
+    def __init__(self):
+        self.depth = 0
+        self.flushing = False
+        self.pending = {}
+
+
+_transaction = _Transaction()
+
+_deferred_lock = threading.Lock()
+_deferred = {}
+
+
+def _dispatch(pending, error: Exception | None) -> Exception | None:
+    # a listener that raises doesn't stop the rest from being called, the
+    # first exception is handed back so it can be raised once all of them
+    # have run.
+    for ref, emitter in pending:
+        cb = ref()
+        if cb is None:
+            continue
+
+        try:
+            cb(emitter)
+        except Exception as err:  # NOQA
+            if error is None:
+                error = err
+
+    return error
+
+
+def _flush(tx: _Transaction):
+    tx.flushing = True
+    rounds = 0
+    error = None
+
+    try:
+        while tx.pending:
+            rounds += 1
+            if rounds > _MAX_ROUNDS:
+                raise RuntimeError('change notifications did not settle')
+
+            # listeners are able to change things, those changes
+            # get collected and dispatched in the next round.
+            pending = tx.pending
+            tx.pending = {}
+
+            error = _dispatch(pending.values(), error)
+    finally:
+        tx.pending.clear()
+        tx.flushing = False
+
+    if error is not None:
+        raise error
+
+
+def begin():
+    _transaction.depth += 1
+
+
+def end():
+    tx = _transaction
+    tx.depth -= 1
+
+    if tx.depth == 0 and not tx.flushing:
+        _flush(tx)
+
+
+class batch:
+    """
+    Context manager that collects all change notifications made inside of it.
+    """
+
+    def __enter__(self) -> "batch":
+        begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end()
+
+
+def flush_deferred():
+    """
+    Call the listeners that were bound with `deferred=True`.
+    """
+    with _deferred_lock:
+        if not _deferred:
+            return
+
+        pending = list(_deferred.values())
+        _deferred.clear()
+
+    begin()
+    try:
+        error = _dispatch(pending, None)
+    finally:
+        end()
+
+    if error is not None:
+        raise error
+
+
+def _listener_key(callback: Callable) -> tuple:
+    try:
+        return id(callback.__self__), callback.__func__  # NOQA
+    except AttributeError:
+        return None, callback
+
+
+class Notifier:
+    """
+    Mixin that gives a class `bind`/`unbind` and transactional updates.
+
+    Subclasses need to call `_init_notifier` in `__init__` and then call
+    `_process_update` every time the value changes.
+    """
+
+    def _init_notifier(self):
+        self._listeners = {}
+
+    def __enter__(self) -> Any:
+        begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end()
+
+    def bind(self, callback: Callable[[Any], None], deferred: bool = False) -> bool:
+        # the listeners are stored in a dict so binding the same
+        # callback more than one time is the same as binding it once.
+        key = _listener_key(callback)
+
+        def _remove(_, listeners=self._listeners):
+            listeners.pop(key, None)
+
+        if key[0] is None:
+            ref = weakref.ref(callback, _remove)
+        else:
+            ref = weakref.WeakMethod(callback, _remove)
+
+        self._listeners[key] = (ref, deferred)
+        return True
+
+    def unbind(self, callback: Callable[[Any], None]) -> None:
+        key = _listener_key(callback)
+        self._listeners.pop(key, None)
+
+        with _deferred_lock:
+            _deferred.pop(key, None)
+
+    def _process_update(self):
+        if not self._listeners:
+            return
+
+        tx = _transaction
+        deferred = []
+
+        for key, (ref, is_deferred) in list(self._listeners.items()):
+            if is_deferred:
+                deferred.append((key, ref))
+            else:
+                tx.pending[key] = (ref, self)
+
+        if deferred:
+            with _deferred_lock:
+                for key, ref in deferred:
+                    _deferred[key] = (ref, self)
+
+        if tx.depth == 0 and not tx.flushing:
+            _flush(tx)
@@ -1,11 +1,11 @@
 from typing import Self, Iterable, Union
-import weakref
 import numpy as np
 
 from ..wrappers.decimal import Decimal as _decimal
+from . import notify as _notify
 
 
-class Point:
+class Point(_notify.Notifier):
 
     def __array_ufunc__(self, func, method, inputs, instance, **kwargs):
         if func == np.matmul:
@@ -66,60 +66,7 @@ class Point:
         self._y = _decimal(y)
         self._z = _decimal(z)
 
-        self._callbacks = []
-        self._ref_count = 0
-
-    def __enter__(self):
-        self._ref_count += 1
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._ref_count -= 1
-
-    def __remove_callback(self, ref):
-        try:
-            self._callbacks.remove(ref)
-        except:  # NOQA
-            pass
-
-    def bind(self, callback):
-        # we don't explicitly check to see if a callback is already registered
-        # what we care about is if a callback is called only one time and that
-        # check is done when the callbacks are being done and if there happend
-        # to be a duplicate the duplicate is then removed at that point in time.
-        ref = weakref.WeakMethod(callback, self.__remove_callback)
-
-        self._callbacks.append(ref)
-
-    def unbind(self, callback):
-        for ref in self._callbacks[:]:
-            cb = ref()
-            if cb is None:
-                self._callbacks.remove(ref)
-            elif cb == callback:
-                # we don't return after licating a matching callback in the
-                # event a callback was registered more than one time. duplicates
-                # are also removed aty the time callbacks get called but if an update
-                # to a point never occurs we want to make sure that we explicitly
-                # unbind all callbacks including duplicates.
-                self._callbacks.remove(ref)
-
-    def _process_update(self):
-        if self._ref_count:
-            return
-
-        used_callbacks = []
-        for ref in self._callbacks[:]:
-            cb = ref()
-            if cb is None:
-                self._callbacks.remove(ref)
-            elif cb not in used_callbacks:
-                cb(self)
-                used_callbacks.append(cb)
-            else:
-                # remove duplicate callbacks since we are
-                # iterating over the callbacks
-                self._callbacks.remove(ref)
+        self._init_notifier()
 
     @property
     def x(self) -> float:
@@ -281,7 +228,6 @@ class Point:
             self.x = arr[0]
             self.y = arr[1]
             self.z = arr[2]
-        self._process_update()
 
     def get_angle(self, origin: "Point") -> "_angle.Angle":
         return _angle.Angle.from_points(origin, self)
@@ -1,3 +1,4 @@
+import numpy as np
 from OpenGL import GL
 from . import utils as _utils
 
@@ -26,6 +27,13 @@ class GLMaterial:
         self.x_ray = False
         self.x_ray_color = [0.2, 0.2, 1.0, 0.35]
 
+    @property
+    def color(self):
+        if self.x_ray:
+            return self.x_ray_color
+
+        return self._color
+
     @property
     def is_opaque(self):
         if self.x_ray:
@@ -56,6 +64,28 @@ class GLMaterial:
             GL.glMaterialfv(GL.GL_FRONT, GL.GL_SPECULAR, self._specular + a)
             GL.glMaterialf(GL.GL_FRONT, GL.GL_SHININESS, self._shine)
 
+    def uniform_data(self) -> np.ndarray:
+        """
+        The material as the `Material` uniform block of `pipeline`.
+
+        specular, emission and (shininess, 0, 0, 0). The ambient and diffuse
+        colors come from the color of the object the same way
+        `GL_COLOR_MATERIAL` makes them come from `glColor` in `set`.
+        """
+        res = np.zeros(12, dtype=np.float32)
+
+        if self.x_ray:
+            res[0:4] = self.x_ray_color
+            res[4:8] = self.x_ray_color
+            res[8] = 110.0
+        else:
+            # glMaterialfv only reads the first 4 values of what `set` hands it
+            res[0:4] = (tuple(self._specular) + tuple(self._color[:-1]))[:4]
+            res[7] = 1.0
+            res[8] = self._shine
+
+        return res
+
     def unset(self):
         GL.glMaterialfv(GL.GL_FRONT, GL.GL_EMISSION, self._saved_emission)
         GL.glMaterialfv(GL.GL_FRONT, GL.GL_AMBIENT, self._saved_ambient)
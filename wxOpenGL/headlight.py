@@ -1,5 +1,6 @@
 import math
 
+import numpy as np
 from OpenGL import GL
 
 from . import config as _config
@@ -15,19 +16,21 @@ class Headlight:
         self.camera = canvas.camera
         self.light_direction = [0.0, 0.0, 0.0]
 
-        canvas.camera.position.bind(self.__update_position)
-        canvas.camera.eye.bind(self.__update_eye)
+        # the light direction is only needed when a frame gets drawn, so it
+        # is updated one time per frame no matter how many times the camera
+        # moved in between.
+        canvas.camera.position.bind(self.__update_light, deferred=True)
+        canvas.camera.eye.bind(self.__update_light, deferred=True)
 
-    def __update_light(self):
+        self.__update_light()
+
+    def __update_light(self, _=None):
         direction = self.canvas.camera.position - self.canvas.camera.eye
         magnitude = math.sqrt(sum(d ** 2 for d in direction))
-        self.light_direction = [d / magnitude for d in direction]
-
-    def __update_position(self, _):
-        self.__update_light()
+        if magnitude == 0.0:
+            return
 
-    def __update_eye(self, _):
-        self.__update_light()
+        self.light_direction = [d / magnitude for d in direction]
 
     def __call__(self):
         # Set spotlight position and direction
@@ -44,4 +47,20 @@ class Headlight:
         GL.glLightfv(GL.GL_LIGHT1, GL.GL_DIFFUSE, Config.color)  # Strong white light inside the beam
         GL.glLightfv(GL.GL_LIGHT1, GL.GL_SPECULAR, Config.color)  # Specular highlights
 
-
+    def uniform_data(self, view: np.ndarray) -> np.ndarray:
+        """
+        The headlight in eye space for the `Frame` uniform block of
+        `pipeline`: position, direction with the cosine of the cutoff in w,
+        color and (exponent, 1, 0, 0).
+        """
+        res = np.zeros(16, dtype=np.float32)
+
+        res[0:3] = view[:3, :3] @ self.canvas.camera.eye.as_numpy + view[:3, 3]
+        res[3] = 1.0
+        res[4:7] = view[:3, :3] @ np.array(self.light_direction, dtype=np.float64)
+        res[7] = math.cos(math.radians(Config.cutoff))
+        res[8:12] = Config.color
+        res[12] = Config.dissipate
+        res[13] = 1.0
+
+        return res
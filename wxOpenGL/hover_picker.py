@@ -0,0 +1,254 @@
+"""
+Picking the object that is under the mouse while it moves.
+
+Picking on a click is done on the UI thread with `Canvas.picker`.
+Doing that for every motion event blocks the UI in a large scene, so hover
+picking is done in a worker thread instead.
+
+Motion events only store the mouse position. The worker picks up the most
+recent position, waits until `Config.hover.interval` has passed since the
+last pick and then picks using a snapshot of the camera matrices and the
+bounding boxes of the objects. All of the bounding boxes are tested against
+the mouse ray at one time with numpy, which releases the GIL while it works.
+
+The result is handed back to the UI thread. A result for a position that the
+mouse has already moved away from is thrown away. When the object under the
+mouse changes the canvas draws a box around it and an
+`EVT_GL_OBJECT_HOVER` event is sent, `GetGLObject` returns `None` when the
+mouse leaves an object.
+"""
+
+from typing import TYPE_CHECKING
+
+import threading
+import time
+
+import numpy as np
+import wx
+
+from . import mouse_handler as _mouse_handler
+from . import config as _config
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+
+class _Snapshot:
+    # everything the worker needs, none of it gets changed after it is made
+    # so the worker can read it without any locks
+
+    def __init__(self, objects: list, low: np.ndarray, high: np.ndarray, owners: np.ndarray,
+                 inv_matrix: np.ndarray, viewport: np.ndarray):
+        self.objects = objects
+        self.low = low
+        self.high = high
+        self.owners = owners
+        self.inv_matrix = inv_matrix
+        self.viewport = [float(item) for item in viewport]
+
+
+def _pick(snapshot: _Snapshot, x: float, y: float):
+    # returns the object the ray under the mouse hits first
+    if not len(snapshot.owners):
+        return None
+
+    vx, vy, vw, vh = snapshot.viewport
+    ndc_x = 2.0 * (x - vx) / vw - 1.0
+    ndc_y = 2.0 * ((vh - y) - vy) / vh - 1.0
+
+    points = np.array([[ndc_x, ndc_y, -1.0, 1.0],
+                       [ndc_x, ndc_y, 1.0, 1.0]], dtype=np.float64) @ snapshot.inv_matrix.T
+
+    if np.any(np.abs(points[:, 3]) < 1e-12):
+        return None
+
+    points = points[:, :3] / points[:, 3:]
+    origin = points[0]
+    direction = points[1] - origin
+    direction /= np.linalg.norm(direction)
+
+    # an axis the ray runs parallel to would divide by 0
+    direction[np.abs(direction) < 1e-12] = 1e-12
+    inv_dir = 1.0 / direction
+
+    t1 = (snapshot.low - origin) * inv_dir
+    t2 = (snapshot.high - origin) * inv_dir
+
+    t_enter = np.minimum(t1, t2).max(axis=1)
+    t_exit = np.maximum(t1, t2).min(axis=1)
+
+    hit = (t_enter <= t_exit) & (t_exit >= 0.0)
+    if not np.any(hit):
+        return None
+
+    # the camera being inside of a box counts as a hit at the camera
+    t_enter = np.where(hit, np.maximum(t_enter, 0.0), np.inf)
+
+    return snapshot.objects[int(snapshot.owners[int(np.argmin(t_enter))])]
+
+
+class HoverPicker:
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+
+        self._snapshot = None
+        self._snapshot_key = None
+
+        self._condition = threading.Condition()
+        # (generation, x, y, snapshot) of the most recent mouse position
+        self._request = None
+        self._generation = 0
+        self._running = False
+        self._worker = None
+        self._last_pick = 0.0
+
+        self._hovered = None
+
+    @property
+    def hovered(self):
+        """
+        The object that is under the mouse.
+        """
+        return self._hovered
+
+    def _get_snapshot(self) -> _Snapshot | None:
+        camera = self.canvas.camera
+        if camera.view_matrix is None:
+            return None
+
+        key = (camera.version, self.canvas.scene_version)
+
+        if key != self._snapshot_key:
+            objects = []
+            low = []
+            high = []
+            owners = []
+
+            for obj in self.canvas.objects:
+                # the focal target is not something that can be hovered
+                if getattr(obj, 'canvas_local', False):
+                    continue
+
+                index = len(objects)
+                objects.append(obj)
+
+                for p1, p2 in obj.rect:
+                    low.append(p1.as_float)
+                    high.append(p2.as_float)
+                    owners.append(index)
+
+            self._snapshot = _Snapshot(
+                objects,
+                np.array(low, dtype=np.float64).reshape(-1, 3),
+                np.array(high, dtype=np.float64).reshape(-1, 3),
+                np.array(owners, dtype=np.int32),
+                camera.inverse_view_projection_matrix, camera.viewport)
+
+            self._snapshot_key = key
+
+        return self._snapshot
+
+    def _start_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._running = True
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    @_debug.logfunc
+    def request(self, x: int, y: int):
+        """
+        Called by the mouse handler with the position of the mouse.
+        """
+        if not Config.hover.enabled:
+            self.clear()
+            return
+
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return
+
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, float(x), float(y), snapshot)
+            self._condition.notify()
+
+        self._start_worker()
+
+    def clear(self):
+        """
+        The mouse left the canvas or hovering got turned off.
+        """
+        with self._condition:
+            # anything that is still being worked on is now stale
+            self._generation += 1
+            self._request = None
+
+        self._set_hovered(None)
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._request = None
+            self._condition.notify()
+
+        self._worker = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._request is None:
+                    self._condition.wait()
+
+                if not self._running:
+                    return
+
+            # motion events that come in while waiting replace the request,
+            # only the last position gets picked
+            wait = Config.hover.interval - (time.perf_counter() - self._last_pick)
+            if wait > 0.0:
+                time.sleep(wait)
+
+            with self._condition:
+                request = self._request
+                self._request = None
+
+            if request is None:
+                continue
+
+            generation, x, y, snapshot = request
+            self._last_pick = time.perf_counter()
+
+            try:
+                obj = _pick(snapshot, x, y)
+            except Exception:  # NOQA
+                continue
+
+            wx.CallAfter(self._deliver, generation, obj)
+
+    def _deliver(self, generation: int, obj):
+        # the mouse has moved on since this pick was asked for
+        if generation != self._generation:
+            return
+
+        self._set_hovered(obj)
+
+    def _set_hovered(self, obj):
+        if obj is self._hovered:
+            return
+
+        self._hovered = obj
+
+        # the highlight is only drawn in this canvas
+        self.canvas.InvalidateLocal()
+        self.canvas.Refresh(False)
+
+        event = _mouse_handler.GLObjectEvent(_mouse_handler.wxEVT_GL_OBJECT_HOVER)
+        event.SetId(self.canvas.GetId())
+        event.SetEventObject(self.canvas)
+        event.SetGLObject(obj)
+        self.canvas.GetEventHandler().ProcessEvent(event)
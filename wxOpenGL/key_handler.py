@@ -1,5 +1,4 @@
 import wx
-import threading
 
 from . import canvas as _canvas
 from . import config as _config
@@ -126,6 +125,12 @@ def _process_key_event(keycode: int, *keys):
             return expected_keycode
 
 
+# the keyboard speeds in the config were tuned for a 50ms tick. The amount
+# of movement for a frame is scaled to how much time passed since the last
+# frame so the speed is the same no matter what the frame rate is.
+_TICK = 0.05
+
+
 class KeyHandler:
 
     def __init__(self, canvas: "_canvas.Canvas"):
@@ -133,31 +138,33 @@ class KeyHandler:
 
         canvas.Bind(wx.EVT_KEY_UP, self._on_key_up)
         canvas.Bind(wx.EVT_KEY_DOWN, self._on_key_down)
+        canvas.Bind(wx.EVT_KILL_FOCUS, self._on_kill_focus)
 
         self._running_keycodes = {}
-        self._key_event = threading.Event()
-        self._key_queue_lock = threading.Lock()
-        self._keycode_thread = threading.Thread(target=self._key_loop)
-        self._keycode_thread.daemon = True
-        self._keycode_thread.start()
+        canvas.scheduler.add_animator(self._animate)
 
-    def _key_loop(self):
+    def _animate(self, dt: float) -> bool:
+        # called by the frame scheduler at the start of every frame
+        if not self._running_keycodes:
+            return False
 
-        while not self._key_event.is_set():
-            with self._key_queue_lock:
-                temp_queue = [[func, items['keys'], items['factor']]
-                              for func, items in self._running_keycodes.items()]
+        ticks = dt / _TICK
+        settings = Config.keyboard_settings
 
-            for func, keys, factor in temp_queue:
-                wx.CallAfter(func, factor, *list(keys))
+        for func, items in list(self._running_keycodes.items()):
+            factor = items['factor']
+            func(factor * ticks, *list(items['keys']))
 
-                if factor < Config.keyboard_settings.max_speed_factor:
-                    factor += Config.keyboard_settings.speed_factor_increment
+            if factor < settings.max_speed_factor:
+                factor += settings.speed_factor_increment * ticks
+                items['factor'] = min(factor, settings.max_speed_factor)
 
-                    with self._key_queue_lock:
-                        self._running_keycodes[func]['factor'] = factor
+        return True
 
-            self._key_event.wait(0.05)
+    def _on_kill_focus(self, evt: wx.FocusEvent):
+        # key up events are not going to arrive once the focus is gone
+        self._running_keycodes.clear()
+        evt.Skip()
 
     @_debug.logfunc
     def _on_key_up(self, evt: wx.KeyEvent):
@@ -165,16 +172,15 @@ class KeyHandler:
         evt.Skip()
 
         def remove_from_queue(func, k):
-            with self._key_queue_lock:
-                if func in self._running_keycodes:
-                    items = self._running_keycodes.pop(func)
-                    keys = list(items['keys'])
-                    if k in keys:
-                        keys.remove(k)
+            if func in self._running_keycodes:
+                items = self._running_keycodes.pop(func)
+                keys = list(items['keys'])
+                if k in keys:
+                    keys.remove(k)
 
-                    if keys:
-                        items['keys'] = set(keys)
-                        self._running_keycodes[func] = items
+                if keys:
+                    items['keys'] = set(keys)
+                    self._running_keycodes[func] = items
 
         rot = Config.rotate
         key = _process_key_event(keycode, rot.up_key, rot.down_key,
@@ -217,13 +223,16 @@ class KeyHandler:
         evt.Skip()
 
         def add_to_queue(func, k):
-            with self._key_queue_lock:
-                if func not in self._running_keycodes:
-                    self._running_keycodes[func] = dict(
-                        keys=set(),
-                        factor=Config.keyboard_settings.start_speed_factor)
+            if func not in self._running_keycodes:
+                self._running_keycodes[func] = dict(
+                    keys=set(),
+                    factor=Config.keyboard_settings.start_speed_factor)
+
+            self._running_keycodes[func]['keys'].add(k)
 
-                self._running_keycodes[func]['keys'].add(k)
+            # wakes up the frame loop, the movement happens when
+            # the frame gets drawn.
+            self.canvas.Refresh(False)
 
         rot = Config.rotate
         key = _process_key_event(keycode, rot.up_key, rot.down_key,
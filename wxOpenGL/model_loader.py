@@ -1,4 +1,7 @@
+import math
 import os
+import time
+
 import numpy as np
 
 import pyfqmr
@@ -11,36 +14,446 @@ from OCP.Vrml import Vrml_Provider
 from OCP.STEPControl import STEPControl_Reader
 from OCP.IGESControl import IGESControl_Reader
 from OCP.TopExp import TopExp_Explorer
-from OCP.TopAbs import TopAbs_FACE
+from OCP.TopAbs import TopAbs_FACE, TopAbs_SOLID
 from OCP.TopoDS import TopoDS
+from OCP.STEPCAFControl import STEPCAFControl_Reader
+from OCP.IGESCAFControl import IGESCAFControl_Reader
+from OCP.TDocStd import TDocStd_Document
+from OCP.TCollection import TCollection_ExtendedString, TCollection_AsciiString
+from OCP.XCAFDoc import XCAFDoc_DocumentTool, XCAFDoc_ShapeTool
+from OCP.TDataStd import TDataStd_Name
+from OCP.TDF import TDF_Label, TDF_LabelSequence, TDF_Tool
+from OCP.Bnd import Bnd_Box
+from OCP.BRepBndLib import BRepBndLib
 
 from .errors import ModelLoadError
 from . import debug as _debug
+from . import config as _config
 
 os.environ['PATH'] = os.path.dirname(__file__) + ';' + os.environ['PATH']
 
 import pyassimp  # NOQA
 
 
+Config = _config.Config
+
+
+def triangulate(faces) -> np.ndarray:
+    """
+    Fan triangulate polygon faces.
+
+    `faces` is either an (N, k) array or a list of index lists when the
+    polygons have different sizes. Faces with less than 3 corners are
+    dropped.
+    """
+    if isinstance(faces, np.ndarray) and faces.ndim == 2:
+        corners = faces.shape[1]
+
+        if corners < 3:
+            return np.zeros((0, 3), dtype=np.int64)
+        if corners == 3:
+            return faces.astype(np.int64, copy=False)
+
+        tris = [faces[:, [0, i, i + 1]] for i in range(1, corners - 1)]
+        # keeps the triangles of a polygon next to each other
+        return np.stack(tris, axis=1).reshape(-1, 3).astype(np.int64, copy=False)
+
+    faces = [np.asarray(face, dtype=np.int64).ravel() for face in faces]
+    if not faces:
+        return np.zeros((0, 3), dtype=np.int64)
+
+    lengths = np.array([len(face) for face in faces])
+    res = []
+
+    for corners in np.unique(lengths):
+        group = np.array([face for face, length in zip(faces, lengths)
+                          if length == corners], dtype=np.int64)
+        res.append(triangulate(group))
+
+    return np.concatenate(res)
+
+
+# offsets to a cell and half of the 26 cells around it, the other half find
+# the cell when they look for their own neighbors
+_NEIGHBOR_CELLS = np.array([[x, y, z] for x in (-1, 0, 1) for y in (-1, 0, 1)
+                            for z in (-1, 0, 1) if (x, y, z) >= (0, 0, 0)], dtype=np.int64)
+
+
+def _hash_cells(cells: np.ndarray) -> np.ndarray:
+    # two cells can end up with the same hash, that only adds vertices that
+    # get thrown out by the distance test
+    return ((cells[..., 0] * 73856093) ^
+            (cells[..., 1] * 19349663) ^
+            (cells[..., 2] * 83492791))
+
+
+def weld_vertices(vertices: np.ndarray, faces: np.ndarray,
+                  tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merge vertices that are within `tolerance` of each other.
+
+    The vertices get hashed into cells the size of the tolerance. Every
+    vertex is checked against the vertices in its own cell and the cells
+    around it so 2 vertices on either side of a cell boundary still get
+    merged. Merging carries through, when A is close to B and B is close to
+    C all 3 become one vertex.
+    """
+    # vertices that are exactly the same are the most common by far
+    vertices, inverse = np.unique(vertices, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    if tolerance <= 0.0 or len(vertices) < 2:
+        return vertices, inverse[faces]
+
+    cells = np.floor(vertices / tolerance).astype(np.int64)
+    keys = _hash_cells(cells)
+
+    order = np.argsort(keys, kind='stable')
+    cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True,
+                                                  return_counts=True)
+
+    # pairs of cells that are next to each other
+    neighbor_keys = _hash_cells(cells[order[cell_start]][:, np.newaxis] +
+                                _NEIGHBOR_CELLS).ravel()
+    found = np.minimum(np.searchsorted(cell_keys, neighbor_keys), len(cell_keys) - 1)
+    match = cell_keys[found] == neighbor_keys
+
+    cell_a = np.repeat(np.arange(len(cell_keys)), len(_NEIGHBOR_CELLS))[match]
+    cell_b = found[match]
+
+    # every vertex in one cell gets paired with every vertex in the other
+    counts = cell_count[cell_a] * cell_count[cell_b]
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell_a = np.repeat(cell_a, counts)
+    cell_b = np.repeat(cell_b, counts)
+
+    index_a = local // cell_count[cell_b]
+    index_b = local % cell_count[cell_b]
+
+    keep = (cell_a != cell_b) | (index_a < index_b)
+    first = order[cell_start[cell_a] + index_a][keep]
+    second = order[cell_start[cell_b] + index_b][keep]
+
+    distance = np.linalg.norm(vertices[first] - vertices[second], axis=1)
+    close = distance <= tolerance
+    first = first[close]
+    second = second[close]
+
+    # every vertex ends up with the lowest index of the vertices it is
+    # connected to. The pairs go both ways and get sorted by the vertex they
+    # start at once, so every round is a single reduceat over the groups.
+    source = np.concatenate((first, second))
+    target = np.concatenate((second, first))
+    edge_order = np.argsort(source, kind='stable')
+    source = source[edge_order]
+    target = target[edge_order]
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]]) if len(source) else source
+    sources = source[starts]
+
+    labels = np.arange(len(vertices))
+    while True:
+        merged = labels.copy()
+        if len(starts):
+            merged[sources] = np.minimum(merged[sources],
+                                         np.minimum.reduceat(labels[target], starts))
+        merged = merged[merged]
+
+        if np.array_equal(merged, labels):
+            break
+
+        labels = merged
+
+    used, remap = np.unique(labels, return_inverse=True)
+
+    return vertices[used], remap.ravel()[inverse][faces]
+
+
+def _remove_degenerate(vertices: np.ndarray, faces: np.ndarray, min_area: float) -> np.ndarray:
+    f0, f1, f2 = faces[:, 0], faces[:, 1], faces[:, 2]
+    keep = (f0 != f1) & (f1 != f2) & (f0 != f2)
+
+    v0 = vertices[f0]
+    area = np.linalg.norm(np.cross(vertices[f1] - v0, vertices[f2] - v0), axis=1)  # NOQA
+    keep &= area > min_area
+
+    return faces[keep]
+
+
+def _part1by2(x: np.ndarray) -> np.ndarray:
+    # spreads the lower 10 bits out so there are 2 zero bits between each
+    x = x & 0x3FF
+    x = (x | (x << 16)) & 0xFF0000FF
+    x = (x | (x << 8)) & 0x0300F00F
+    x = (x | (x << 4)) & 0x030C30C3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+
+def _sort_spatially(vertices: np.ndarray, faces: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # faces get sorted along a Morton (Z-order) curve through their centers,
+    # triangles that are near each other in space end up near each other in
+    # memory. The vertices then get renumbered in the order the faces first
+    # use them which also drops any vertex that isn't used.
+    #
+    # This is not a vertex cache optimization (Forsyth/Tipsify). The objects
+    # get drawn from de-indexed triangles so there is no post transform
+    # cache to optimize for.
+    centers = vertices[faces].mean(axis=1)
+    low = centers.min(axis=0)
+    size = np.maximum(centers.max(axis=0) - low, 1e-12)
+    cells = ((centers - low) / size * 1023.0).astype(np.int64)
+
+    codes = (_part1by2(cells[:, 0]) |
+             (_part1by2(cells[:, 1]) << 1) |
+             (_part1by2(cells[:, 2]) << 2))
+
+    faces = faces[np.argsort(codes, kind='stable')]
+
+    flat = faces.ravel()
+    used, first_use = np.unique(flat, return_index=True)
+    vertex_order = used[np.argsort(first_use)]
+
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[vertex_order] = np.arange(len(vertex_order))
+
+    return vertices[vertex_order], remap[flat].reshape(-1, 3)
+
+
+@_debug.logfunc
+def optimize_mesh(vertices, faces, tolerance: float | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Clean up a mesh after it has been loaded.
+
+    Polygons get triangulated, vertices that are within the tolerance of
+    each other are welded, degenerate triangles get removed and the faces
+    and vertices are sorted so the ones that are close to each other in
+    space are close to each other in memory.
+
+    `tolerance` is an absolute distance, when `None` it is
+    `Config.mesh.weld_tolerance` times the size of the mesh.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    faces = triangulate(faces)
+
+    if not len(vertices) or not len(faces):
+        return vertices, faces.astype(np.int32)
+
+    if tolerance is None:
+        diagonal = float(np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0)))
+        tolerance = diagonal * Config.mesh.weld_tolerance
+
+    vertices, faces = weld_vertices(vertices, faces, tolerance)
+    faces = _remove_degenerate(vertices, faces, tolerance * tolerance)
+
+    if not len(faces):
+        return np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32)
+
+    vertices, faces = _sort_spatially(vertices, faces)
+
+    return vertices, faces.astype(np.int32)
+
+
+def _optimize(data: list[list[np.ndarray]]) -> list[list[np.ndarray]]:
+    if not Config.mesh.optimize:
+        return data
+
+    return [list(optimize_mesh(vertices, faces)) for vertices, faces in data]
+
+
+class TessellationPolicy:
+    """
+    Picks how finely each solid gets tessellated.
+
+    A deflection that is relative to the size of each solid gives a screw
+    as many triangles as the housing it goes into. The linear deflection is
+    instead picked for the whole model so the number of triangles comes out
+    close to `budget` and then clamped for each solid so small parts are not
+    left as boxes and large parts don't get more triangles than anyone is
+    able to see.
+
+    The number of triangles for a surface is estimated as the area divided
+    by the size of the part and the deflection. That is close for curved
+    surfaces and high for flat ones, which only makes the estimate
+    conservative.
+
+    All of the limits are relative to the diagonal of the bounding box of
+    the solid.
+    """
+
+    def __init__(self, budget: int | None = None,
+                 min_deflection: float | None = None,
+                 max_deflection: float | None = None,
+                 angular_deflection: float | None = None,
+                 max_angular_deflection: float | None = None):
+
+        settings = Config.tessellation
+
+        self.budget = settings.triangle_budget if budget is None else budget
+        self.min_deflection = (
+            settings.min_deflection if min_deflection is None else min_deflection)
+        self.max_deflection = (
+            settings.max_deflection if max_deflection is None else max_deflection)
+        self.angular_deflection = (
+            settings.angular_deflection if angular_deflection is None else angular_deflection)
+        self.max_angular_deflection = (
+            settings.max_angular_deflection if max_angular_deflection is None
+            else max_angular_deflection)
+
+    @staticmethod
+    def measure(shape) -> tuple[float, float]:
+        """
+        Returns the diagonal and the surface area of the bounding box.
+        """
+        box = Bnd_Box()
+        BRepBndLib.Add_s(shape, box, False)
+
+        if box.IsVoid():
+            return 0.0, 0.0
+
+        xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
+        dx = xmax - xmin
+        dy = ymax - ymin
+        dz = zmax - zmin
+
+        return math.sqrt(dx * dx + dy * dy + dz * dz), 2.0 * (dx * dy + dy * dz + dx * dz)
+
+    @staticmethod
+    def estimate_triangles(size: float, area: float, linear: float) -> float:
+        return area / max(size * linear, 1e-12)
+
+    def clamp(self, size: float, linear: float, model_size: float) -> tuple[float, float]:
+        """
+        Limits a linear deflection for a solid and picks the angular
+        deflection to go with it.
+
+        The angular deflection is what sets the number of segments around
+        a hole or a shaft. Small solids get a larger angle, the full
+        `angular_deflection` is only used for solids the size of the model.
+        """
+        size = max(size, 1e-9)
+
+        linear = min(max(linear, size * self.min_deflection), size * self.max_deflection)
+        angular = min(self.angular_deflection * math.sqrt(max(model_size, size) / size),
+                      self.max_angular_deflection)
+
+        return linear, angular
+
+    def plan(self, shapes: list) -> list[tuple[float, float]]:
+        """
+        Returns the linear (absolute) and angular deflection for each shape.
+        """
+        measures = [self.measure(shape) for shape in shapes]
+        if not measures:
+            return []
+
+        model_size = max(size for size, _ in measures)
+        total = sum(area / max(size, 1e-9) for size, area in measures)
+        linear = total / max(self.budget, 1)
+
+        return [self.clamp(size, linear, model_size) for size, _ in measures]
+
+    def view_deflection(self, distance: float, viewport_height: int, fov: float) -> float:
+        """
+        Linear deflection that keeps the error under `Config.tessellation.pixel_error`
+        pixels for something `distance` away from the camera.
+        """
+        world_per_pixel = (2.0 * distance * math.tan(math.radians(fov) / 2.0) /
+                           max(viewport_height, 1))
+
+        return world_per_pixel * Config.tessellation.pixel_error
+
+
+class TessellatedSolid:
+    """
+    A solid along with the deflection it was tessellated with.
+
+    The shape is kept so the solid can be tessellated again at a finer
+    quality later on.
+    """
+
+    def __init__(self, shape, vertices: np.ndarray, faces: np.ndarray,
+                 size: float, linear: float, angular: float):
+        self.shape = shape
+        self.vertices = vertices
+        self.faces = faces
+        self.size = size
+        self.linear = linear
+        self.angular = angular
+
+
+def _ocp_solids(shape) -> list:
+    solids = []
+
+    explorer = TopExp_Explorer(shape, TopAbs_SOLID)
+    while explorer.More():
+        solids.append(explorer.Current())
+        explorer.Next()
+
+    if not solids:
+        # surface models don't have any solids
+        solids = [shape]
+
+    return solids
+
+
+def tessellate(shape, linear: float, angular: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Tessellates a shape using an absolute linear deflection.
+
+    OCP only meshes a shape again when the deflection is finer than the
+    one it already has so this is cheap when nothing would change.
+    """
+    BRepMesh_IncrementalMesh(theShape=shape, theLinDeflection=linear,
+                             isRelative=False, theAngDeflection=angular, isInParallel=True)
+
+    return _ocp_read_faces(shape)
+
+
 @_debug.logfunc
-def _ocp_read_shape(shape):
+def _ocp_read_shape(shape, policy: TessellationPolicy | None = None,
+                    plan: list[tuple[float, float]] | None = None):
+    # `plan` is the deflections for each solid in the shape when they were
+    # picked along with the rest of a model
+    solids = _ocp_solids(shape)
+
+    if plan is None:
+        if policy is None:
+            policy = TessellationPolicy()
+
+        plan = policy.plan(solids)
 
-    BRepMesh_IncrementalMesh(theShape=shape, theLinDeflection=0.001,
-                             isRelative=True, theAngDeflection=0.1, isInParallel=True)
+    meshes = []
 
+    for solid, (linear, angular) in zip(solids, plan):
+        vertices, faces = tessellate(solid, linear, angular)
+        if len(faces):
+            meshes.append([vertices, faces])
+
+    if not meshes:
+        return np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32)
+
+    return tuple(_merge_meshes(meshes))
+
+
+def _ocp_read_faces(shape):
     vertices = []
     faces = []
     offset = 0
 
     anExpSF = TopExp_Explorer(shape, TopAbs_FACE)
     while anExpSF.More():
-        if anExpSF.Current().ShapeType() != TopAbs_FACE:
+        current = anExpSF.Current()
+        # moving to the next face has to happen before anything that
+        # skips a face, otherwise the loop never ends.
+        anExpSF.Next()
+
+        if current.ShapeType() != TopAbs_FACE:
             continue
 
         aLoc = TopLoc_Location()
 
         poly_triangulation = (
-            BRep_Tool.Triangulation_s(TopoDS.Face_s(anExpSF.Current()), aLoc))  # NOQA
+            BRep_Tool.Triangulation_s(TopoDS.Face_s(current), aLoc))  # NOQA
 
         if not poly_triangulation:
             continue
@@ -53,17 +466,16 @@ def _ocp_read_shape(shape):
             pnt = (gp_pnt.X(), gp_pnt.Y(), gp_pnt.Z())
             vertices.append(pnt)
 
-        facet_reversed = anExpSF.Current().Orientation() == TopAbs_REVERSED
+        facet_reversed = current.Orientation() == TopAbs_REVERSED
 
         order = [1, 3, 2] if facet_reversed else [1, 2, 3]
         for tri in poly_triangulation.Triangles():
             faces.append([tri.Value(i) + offset - 1 for i in order])
 
         offset += node_count
-        anExpSF.Next()
 
-    vertices = np.array(vertices, dtype=np.float64)
-    faces = np.array(faces, dtype=np.int32)
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+    faces = np.array(faces, dtype=np.int32).reshape(-1, 3)
 
     return vertices, faces
 
@@ -78,54 +490,317 @@ def _load_with_assimp(path):
 
     return data
 
+
+# the file types that get read with OCP instead of assimp
+_OCP_FORMATS = {
+    '.step': 'step',
+    '.stp': 'step',
+    '.iges': 'iges',
+    '.igs': 'iges',
+    '.vrml': 'vrml'
+}
+
+
+def _ocp_format(file) -> str | None:
+    return _OCP_FORMATS.get(os.path.splitext(file)[1].lower(), None)
+
+
+def is_brep_file(file) -> bool:
+    """
+    STEP and IGES files, the faces of these get welded together when they
+    are loaded so the edges between them need a crease angle.
+    """
+    return _ocp_format(file) in ('step', 'iges')
+
+
+def _is_ocp_file(file) -> bool:
+    return _ocp_format(file) is not None
+
+
 @_debug.logfunc
-def _load_vrml(file):
-    reader = Vrml_Provider()
+def _read_ocp_shape(file):
+    file_format = _ocp_format(file)
+
+    if file_format == 'vrml':
+        reader = Vrml_Provider()
+    elif file_format == 'iges':
+        reader = IGESControl_Reader()
+    elif file_format == 'step':
+        reader = STEPControl_Reader()
+    else:
+        raise ModelLoadError(f'"{file}" is not a B-rep file')
+
     reader.ReadFile(file)
-    reader.TransferRoots()
-    shape = reader.Shape()
+    reader.TransferRoots()  # NOQA
+    return reader.Shape()
 
-    vertices, faces = _ocp_read_shape(shape)
 
+@_debug.logfunc
+def _load_vrml(file):
+    vertices, faces = _ocp_read_shape(_read_ocp_shape(file))
     return [[vertices, faces]]
 
+
 @_debug.logfunc
 def _load_step(file):
-    step_reader = STEPControl_Reader()
-    step_reader.ReadFile(file)
-    step_reader.TransferRoots()  # NOQA
-    shape = step_reader.Shape()
+    vertices, faces = _ocp_read_shape(_read_ocp_shape(file))
+    return [[vertices, faces]]
 
-    vertices, faces = _ocp_read_shape(shape)
 
+@_debug.logfunc
+def _load_iges(file):
+    vertices, faces = _ocp_read_shape(_read_ocp_shape(file))
     return [[vertices, faces]]
 
+
+def _merge_meshes(meshes: list[list[np.ndarray]]) -> list[np.ndarray]:
+    if len(meshes) == 1:
+        return meshes[0]
+
+    offsets = np.cumsum([0] + [len(vertices) for vertices, _ in meshes[:-1]])
+    vertices = np.concatenate([vertices for vertices, _ in meshes])
+    faces = np.concatenate([faces + offset for (_, faces), offset in zip(meshes, offsets)])
+
+    return [vertices, faces]
+
+
 @_debug.logfunc
-def _load_iges(file):
-    reader = IGESControl_Reader()
-    reader.ReadFile(file)
-    reader.TransferRoots()  # NOQA
-    shape = reader.Shape()
+def load_solids(file, policy: TessellationPolicy | None = None) -> list[TessellatedSolid]:
+    """
+    Load a STEP, IGES or VRML file as separate solids.
 
-    vertices, faces = _ocp_read_shape(shape)
+    Unlike `load` the solids are not merged together and the OCP shapes
+    are kept so they can be tessellated again.
+    """
+    if not _is_ocp_file(file):
+        raise ModelLoadError(f'"{file}" is not a B-rep file')
 
-    return [[vertices, faces]]
+    if policy is None:
+        policy = TessellationPolicy()
+
+    solids = _ocp_solids(_read_ocp_shape(file))
+    res = []
+
+    for solid, (linear, angular) in zip(solids, policy.plan(solids)):
+        vertices, faces = tessellate(solid, linear, angular)
+        if not len(faces):
+            continue
+
+        vertices, faces = _optimize([[vertices, faces]])[0]
+        size, _ = policy.measure(solid)
+        res.append(TessellatedSolid(solid, vertices, faces, size, linear, angular))
+
+    return res
+
+
+def stream(file, chunk_size: int | None = None, interval: float | None = None):
+    """
+    Generator that yields [vertices, faces] while a model is being loaded.
+
+    STEP, IGES and VRML files are tessellated one solid at a time. Solids get
+    grouped together until there are `chunk_size` triangles or `interval`
+    seconds have passed since the last chunk, the first chunk shows up
+    quickly and small solids don't each end up as a mesh of their own.
+
+    Reading the file happens before the first chunk, OCP has to read all of
+    it before any of the shapes can be used. Other formats are read in a
+    single step and every mesh in the file is yielded as a chunk.
+    """
+    if chunk_size is None:
+        chunk_size = Config.mesh.stream_chunk_size
+    if interval is None:
+        interval = Config.mesh.stream_interval
+
+    if not _is_ocp_file(file):
+        yield from load(file)
+        return
+
+    parts = _ocp_solids(_read_ocp_shape(file))
+
+    pending = []
+    count = 0
+    last = time.perf_counter()
+
+    for part, (linear, angular) in zip(parts, TessellationPolicy().plan(parts)):
+        vertices, faces = tessellate(part, linear, angular)
+        if not len(faces):
+            continue
+
+        pending.append([vertices, faces])
+        count += len(faces)
+
+        if count >= chunk_size or time.perf_counter() - last >= interval:
+            yield _optimize([_merge_meshes(pending)])[0]
+
+            pending = []
+            count = 0
+            last = time.perf_counter()
+
+    if pending:
+        yield _optimize([_merge_meshes(pending)])[0]
+
+
+class AssemblyOccurrence:
+    """
+    A single placement of a part in an assembly.
+
+    `mesh` is the key of the tessellated shape in the meshes returned by
+    `load_assembly`. Parts that get used more than one time share the same
+    key. `matrix` is a row-major 4x4 that places the part in the assembly
+    and `path` holds the names of the parent assemblies.
+    """
+
+    def __init__(self, name: str, path: tuple[str, ...], mesh: str, matrix: np.ndarray):
+        self.name = name
+        self.path = path
+        self.mesh = mesh
+        self.matrix = matrix
+
+    def transform(self, vertices: np.ndarray) -> np.ndarray:
+        return vertices @ self.matrix[:3, :3].T + self.matrix[:3, 3]
+
+
+def _label_name(label) -> str:
+    name_attr = TDataStd_Name()
+    if label.FindAttribute(TDataStd_Name.GetID_s(), name_attr):
+        return name_attr.Get().ToExtString()
+
+    return ''
+
+
+def _label_entry(label) -> str:
+    entry = TCollection_AsciiString()
+    TDF_Tool.Entry_s(label, entry)
+    return entry.ToCString()
+
+
+def _location_matrix(location) -> np.ndarray:
+    trsf = location.Transformation()
+    matrix = np.identity(4, dtype=np.float64)
+
+    for row in range(3):
+        for col in range(4):
+            matrix[row, col] = trsf.Value(row + 1, col + 1)
+
+    return matrix
+
+
+@_debug.logfunc
+def _read_assembly(reader, file):
+    doc = TDocStd_Document(TCollection_ExtendedString('XmlOcaf'))
+    reader.SetNameMode(True)
+
+    if not reader.ReadFile(file) or not reader.Transfer(doc):
+        raise ModelLoadError(f'unable to read "{file}"')
+
+    shape_tool = XCAFDoc_DocumentTool.ShapeTool_s(doc.Main())
+
+    shapes = {}
+    occurrences = []
+
+    def _walk(label, location, path, name):
+        if XCAFDoc_ShapeTool.IsAssembly_s(label):
+            path = path + (name or _label_name(label),)
+
+            components = TDF_LabelSequence()
+            XCAFDoc_ShapeTool.GetComponents_s(label, components, False)
+
+            for i in range(1, components.Length() + 1):
+                component = components.Value(i)
+                referred = TDF_Label()
+                XCAFDoc_ShapeTool.GetReferredShape_s(component, referred)
+
+                _walk(referred,
+                      location.Multiplied(XCAFDoc_ShapeTool.GetLocation_s(component)),
+                      path, _label_name(component) or _label_name(referred))
+            return
+
+        # STEP expresses repeated parts as references to the same
+        # label, each unique shape only gets tessellated one time.
+        key = _label_entry(label)
+        if key not in shapes:
+            shapes[key] = XCAFDoc_ShapeTool.GetShape_s(label)
+
+        occurrences.append(AssemblyOccurrence(
+            name or _label_name(label), path, key, _location_matrix(location)))
+
+    labels = TDF_LabelSequence()
+    shape_tool.GetFreeShapes(labels)
+
+    for i in range(1, labels.Length() + 1):
+        label = labels.Value(i)
+        _walk(label, XCAFDoc_ShapeTool.GetLocation_s(label), (), _label_name(label))
+
+    # the deflections get picked for all of the shapes at one time so the
+    # triangle budget and the angular deflection are for the whole model
+    # and not for each part on its own
+    solids = {key: _ocp_solids(shape) for key, shape in shapes.items()}
+    plan = TessellationPolicy().plan([solid for value in solids.values() for solid in value])
+
+    meshes = {}
+    start = 0
+
+    for key, shape in shapes.items():
+        stop = start + len(solids[key])
+        meshes[key] = _optimize([list(_ocp_read_shape(shape, plan=plan[start:stop]))])[0]
+        start = stop
+
+    return meshes, occurrences
+
+
+@_debug.logfunc
+def load_assembly(file) -> tuple[dict[str, list[np.ndarray]], list[AssemblyOccurrence]]:
+    """
+    Load a model keeping the assembly structure.
+
+    Returns the unique tessellated shapes keyed by an id and the list of
+    occurrences that place those shapes. Formats that don't have an assembly
+    structure give back one occurrence for each mesh in the file.
+    """
+    file_format = _ocp_format(file)
+
+    if file_format == 'step':
+        return _read_assembly(STEPCAFControl_Reader(), file)
+    elif file_format == 'iges':
+        return _read_assembly(IGESCAFControl_Reader(), file)
+
+    meshes = {}
+    occurrences = []
+    name = os.path.splitext(os.path.basename(file))[0]
+
+    for i, (vertices, faces) in enumerate(load(file)):
+        key = str(i)
+        meshes[key] = [vertices, faces]
+        occurrences.append(AssemblyOccurrence(
+            name, (), key, np.identity(4, dtype=np.float64)))
+
+    return meshes, occurrences
 
 
 @_debug.logfunc
 def load(file):
-    if file.endswith('.vrml'):
-        return _load_vrml(file)
-    elif file.endswith('.iges'):
-        return _load_iges(file)
-    elif file.endswith('.step') or file.endswith('stp'):
-        return _load_step(file)
+    """
+    Load a model as a list of [vertices, faces].
+
+    The meshes get run through `optimize_mesh` if `Config.mesh.optimize`
+    is set.
+    """
+    file_format = _ocp_format(file)
+
+    if file_format == 'vrml':
+        data = _load_vrml(file)
+    elif file_format == 'iges':
+        data = _load_iges(file)
+    elif file_format == 'step':
+        data = _load_step(file)
     else:
         try:
-            return _load_with_assimp(file)
+            data = _load_with_assimp(file)
         except Exception as err:
             raise ModelLoadError from err
 
+    return _optimize(data)
+
 
 @_debug.logfunc
 def reduce_triangles(verts: np.ndarray, faces: np.ndarray, target_count: int,
@@ -2,7 +2,7 @@ import wx
 
 from . import canvas as _canvas
 from . import dragging as _dragging
-from . import object_picker as _object_picker
+from . import selection as _selection
 from . import arcball as _arcball
 from .geometry import point as _point
 
@@ -58,6 +58,12 @@ EVT_GL_OBJECT_AUX2_CLICK = wx.PyEventBinder(wxEVT_GL_OBJECT_AUX2_CLICK, 0)
 wxEVT_GL_OBJECT_AUX2_DCLICK = wx.NewEventType()
 EVT_GL_OBJECT_AUX2_DCLICK = wx.PyEventBinder(wxEVT_GL_OBJECT_AUX2_DCLICK, 0)
 
+wxEVT_GL_OBJECT_HOVER = wx.NewEventType()
+EVT_GL_OBJECT_HOVER = wx.PyEventBinder(wxEVT_GL_OBJECT_HOVER, 0)
+
+wxEVT_GL_SELECTION_CHANGED = wx.NewEventType()
+EVT_GL_SELECTION_CHANGED = wx.PyEventBinder(wxEVT_GL_SELECTION_CHANGED, 0)
+
 
 class GLObjectEvent(wx.CommandEvent):
 
@@ -66,12 +72,25 @@ class GLObjectEvent(wx.CommandEvent):
         self._gl_object = None
 
     def GetGLObject(self):
-        return not self._gl_object
+        return self._gl_object
 
     def SetGLObject(self, obj):
         self._gl_object = obj
 
 
+class GLSelectionEvent(wx.CommandEvent):
+
+    def __init__(self, evtType):
+        wx.CommandEvent.__init__(self, evtType)
+        self._gl_objects = []
+
+    def GetGLObjects(self):
+        return self._gl_objects
+
+    def SetGLObjects(self, objs):
+        self._gl_objects = objs
+
+
 class MouseHandler:
 
     def __init__(self, canvas: _canvas.Canvas):
@@ -104,6 +123,7 @@ class MouseHandler:
 
         canvas.Bind(wx.EVT_MOTION, self.on_mouse_motion)
         canvas.Bind(wx.EVT_MOUSEWHEEL, self.on_mouse_wheel)
+        canvas.Bind(wx.EVT_LEAVE_WINDOW, self.on_leave_window)
 
     @_debug.logfunc
     def _process_mouse(self, code):
@@ -140,8 +160,18 @@ class MouseHandler:
         self.mouse_pos = mouse_pos
         self.is_motion = False
 
+        if evt.ShiftDown() and Config.selection.enabled:
+            # box selection, a lasso when control is held as well
+            self.canvas.selection_tool = _selection.SelectionTool(
+                self.canvas, x, y, evt.ControlDown())
+
+            if not self.canvas.HasCapture():
+                self.canvas.CaptureMouse()
+
+            return
+
         refresh = False
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
 
         if selected:
             with self.canvas:
@@ -159,7 +189,26 @@ class MouseHandler:
     def on_left_up(self, evt: wx.MouseEvent):
         refresh = False
 
+        tool = self.canvas.selection_tool
+        if tool is not None:
+            tool.update(*evt.GetPosition())
+            tool.finish()
+            self.canvas.selection_tool = None
+
+            self.mouse_pos = None
+            self.is_motion = False
+
+            if self.canvas.HasCapture():
+                self.canvas.ReleaseMouse()
+
+            return
+
         with self.canvas:
+            if not self.is_motion and len(self.canvas.selection) > 1:
+                # clicking drops a box or lasso selection
+                self.canvas.SetSelection([])
+                refresh = True
+
             if self.is_motion:
                 if self._drag_obj is not None:
                     self._drag_obj = None
@@ -173,7 +222,7 @@ class MouseHandler:
                     self._drag_obj = None
                     refresh = True
 
-                selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+                selected = self.canvas.picker.find_object(mouse_pos)
                 if selected:
                     if self.canvas.selected == selected:
                         selected.set_selected(False)
@@ -224,7 +273,7 @@ class MouseHandler:
         mouse_pos = _point.Point(x, y)
         refresh = False
 
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
         with self.canvas:
             if selected:
                 event = GLObjectEvent(wxEVT_GL_OBJECT_ACTIVATED)
@@ -246,7 +295,7 @@ class MouseHandler:
             with self.canvas:
                 x, y = evt.GetPosition()
                 mouse_pos = _point.Point(x, y)
-                selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+                selected = self.canvas.picker.find_object(mouse_pos)
 
                 if selected:
                     event = GLObjectEvent(wxEVT_GL_OBJECT_MIDDLE_CLICK)
@@ -285,7 +334,7 @@ class MouseHandler:
         mouse_pos = _point.Point(x, y)
         refresh = False
 
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
         with self.canvas:
             if selected:
                 event = GLObjectEvent(wxEVT_GL_OBJECT_MIDDLE_DCLICK)
@@ -312,7 +361,7 @@ class MouseHandler:
                 x, y = evt.GetPosition()
                 mouse_pos = _point.Point(x, y)
 
-                selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+                selected = self.canvas.picker.find_object(mouse_pos)
 
                 if self._arcball is None:
                     if selected:
@@ -346,7 +395,7 @@ class MouseHandler:
         mouse_pos = _point.Point(x, y)
         self.mouse_pos = mouse_pos
 
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
         if selected and self.canvas.selected == selected:
             self._arcball = _arcball.Arcball(self.canvas, selected)
             refresh = True
@@ -362,7 +411,7 @@ class MouseHandler:
         mouse_pos = _point.Point(x, y)
         refresh = False
 
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
         with self.canvas:
             if selected:
                 event = GLObjectEvent(wxEVT_GL_OBJECT_RIGHT_DCLICK)
@@ -402,6 +451,13 @@ class MouseHandler:
             delta = mouse_pos - self.mouse_pos
             self.mouse_pos = mouse_pos
 
+            tool = self.canvas.selection_tool
+            if tool is not None and evt.LeftIsDown():
+                self.is_motion = True
+                tool.update(x, y)
+                evt.Skip()
+                return
+
             with self.canvas:
                 if evt.LeftIsDown():
                     self.is_motion = True
@@ -438,11 +494,19 @@ class MouseHandler:
                     self._process_mouse(MOUSE_AUX2)(*list(delta)[:-1])
                     refresh = True
 
+        else:
+            x, y = evt.GetPosition()
+            self.canvas.hover_picker.request(x, y)
+
         if refresh:
             self.canvas.Refresh(False)
 
         evt.Skip()
 
+    def on_leave_window(self, evt: wx.MouseEvent):
+        self.canvas.hover_picker.clear()
+        evt.Skip()
+
     @_debug.logfunc
     def on_aux1_up(self, evt: wx.MouseEvent):
         refresh = False
@@ -451,7 +515,7 @@ class MouseHandler:
             with self.canvas:
                 x, y = evt.GetPosition()
                 mouse_pos = _point.Point(x, y)
-                selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+                selected = self.canvas.picker.find_object(mouse_pos)
 
                 if selected:
                     event = GLObjectEvent(wxEVT_GL_OBJECT_AUX1_CLICK)
@@ -484,7 +548,7 @@ class MouseHandler:
     def on_aux1_dclick(self, evt: wx.MouseEvent):
         x, y = evt.GetPosition()
         mouse_pos = _point.Point(x, y)
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
 
         refresh = False
 
@@ -509,7 +573,7 @@ class MouseHandler:
             with self.canvas:
                 x, y = evt.GetPosition()
                 mouse_pos = _point.Point(x, y)
-                selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+                selected = self.canvas.picker.find_object(mouse_pos)
 
                 if selected:
                     event = GLObjectEvent(wxEVT_GL_OBJECT_AUX2_CLICK)
@@ -542,7 +606,7 @@ class MouseHandler:
     def on_aux2_dclick(self, evt: wx.MouseEvent):
         x, y = evt.GetPosition()
         mouse_pos = _point.Point(x, y)
-        selected = _object_picker.find_object(mouse_pos, self.canvas._objects)
+        selected = self.canvas.picker.find_object(mouse_pos)
 
         refresh = False
 
@@ -0,0 +1,158 @@
+"""
+Normal calculation for meshes.
+
+All of the functions here take indexed vertices and faces and return the
+de-indexed triangles, the normals for every corner of every triangle and the
+number of vertices to draw, which is what `Base3D` stores.
+
+Smoothed normals used to be accumulated with `np.add.at` which is an
+unbuffered scatter and is very slow. The sums are now done with
+`np.bincount` one axis at a time. The faces are processed in chunks so the
+temporary arrays stay bounded no matter how large the mesh is.
+
+Passing a crease angle keeps edges sharp where the faces meet at an angle
+larger than the crease angle while still smoothing the faces that are close
+to each other, a fillet gets smoothed and the edge of a box stays sharp.
+"""
+
+import math
+
+import numpy as np
+
+
+# number of faces that get processed at a time, this bounds the size of the
+# temporary arrays to roughly CHUNK_SIZE * 3 * 3 * 8 bytes for each one.
+CHUNK_SIZE = 1 << 20
+
+_EPSILON = 1e-6
+
+
+def face_normals(vertices: np.ndarray, faces: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the unit face normals and the raw (area weighted) face normals.
+
+    Degenerate faces have a unit normal of zero.
+    """
+    v0 = vertices[faces[:, 0]]
+    raw = np.cross(vertices[faces[:, 1]] - v0, vertices[faces[:, 2]] - v0)  # NOQA
+
+    norm = np.linalg.norm(raw, axis=1, keepdims=True)
+    unit = raw / np.maximum(norm, _EPSILON)
+    unit[norm[:, 0] < _EPSILON] = 0.0
+
+    return unit, raw
+
+
+def _normalize(normals: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    res = normals / np.maximum(norm, _EPSILON)
+    res[norm[:, 0] < _EPSILON] = 0.0
+    return res
+
+
+def flat_normals(vertices: np.ndarray, faces: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+    unit, _ = face_normals(vertices, faces)
+    normals = np.repeat(unit, 3, axis=0)
+
+    return vertices[faces], normals, len(faces) * 3
+
+
+def vertex_normals(vertices: np.ndarray, faces: np.ndarray,
+                   chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Area weighted normal for every vertex.
+    """
+    vertex_count = len(vertices)
+    sums = np.zeros((vertex_count, 3), dtype=np.float64)
+
+    for start in range(0, len(faces), chunk_size):
+        chunk = faces[start:start + chunk_size]
+        unit, raw = face_normals(vertices, chunk)
+        # the raw normals are used for the weighting, larger faces have more
+        # influence on the normal than small slivers do.
+        weights = np.repeat(raw, 3, axis=0)
+        indices = chunk.ravel()
+
+        for axis in range(3):
+            sums[:, axis] += np.bincount(indices, weights=weights[:, axis],
+                                         minlength=vertex_count)
+
+    return _normalize(sums)
+
+
+def _crease_normals(vertices: np.ndarray, faces: np.ndarray, cos_crease: float,
+                    chunk_size: int) -> np.ndarray:
+
+    unit, raw = face_normals(vertices, faces)
+
+    corner_vertex = faces.ravel()
+    corner_count = len(corner_vertex)
+
+    degree = np.bincount(corner_vertex, minlength=len(vertices))[corner_vertex]
+
+    # The corners get sorted by how many faces share the vertex (most first)
+    # and then by the vertex. Every vertex ends up as a contiguous group and
+    # the groups that still have corners left to compare against are always
+    # at the front of the array.
+    order = np.lexsort((corner_vertex, -degree))
+    sorted_vertex = corner_vertex[order]
+    sorted_degree = degree[order]
+    sorted_face = order // 3
+
+    positions = np.arange(corner_count)
+    group_change = np.ones(corner_count, dtype=bool)
+    group_change[1:] = sorted_vertex[1:] != sorted_vertex[:-1]
+    group_start = np.maximum.accumulate(np.where(group_change, positions, 0))
+    local_index = positions - group_start
+
+    corner_unit = unit[sorted_face]
+    corner_raw = raw[sorted_face]
+    sums = np.zeros((corner_count, 3), dtype=np.float64)
+    neg_degree = -sorted_degree
+
+    # every corner is compared to every other corner of the same vertex,
+    # offset 0 is the corner itself.
+    for offset in range(int(sorted_degree[0]) if corner_count else 0):
+        active = int(np.searchsorted(neg_degree, -offset, side='left'))
+
+        for start in range(0, active, chunk_size):
+            stop = min(start + chunk_size, active)
+
+            degree_chunk = sorted_degree[start:stop]
+            partner = (group_start[start:stop] +
+                       (local_index[start:stop] + offset) % degree_chunk)
+
+            dots = np.einsum('ij,ij->i', corner_unit[start:stop], corner_unit[partner])
+            # multiplying by the mask is a lot faster than boolean indexing
+            keep = (dots >= cos_crease)[:, np.newaxis]
+            sums[start:stop] += corner_raw[partner] * keep
+
+    normals = np.empty_like(sums)
+    normals[order] = _normalize(sums)
+
+    # corners where everything cancelled out get the face normal
+    missing = ~normals.any(axis=1)
+    if np.any(missing):
+        normals[missing] = unit[np.nonzero(missing)[0] // 3]
+
+    return normals
+
+
+def smooth_normals(vertices: np.ndarray, faces: np.ndarray,
+                   crease_angle: float | None = None,
+                   chunk_size: int = CHUNK_SIZE) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Smoothed normals with an optional crease angle in degrees.
+
+    Faces that meet at an angle larger than the crease angle do not get
+    smoothed with each other. `None` smooths everything.
+    """
+    if crease_angle is None or crease_angle >= 180.0:
+        normals = vertex_normals(vertices, faces, chunk_size)[faces].reshape(-1, 3)
+    elif crease_angle <= 0.0:
+        return flat_normals(vertices, faces)
+    else:
+        cos_crease = math.cos(math.radians(crease_angle))
+        normals = _crease_normals(vertices, faces, cos_crease, chunk_size)
+
+    return vertices[faces], normals, len(faces) * 3
@@ -12,12 +12,18 @@ This file provides:
  - example pick-on-click handler that cycles candidates on repeated clicks
 """
 
+from typing import TYPE_CHECKING
+
 import numpy as np
 from OpenGL.GL import *
 from math import inf
 
+from . import selection as _selection
 from . import debug as _debug
 
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
 
 @_debug.logfunc
 def _gl_get_matrices():
@@ -278,14 +284,6 @@ def _ray_intersect_obb_via_local_aabb(orig_world, dir_world, local_min,
     return _ray_intersect_aabb(o_local, d_local, local_min, local_max)
 
 
-# Candidate picking + cycling
-last_pick_state = {
-    'mouse_pos': None,
-    'candidates': [],
-    'index': 0
-}
-
-
 @_debug.logfunc
 def _pick_candidates_at_mouse(mx, my, scene_objects, mv=None, pj=None, viewport=None,
                              mouse_is_top_left=True, tol_pixels=3.0, max_candidates=128):  # NOQA
@@ -322,24 +320,15 @@ def _pick_candidates_at_mouse(mx, my, scene_objects, mv=None, pj=None, viewport=
 
 @_debug.logfunc
 def find_object(mouse_pos, scene_objects):
+    """
+    Pick without a cache, this reads the matrices back from OpenGL and
+    projects every bounding box. A canvas picks with `Canvas.picker`.
+    """
     mx, my = mouse_pos.as_float[:-1]
 
     mv, pj, vp = _gl_get_matrices()
-    move_thresh = 4.0
-
-    # refresh candidate list if mouse moved significantly
-    if last_pick_state['mouse_pos'] is None:
-        moved = True
-    else:
-        moved = np.hypot(mx - last_pick_state['mouse_pos'][0],
-                         my - last_pick_state['mouse_pos'][1]) > move_thresh
+    cands = _pick_candidates_at_mouse(mx, my, scene_objects, mv, pj, vp)
 
-    if moved:
-        last_pick_state['candidates'] = _pick_candidates_at_mouse(mx, my, scene_objects, mv, pj, vp)
-        last_pick_state['mouse_pos'] = (mx, my)
-        last_pick_state['index'] = 0
-
-    cands = last_pick_state['candidates']
     if not cands:
         return None
 
@@ -363,3 +352,246 @@ def find_object(mouse_pos, scene_objects):
                 best_obj = obj
 
     return best_obj
+
+
+class PickCache:
+    """
+    Picking state of a single canvas.
+
+    The screen space boxes of every object are kept along with the camera
+    version and scene version they were made with. Clicking again, or
+    clicking through the objects under the mouse, uses the boxes that are
+    already there as long as neither version has changed.
+
+    Moving the camera projects the boxes again, the world space boxes are
+    still good. When the scene changes only the objects whose `version`
+    changed get their boxes made again unless objects were added or removed
+    or most of them moved, then everything gets made again.
+
+    The matrices and the mouse ray come from the camera so nothing gets
+    read back from OpenGL.
+    """
+
+    # mouse has to move this many pixels before the candidates are found again
+    move_threshold = 4.0
+    # how far outside of a screen box the mouse can be and still count
+    tolerance = 3.0
+    max_candidates = 128
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+
+        self._objects = []
+        self._versions = np.zeros(0, dtype=np.int64)
+        # the parts of object n are starts[n]:starts[n + 1]
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._owners = np.zeros(0, dtype=np.int64)
+
+        self._corners = np.zeros((0, 8, 3), dtype=np.float64)
+        self._low = np.zeros((0, 3), dtype=np.float64)
+        self._high = np.zeros((0, 3), dtype=np.float64)
+
+        # min x, min y, max x, max y in window coordinates (top left origin)
+        self._screen = np.zeros((0, 4), dtype=np.float64)
+        self._depth = np.zeros(0, dtype=np.float64)
+
+        self._camera_key = None
+        self._scene_key = None
+        self._modelview = None
+        self._matrix = None
+        self._viewport = None
+
+        self._mouse_pos = None
+        self._candidates = np.zeros(0, dtype=np.int64)
+        self._candidates_key = None
+
+        self.full_builds = 0
+        self.partial_builds = 0
+
+    def invalidate(self):
+        self._camera_key = None
+        self._scene_key = None
+        self._candidates_key = None
+
+    def _build_all(self, objects: list):
+        versions = []
+        starts = [0]
+        corners = []
+        low = []
+        high = []
+
+        for obj in objects:
+            versions.append(obj.version)
+
+            for (p1, p2), bb in zip(obj.rect, obj.bb):
+                corners.append(bb)
+                low.append(p1.as_float)
+                high.append(p2.as_float)
+
+            starts.append(len(corners))
+
+        self._objects = objects
+        self._versions = np.array(versions, dtype=np.int64)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._owners = np.repeat(np.arange(len(objects), dtype=np.int64), np.diff(self._starts))
+
+        self._corners = np.array(corners, dtype=np.float64).reshape(-1, 8, 3)
+        self._low = np.array(low, dtype=np.float64).reshape(-1, 3)
+        self._high = np.array(high, dtype=np.float64).reshape(-1, 3)
+
+        self.full_builds += 1
+
+    def _update_objects(self, objects: list) -> np.ndarray | None:
+        # returns the parts that changed, None when everything was built again
+        if (
+            len(objects) != len(self._objects) or
+            any(a is not b for a, b in zip(objects, self._objects))
+        ):
+            self._build_all(objects)
+            return None
+
+        versions = np.fromiter((obj.version for obj in objects),
+                               dtype=np.int64, count=len(objects))
+
+        changed = np.nonzero(versions != self._versions)[0]
+
+        if len(changed) > len(objects) // 2:
+            self._build_all(objects)
+            return None
+
+        parts = []
+
+        for index in changed:
+            obj = objects[index]
+            start = self._starts[index]
+            stop = self._starts[index + 1]
+
+            if len(obj.bb) != stop - start:
+                # a mesh got added to the object
+                self._build_all(objects)
+                return None
+
+            for part, ((p1, p2), bb) in enumerate(zip(obj.rect, obj.bb), start):
+                self._corners[part] = bb
+                self._low[part] = p1.as_float
+                self._high[part] = p2.as_float
+                parts.append(part)
+
+        self._versions = versions
+        self.partial_builds += 1
+
+        return np.array(parts, dtype=np.int64)
+
+    def _project(self, parts: np.ndarray | None):
+        if parts is None:
+            corners = self._corners
+        else:
+            corners = self._corners[parts]
+
+        screen, in_front = _selection.project(corners, self._matrix, self._viewport)
+
+        rects = np.concatenate([screen.min(axis=1), screen.max(axis=1)], axis=1)
+
+        # closest corner that is in front of the camera
+        eye_z = corners @ self._modelview[2, :3] + self._modelview[2, 3]
+        depth = np.where(in_front & (eye_z < 0.0), -eye_z, inf).min(axis=1)
+
+        if parts is None:
+            self._screen = rects.reshape(-1, 4)
+            self._depth = depth
+        else:
+            self._screen[parts] = rects
+            self._depth[parts] = depth
+
+    @_debug.logfunc
+    def update(self) -> bool:
+        """
+        Bring the boxes up to date with the camera and the scene.
+
+        Returns `False` if the camera has not been set up yet.
+        """
+        camera = self.canvas.camera
+        if camera.view_matrix is None:
+            return False
+
+        camera_key = camera.version
+        scene_key = self.canvas.scene_version
+
+        if camera_key == self._camera_key and scene_key == self._scene_key:
+            return True
+
+        parts = None
+
+        if scene_key != self._scene_key:
+            objects = [obj for obj in self.canvas.objects if obj.bb]
+            parts = self._update_objects(objects)
+
+        if camera_key != self._camera_key:
+            self._modelview = camera.view_matrix
+            self._matrix = camera.view_projection_matrix
+            self._viewport = tuple(float(item) for item in camera.viewport)
+            parts = None
+
+        if parts is None or len(parts):
+            self._project(parts)
+
+        self._camera_key = camera_key
+        self._scene_key = scene_key
+
+        return True
+
+    def _find_candidates(self, mx: float, my: float) -> np.ndarray:
+        tol = self.tolerance
+        screen = self._screen
+
+        hit = ((screen[:, 0] - tol <= mx) & (mx <= screen[:, 2] + tol) &
+               (screen[:, 1] - tol <= my) & (my <= screen[:, 3] + tol))
+
+        parts = np.nonzero(hit)[0]
+        parts = parts[np.argsort(self._depth[parts], kind='stable')]
+
+        return parts[:self.max_candidates]
+
+    @_debug.logfunc
+    def find_object(self, mouse_pos):
+        """
+        The object under the mouse, `None` when there isn't one.
+        """
+        if not self.update():
+            return None
+
+        mx, my = mouse_pos.as_float[:-1]
+        key = (self._camera_key, self._scene_key)
+
+        if (
+            self._mouse_pos is None or key != self._candidates_key or
+            np.hypot(mx - self._mouse_pos[0], my - self._mouse_pos[1]) > self.move_threshold
+        ):
+            self._candidates = self._find_candidates(mx, my)
+            self._candidates_key = key
+            self._mouse_pos = (mx, my)
+
+        parts = self._candidates
+        if not len(parts):
+            return None
+
+        o, d = self.canvas.camera.screen_ray(mx, my)
+        if o is None:
+            return self._objects[int(self._owners[parts[0]])]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_dir = 1.0 / d
+
+            t1 = (self._low[parts] - o) * inv_dir
+            t2 = (self._high[parts] - o) * inv_dir
+
+            t_enter = np.fmax(np.fmin(t1, t2).max(axis=1), 0.0)
+            t_exit = np.fmax(t1, t2).min(axis=1)
+
+        hit = (t_enter <= t_exit) & (t_exit >= 0.0)
+        if not np.any(hit):
+            return None
+
+        t_enter = np.where(hit, t_enter, inf)
+
+        return self._objects[int(self._owners[parts[int(np.argmin(t_enter))]])]
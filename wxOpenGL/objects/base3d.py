@@ -8,6 +8,8 @@ from ..geometry import angle as _angle
 from .. import config as _config
 from .. import gl_materials as _glm
 from .. import debug as _debug
+from .. import normals as _normals
+from .. import vertex_format as _vertex_format
 
 if TYPE_CHECKING:
     from .. import Canvas as _Canvas
@@ -16,16 +18,22 @@ Config = _config.Config
 
 
 class Base3D:
+    # objects get moved up so they don't go through the floor. Objects that
+    # share a position with other objects leave this to their owner.
+    _clamp_to_ground = True
 
     @_debug.logfunc
     def __init__(self, canvas: "_Canvas", material: _glm.GLMaterial,
                  selected_material: _glm.GLMaterial, smooth: bool,
                  data: list[list[np.ndarray, np.ndarray]] | list[list[np.ndarray, np.ndarray, int]],
-                 position: _point.Point | None, angle: _angle.Angle | None):
+                 position: _point.Point | None, angle: _angle.Angle | None,
+                 built: list | None = None, crease_angle: float | None = None):
 
         self.canvas = canvas
 
         self._position: _point.Point = None
+        # bumped every time the object changes, see `version`
+        self._version = 0
         self._material = material
         self._selected_material = selected_material
         self._is_selected = False
@@ -41,6 +49,8 @@ class Base3D:
         self._o_angle = angle.copy()
         self._reduce_settings = None
         self._smooth = smooth
+        self._crease_angle = crease_angle
+        self._compact = Config.mesh.compact_vertices
 
         position.bind(self._update_position)
         angle.bind(self._update_angle)
@@ -53,12 +63,25 @@ class Base3D:
         self._bb: list[np.ndarray] = []
         self._triangles: list["TriangleRenderer"] = []
 
-        self._build()
+        self._build(built)
         canvas.AddObject(self)
 
     def delete(self):
         self.canvas.RemoveObject(self)
 
+    def _invalidate(self):
+        # lets the canvas know that anything it cached for this object
+        # needs to be rendered again
+        self._version += 1
+        self.canvas.InvalidateScene()
+
+    @property
+    def version(self) -> int:
+        """
+        Changes every time the object is moved, rotated or rebuilt.
+        """
+        return self._version
+
     @property
     def smooth(self) -> bool:
         return self._smooth
@@ -68,46 +91,82 @@ class Base3D:
         self._smooth = value
         self._build()
 
-    @_debug.logfunc
-    def _build(self):
-        from .. import model_loader as _model_loader
+    @property
+    def crease_angle(self) -> float | None:
+        """
+        Angle in degrees where smoothing stops.
 
-        data = self._mesh
-        angle = self._angle
-        position = self._position
+        Only used when `smooth` is set. Faces that meet at an angle larger
+        than this keep a sharp edge. `None` smooths everything, which is a
+        lot faster and is the default for everything except models loaded
+        from STEP and IGES files (see `Config.mesh.crease_angle`).
+        """
+        return self._crease_angle
 
-        triangles = []
+    @crease_angle.setter
+    def crease_angle(self, value: float | None):
+        self._crease_angle = value
 
-        rect = []
-        bb = []
+        if self._smooth:
+            self._build()
+            self.canvas.Refresh(False)
+
+    @property
+    def compact(self) -> bool:
+        """
+        Store the vertices in the compact format.
+
+        Positions are int16 and normals are int8, 12 bytes per vertex instead
+        of 48. See the `vertex_format` module.
+        """
+        return self._compact
+
+    @compact.setter
+    def compact(self, value: bool):
+        self._compact = value
+        self._build()
+        self.canvas.Refresh(False)
 
-        for items in data:
-            if len(items) == 2:
-                vertices, faces = items
+    @property
+    def memory_usage(self) -> int:
+        """
+        Number of bytes used by the vertex data that gets drawn.
+        """
+        res = 0
 
-                if self._reduce_settings is not None:
-                    vertices, faces = _model_loader.reduce_triangles(
-                        vertices, faces, *self._reduce_settings
-                    )
+        for renderer in self._triangles:
+            for item in renderer.data:
+                res += item[0].nbytes + item[1].nbytes
 
-                if self._smooth:
-                    tris, nrmls, count = self._compute_smoothed_vertex_normals(vertices, faces)
-                else:
-                    tris, nrmls, count = self._compute_vertex_normals(vertices, faces)
+        return res
 
-                tris @= angle
-                nrmls @= angle
+    @_debug.logfunc
+    def _build(self, built: list | None = None):
+        # `built` is the render data and the bounding box corners for every
+        # mesh in `_mesh` when they have already been made, this is used
+        # when restoring from a scene file.
+        data = self._mesh
+        triangles = []
 
-                tris += position
+        rect = []
+        bb = []
 
+        for i, items in enumerate(data):
+            if built is not None:
+                item, p1, p2 = built[i]
+            elif len(items) == 2:
+                item, tris = self._place_mesh(*self._compute_mesh(*items))
             else:
                 tris, nrmls, count = items
+                item = [tris, nrmls, count]
+
+            if built is None:
+                p1, p2 = self._compute_rect(tris)
 
-            p1, p2 = self._compute_rect(tris)
             rect.append([p1, p2])
             bb.append(self._compute_bb(p1, p2))
             self._adjust_hit_points(p1, p2)
-            triangles.append([tris, nrmls, count])
+            triangles.append(item)
 
         self._rect = rect
         self._bb = bb
@@ -119,9 +178,108 @@ class Base3D:
 
         self._triangles = [TriangleRenderer(triangles, material)]
 
-        for p1, p2 in rect:
-            if p1.y < Config.ground_height:
-                self.position.y -= p1.y
+        if self._clamp_to_ground:
+            for p1, p2 in rect:
+                if p1.y < Config.floor.ground_height:
+                    self.position.y -= p1.y
+
+        self._invalidate()
+
+    def _compute_mesh(self, vertices: np.ndarray,
+                      faces: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        # triangles and normals before the angle and position are applied.
+        # This only reads the settings so it can be run in another thread.
+        from .. import model_loader as _model_loader
+
+        if self._reduce_settings is not None:
+            vertices, faces = _model_loader.reduce_triangles(
+                vertices, faces, *self._reduce_settings
+            )
+
+        if self._smooth:
+            return self._compute_smoothed_vertex_normals(
+                vertices, faces, self._crease_angle)
+
+        return self._compute_vertex_normals(vertices, faces)
+
+    def _place_mesh(self, tris: np.ndarray, nrmls: np.ndarray,
+                    count: int) -> tuple[list, np.ndarray]:
+        # returns the render data and the triangles where they are in the
+        # world so the bounding box can be calculated.
+        angle = self._angle
+        position = self._position
+
+        if self._compact:
+            # the vertices stay where they are, the rotation and
+            # position get applied by the matrix when drawing.
+            positions, matrix = _vertex_format.quantize_positions(tris)
+            nrmls = _vertex_format.quantize_normals(nrmls)
+
+            model = np.identity(4, dtype=np.float64)
+            model[:3, :3] = angle.as_matrix.T
+            model[3, :3] = position.as_numpy
+
+            tris = tris.reshape(-1, 3) @ model[:3, :3] + model[3, :3]
+            return [positions, nrmls, count, matrix @ model], tris
+
+        tris @= angle
+        nrmls @= angle
+
+        tris += position
+        return [tris, nrmls, count], tris
+
+    @_debug.logfunc
+    def append_mesh(self, vertices: np.ndarray, faces: np.ndarray,
+                    built: tuple[np.ndarray, np.ndarray, int] | None = None):
+        """
+        Add a mesh to the object without building the meshes it already has
+        again.
+
+        `built` is what `_compute_mesh` returned for the mesh if that has
+        already been done.
+        """
+        if built is None:
+            built = self._compute_mesh(vertices, faces)
+
+        self._mesh.append([vertices, faces])
+
+        item, tris = self._place_mesh(*built)
+        p1, p2 = self._compute_rect(tris)
+        self._adjust_hit_points(p1, p2)
+
+        self._rect.append([p1, p2])
+        self._bb.append(self._compute_bb(p1, p2))
+        self._triangles[0].data.append(item)
+
+        self._invalidate()
+
+        if self._clamp_to_ground and p1.y < Config.floor.ground_height:
+            self.position.y -= p1.y
+        else:
+            self.canvas.Refresh(False)
+
+    @_debug.logfunc
+    def replace_mesh(self, index: int, vertices: np.ndarray, faces: np.ndarray,
+                     built: tuple[np.ndarray, np.ndarray, int] | None = None):
+        """
+        Replace one of the meshes of the object, used when a solid gets
+        tessellated again.
+        """
+        if built is None:
+            built = self._compute_mesh(vertices, faces)
+
+        self._mesh[index] = [vertices, faces]
+
+        item, tris = self._place_mesh(*built)
+        p1, p2 = self._compute_rect(tris)
+        self._adjust_hit_points(p1, p2)
+
+        self._rect[index] = [p1, p2]
+        self._bb[index] = self._compute_bb(p1, p2)
+        self._triangles[0].data[index] = item
+
+        self._invalidate()
+        self.canvas.Refresh(False)
 
     @property
     def vertices_count(self) -> int:
@@ -150,18 +308,24 @@ class Base3D:
         delta = point - self._o_position
         self._o_position = point.copy()
 
-        for p1, p2 in self._rect:
-            if p1.y + delta.y < Config.ground_height:
-                self._position.y -= p1.y
-                return
+        if self._clamp_to_ground:
+            for p1, p2 in self._rect:
+                if p1.y + delta.y < Config.floor.ground_height:
+                    self._position.y -= p1.y
+                    return
 
-            if p2.y + delta.y < Config.ground_height:
-                self._position.y -= p2.y
-                return
+                if p2.y + delta.y < Config.floor.ground_height:
+                    self._position.y -= p2.y
+                    return
 
         for renderer in self._triangles:
             data = renderer.data
-            for i, (tris, nrmls, count) in enumerate(data):
+            for i, item in enumerate(data):
+                if len(item) == 4:
+                    item[3][3, :3] += delta.as_numpy
+                    continue
+
+                tris, nrmls, count = item
                 tris += delta
 
                 data[i] = [tris, nrmls, count]
@@ -177,6 +341,7 @@ class Base3D:
             bb += delta
             self._bb[i] = bb
 
+        self._invalidate()
         self.canvas.Refresh(False)
 
     @_debug.logfunc
@@ -184,9 +349,24 @@ class Base3D:
         delta = angle - self._o_angle
         self._o_angle = angle.copy()
 
+        rotation = None
+
         for renderer in self._triangles:
             data = renderer.data
-            for i, (tris, nrmls, count) in enumerate(data):
+            for i, item in enumerate(data):
+                if len(item) == 4:
+                    if rotation is None:
+                        # rotates around the position the same way the
+                        # arrays below get rotated
+                        origin = self._position.as_numpy
+                        rotation = np.identity(4, dtype=np.float64)
+                        rotation[:3, :3] = delta.as_matrix.T
+                        rotation[3, :3] = origin - origin @ rotation[:3, :3]
+
+                    item[3] = item[3] @ rotation
+                    continue
+
+                tris, nrmls, count = item
                 tris -= self._position
                 tris @= delta
                 tris += self._position
@@ -215,6 +395,7 @@ class Base3D:
             bb += self._position
             self._bb[i] = bb
 
+        self._invalidate()
         self.canvas.Refresh(False)
 
     @property
@@ -256,7 +437,9 @@ class Base3D:
     def is_selected(self) -> bool:
         return self._is_selected
 
-    def set_selected(self, flag: bool):
+    def set_selected(self, flag: bool, invalidate: bool = True):
+        # `invalidate=False` is for selecting a lot of objects at one time,
+        # the caller invalidates the scene once when it is done.
         if flag:
             for renderer in self._triangles:
                 renderer.material = self._selected_material
@@ -266,92 +449,31 @@ class Base3D:
 
         self._is_selected = flag
 
-    # Performance between calculating smoothed normals and face normals can be
-    # significant with smooth normals taking ~2x mopr time to calculate.
-    # this only gets done when an item is added and the normals are cached. The only
-    # impact would be seen when loading a project that has many objects defined
-    # in it.
-
-    # 26,060 triangles
-    # compute_vertex_normals: 4.0ms
-    # compute_smoothed_vertex_normals: 9.0ms
+        if invalidate:
+            self._invalidate()
+
+    # The normals are calculated by the normals module. Smoothed normals used
+    # to be ~2x the time of face normals because of np.add.at, they are now
+    # done with np.bincount. This only gets done when an item is built and
+    # the normals are cached.
+    #
+    #                     flat       smooth     smooth (np.add.at)   crease 30
+    #    26,000 triangles  8.3ms      8.9ms      17.6ms               71.6ms
+    #   100,000 triangles  27.0ms     36.0ms     62.3ms               249.2ms
+    #     1.0M triangles   292.0ms    472.7ms    632.1ms              2.5s
+    #     5.0M triangles   1.5s       2.5s       3.3s                 11.1s
+    #
+    # The crease angle compares every face at a vertex against every other
+    # face at that vertex, that is where the extra time comes from.
     @staticmethod
     @_debug.logfunc
-    def _compute_smoothed_vertex_normals(vertices, faces):
-        # triangle coordinates (F, 3, 3)
-        triangles = vertices[faces]
-
-        # compute two edges per triangle
-        v0 = triangles[:, 0, :]
-        v1 = triangles[:, 1, :]
-        v2 = triangles[:, 2, :]
-
-        e1 = v1 - v0
-        e2 = v2 - v0
-
-        # raw face normal (not normalized): proportional to area * 2
-        face_normals_raw = np.cross(e1, e2)  # shape (F, 3)  # NOQA
-
-        # normalize face normals to unit vectors, but keep zeros for degenerate faces
-        norm = np.linalg.norm(face_normals_raw, axis=1, keepdims=True)
-        # avoid dividing by zero
-        safe_norm = np.maximum(norm, 1e-6)
-        face_normals = face_normals_raw / safe_norm
-        # optionally set truly tiny normals to zero to avoid adding noise
-        tiny = (norm.squeeze() < 1e-6)
-
-        if np.any(tiny):
-            face_normals[tiny] = 0.0
-
-        # accumulate face normals into per-vertex sum
-        V = len(vertices)
-        vertex_normal_sum = np.zeros((V, 3), dtype=float)
-
-        # Add each face's normal to its three vertices (np.add.at handles repeated indices)
-        # Repeat face normals 3 times so they match faces.ravel()
-        repeated_face_normals = np.repeat(face_normals, 3, axis=0)  # shape (F*3, 3)
-        vertex_indices = faces.ravel()  # shape (F*3,)
-        np.add.at(vertex_normal_sum, vertex_indices, repeated_face_normals)
-
-        # normalize per-vertex summed normals
-        vn_norm = np.linalg.norm(vertex_normal_sum, axis=1, keepdims=True)
-        safe_vn_norm = np.maximum(vn_norm, 1e-6)
-        vertex_normals = vertex_normal_sum / safe_vn_norm
-        # set zero normals where there was no contribution (degenerate isolated vertices)
-        isolated = (vn_norm.squeeze() < 1e-6)
-        if np.any(isolated):
-            vertex_normals[isolated] = 0.0
-
-        # produce per-triangle per-vertex normals
-        normals = vertex_normals[faces].reshape(-1, 3)  # shape (F, 3, 3)
-
-        return triangles, normals, len(triangles) * 3
+    def _compute_smoothed_vertex_normals(vertices, faces, crease_angle=None):
+        return _normals.smooth_normals(vertices, faces, crease_angle)
 
     @staticmethod
     @_debug.logfunc
     def _compute_vertex_normals(vertices, faces):
-        triangles = vertices[faces]  # (F, 3, 3)
-        v0 = triangles[:, 0, :]
-        v1 = triangles[:, 1, :]
-        v2 = triangles[:, 2, :]
-
-        e1 = v1 - v0
-        e2 = v2 - v0
-        face_normals_raw = np.cross(e1, e2)  # (F, 3)  # NOQA
-
-        norms = np.linalg.norm(face_normals_raw, axis=1, keepdims=True)
-        safe = np.maximum(norms, 1e-6)
-        face_normals = face_normals_raw / safe
-
-        # set exact-degenerate faces to zero if extremely small
-        degenerate = (norms.squeeze() < 1e-6)
-        if np.any(degenerate):
-            face_normals[degenerate] = 0.0
-
-        # (F, 3, 3)ach face normal to the 3 vertices of the triangle
-        normals = np.repeat(face_normals[:, np.newaxis, :], 3, axis=1)
-
-        return triangles, normals.reshape(-1, 3), len(triangles) * 3
+        return _normals.flat_normals(vertices, faces)
 
     @staticmethod
     @_debug.logfunc
@@ -393,6 +515,9 @@ class TriangleRenderer:
     def __init__(self, data: list[list[np.ndarray, np.ndarray, int]], material: _glm.GLMaterial):
         self._data = data
         self._material = material
+        # bumped when the data gets set, the shader pipeline uploads the
+        # vertices again when it changes
+        self._version = 0
 
     @property
     def is_opaque(self) -> bool:
@@ -405,6 +530,11 @@ class TriangleRenderer:
     @data.setter
     def data(self, value: list[list[np.ndarray, np.ndarray, int]]):
         self._data = value
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     @property
     def material(self) -> _glm.GLMaterial:
@@ -421,10 +551,21 @@ class TriangleRenderer:
 
         self._material.set()
 
-        for tris, nrmls, count in self._data:
-            GL.glVertexPointer(3, GL.GL_DOUBLE, 0, tris)
-            GL.glNormalPointer(GL.GL_DOUBLE, 0, nrmls)
-            GL.glDrawArrays(GL.GL_TRIANGLES, 0, count)
+        for item in self._data:
+            if len(item) == 4:
+                positions, nrmls, count, matrix = item
+
+                GL.glPushMatrix()
+                GL.glMultMatrixd(matrix)
+                GL.glVertexPointer(3, GL.GL_SHORT, _vertex_format.POSITION_STRIDE, positions)
+                GL.glNormalPointer(GL.GL_BYTE, _vertex_format.NORMAL_STRIDE, nrmls)
+                GL.glDrawArrays(GL.GL_TRIANGLES, 0, count)
+                GL.glPopMatrix()
+            else:
+                tris, nrmls, count = item
+                GL.glVertexPointer(3, GL.GL_DOUBLE, 0, tris)
+                GL.glNormalPointer(GL.GL_DOUBLE, 0, nrmls)
+                GL.glDrawArrays(GL.GL_TRIANGLES, 0, count)
 
         GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
         GL.glDisableClientState(GL.GL_NORMAL_ARRAY)
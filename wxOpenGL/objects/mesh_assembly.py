@@ -0,0 +1,243 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from . import base3d as _base3d
+from . import mesh_model as _mesh_model
+from .. import model_loader as _model_loader
+from .. import vertex_format as _vertex_format
+from .. import config as _config
+from ..geometry import angle as _angle
+from ..geometry import point as _point
+
+
+if TYPE_CHECKING:
+    from .. import Canvas as _Canvas
+    from .. import gl_materials as _glm
+
+
+Config = _config.Config
+
+
+class _AssemblyDataMeta(_mesh_model._ModelDataMeta):  # NOQA
+    # separate cache from the one the flattened models use
+    _cache = {}
+
+
+class _AssemblyData(metaclass=_AssemblyDataMeta):
+
+    def __init__(self, file):
+        self.file = file
+        self.meshes, self.occurrences = _model_loader.load_assembly(file)
+
+
+class _SharedMesh:
+    # render data of a mesh in the space it was tessellated in, this is made
+    # one time and used by every part that places the mesh
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray,
+                 tris: np.ndarray, nrmls: np.ndarray, count: int):
+        # kept so the ids used as the key stay valid
+        self.vertices = vertices
+        self.faces = faces
+
+        self.tris = tris
+        self.nrmls = nrmls
+        self.count = count
+
+        self.positions, self.matrix = _vertex_format.quantize_positions(tris)
+        self.compact_nrmls = _vertex_format.quantize_normals(nrmls)
+        # the corners of the bounding box of a part only need the vertices
+        # that are used, not every corner of every triangle
+        self.points = np.unique(tris.reshape(-1, 3), axis=0)
+
+
+class AssemblyPart(_base3d.Base3D):
+    """
+    A single part in an assembly.
+
+    Parts are objects of their own so they get culled and picked one by one.
+    All of the parts in an assembly share the position and angle of the
+    assembly so moving or rotating the assembly moves all of them.
+
+    Parts that use the same mesh share the normals and the vertices, they
+    are always stored in the compact format and the placement of the part
+    in the assembly is part of the matrix each part has.
+
+    Parts don't keep themselves above the floor, they all share the same
+    position. `MeshAssembly` does that one time for all of them.
+    """
+    _clamp_to_ground = False
+
+    def __init__(self, assembly: "MeshAssembly", canvas: "_Canvas",
+                 material: "_glm.GLMaterial", selected_material: "_glm.GLMaterial",
+                 smooth: bool, occurrence: _model_loader.AssemblyOccurrence,
+                 data: list[list[np.ndarray, np.ndarray]],
+                 position: _point.Point, angle: _angle.Angle,
+                 crease_angle: float | None = None):
+
+        self.assembly = assembly
+        self.name = occurrence.name
+        self.path = occurrence.path
+        self.matrix = occurrence.matrix
+
+        _base3d.Base3D.__init__(self, canvas, material, selected_material,
+                                smooth, data, position, angle,
+                                crease_angle=crease_angle)
+
+    @property
+    def compact(self) -> bool:
+        # sharing the vertices with the other parts needs the matrix the
+        # compact format has
+        return True
+
+    @compact.setter
+    def compact(self, value: bool):
+        pass
+
+    def _compute_mesh(self, vertices: np.ndarray,
+                      faces: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        shared = self.assembly._get_shared_mesh(self, vertices, faces)  # NOQA
+        return shared.tris, shared.nrmls, shared.count
+
+    def _place_mesh(self, tris: np.ndarray, nrmls: np.ndarray,
+                    count: int) -> tuple[list, np.ndarray]:
+        shared = self.assembly._find_shared_mesh(tris)  # NOQA
+
+        model = np.identity(4, dtype=np.float64)
+        model[:3, :3] = self._angle.as_matrix.T
+        model[3, :3] = self._position.as_numpy
+
+        # `matrix` is for column vectors, the render data uses row vectors
+        model = self.matrix.T @ model
+
+        points = shared.points @ model[:3, :3] + model[3, :3]
+        return [shared.positions, shared.compact_nrmls, count, shared.matrix @ model], points
+
+
+class MeshAssembly:
+    """
+    Model that keeps the assembly structure of a STEP or IGES file.
+
+    Every part in the assembly becomes an `AssemblyPart`. Shapes that are
+    used more than one time are only tessellated one time, the placements
+    only differ by the transform that gets applied to them.
+    """
+
+    def __init__(
+        self, canvas: "_Canvas", material: "_glm.GLMaterial",
+        selected_material: "_glm.GLMaterial", smooth: bool,
+        file: str, position: _point.Point | None = None,
+        angle: _angle.Angle | None = None
+    ):
+        if position is None:
+            position = _point.Point(0, 0, 0)
+        if angle is None:
+            angle = _angle.Angle()
+
+        self.canvas = canvas
+        self._position = position
+        self._angle = angle
+        self._assembly_data = _AssemblyData(file)
+        # (source mesh, settings) -> _SharedMesh and the id of the
+        # triangles of a _SharedMesh -> _SharedMesh
+        self._shared_meshes = {}
+        self._shared_tris = {}
+
+        meshes = self._assembly_data.meshes
+        self._unique_mesh_count = len(meshes)
+        parts = []
+
+        if _model_loader.is_brep_file(file):
+            crease_angle = Config.mesh.crease_angle
+        else:
+            crease_angle = None
+
+        with canvas:
+            for occurrence in self._assembly_data.occurrences:
+                # the part places the mesh with the matrix of the
+                # occurrence, the vertices are not copied
+                data = [list(meshes[occurrence.mesh])]
+
+                parts.append(AssemblyPart(self, canvas, material, selected_material,
+                                          smooth, occurrence, data, position, angle,
+                                          crease_angle))
+
+        self._parts = parts
+
+        self._keep_above_ground()
+        position.bind(self._update_position)
+
+        canvas.Refresh(False)
+
+    def _keep_above_ground(self):
+        # the bounding box of every part is where it is when the part last
+        # saw the position, that keeps this right no matter if the parts
+        # have been told about a change to the position yet or not
+        if not self._parts:
+            return
+
+        low = min(p1.y - part._o_position.y  # NOQA
+                  for part in self._parts for p1, _ in part.rect)
+        low += self._position.y
+
+        ground_height = Config.floor.ground_height
+        if low < ground_height:
+            self._position.y += ground_height - low
+
+    def _update_position(self, _):
+        self._keep_above_ground()
+
+    def _get_shared_mesh(self, part: AssemblyPart, vertices: np.ndarray,
+                         faces: np.ndarray) -> _SharedMesh:
+        key = (id(vertices), id(faces), part.smooth, part.crease_angle,
+               None if part._reduce_settings is None else tuple(part._reduce_settings))  # NOQA
+
+        shared = self._shared_meshes.get(key, None)
+        if shared is None:
+            tris, nrmls, count = _base3d.Base3D._compute_mesh(part, vertices, faces)  # NOQA
+            shared = self._shared_meshes[key] = _SharedMesh(vertices, faces, tris, nrmls, count)
+            self._shared_tris[id(tris)] = shared
+
+        return shared
+
+    def _find_shared_mesh(self, tris: np.ndarray) -> _SharedMesh:
+        return self._shared_tris[id(tris)]
+
+    @property
+    def parts(self) -> list[AssemblyPart]:
+        return self._parts[:]
+
+    @property
+    def position(self) -> _point.Point:
+        return self._position
+
+    @property
+    def angle(self) -> _angle.Angle:
+        return self._angle
+
+    @property
+    def unique_mesh_count(self) -> int:
+        return self._unique_mesh_count
+
+    def find_parts(self, name: str) -> list[AssemblyPart]:
+        return [part for part in self._parts if part.name == name]
+
+    @property
+    def is_selected(self) -> bool:
+        return any(part.is_selected for part in self._parts)
+
+    def set_selected(self, flag: bool):
+        with self.canvas:
+            for part in self._parts:
+                part.set_selected(flag)
+
+        self.canvas.Refresh(False)
+
+    def delete(self):
+        with self.canvas:
+            for part in self._parts:
+                part.delete()
+
+        self._parts = []
+        self.canvas.Refresh(False)
@@ -1,9 +1,14 @@
 from typing import TYPE_CHECKING
 
+import threading
 import weakref
 
+import wx
+
 from . import base3d as _base3d
 from .. import model_loader as _model_loader
+from .. import config as _config
+from .. import tessellation as _tessellation
 from ..geometry import angle as _angle
 from ..geometry import point as _point
 
@@ -13,6 +18,9 @@ if TYPE_CHECKING:
     from .. import gl_materials as _glm
 
 
+Config = _config.Config
+
+
 class _ModelDataMeta(type):
     _cache = {}
 
@@ -48,18 +56,92 @@ class MeshModel(_base3d.Base3D):
         self, canvas: "_Canvas", material: "_glm.GLMaterial",
         selected_material: "_glm.GLMaterial", smooth: bool,
         file: str | None, position: _point.Point | None = None,
-        angle: _angle.Angle | None = None
+        angle: _angle.Angle | None = None, stream: bool = False,
+        refine: bool = False
     ):
         self._model_data = None
+        self._stream_thread = None
+        self._stream_cancel = False
+        self._stream_error = None
+        self._solids = []
 
-        if file is None:
+        if file is None or stream:
             data = []
+        elif refine:
+            # every solid is a mesh of its own so it can be tessellated
+            # again without touching the others
+            self._solids = _model_loader.load_solids(file)
+            data = [[solid.vertices, solid.faces] for solid in self._solids]
         else:
             data = self.load_file(file)
 
+        if file is not None and _model_loader.is_brep_file(file):
+            crease_angle = Config.mesh.crease_angle
+        else:
+            crease_angle = None
+
         _base3d.Base3D.__init__(self, canvas, material, selected_material,
-                                smooth, data, position, angle)
+                                smooth, data, position, angle,
+                                crease_angle=crease_angle)
+
+        if file is not None and stream:
+            self.stream_file(file)
+        elif self._solids:
+            _tessellation.register(self)
+
+    @property
+    def solids(self) -> list[_model_loader.TessellatedSolid]:
+        """
+        The solids when the model was made with `refine=True`, one for each
+        mesh.
+        """
+        return self._solids
 
     def load_file(self, file):
         self._model_data = _ModelData(file)
         return self._model_data.data[:]
+
+    def stream_file(self, file):
+        """
+        Load a file in the background and show it as it gets tessellated.
+
+        The model fills in a piece at a time, see `model_loader.stream`.
+        The normals for each piece are calculated in the background as well,
+        only adding the piece to the object happens in the GUI thread.
+        """
+        self._stream_cancel = False
+        self._stream_error = None
+        self._stream_thread = threading.Thread(
+            target=self._stream_worker, args=(file,), daemon=True)
+        self._stream_thread.start()
+
+    @property
+    def is_streaming(self) -> bool:
+        return self._stream_thread is not None and self._stream_thread.is_alive()
+
+    @property
+    def stream_error(self) -> Exception | None:
+        """
+        The error that stopped streaming the file, if there was one.
+        """
+        return self._stream_error
+
+    def _stream_worker(self, file):
+        try:
+            for vertices, faces in _model_loader.stream(file):
+                if self._stream_cancel:
+                    return
+
+                built = self._compute_mesh(vertices, faces)
+                wx.CallAfter(self._add_streamed_mesh, vertices, faces, built)
+        except Exception as err:  # NOQA
+            self._stream_error = err
+
+    def _add_streamed_mesh(self, vertices, faces, built):
+        if not self._stream_cancel:
+            self.append_mesh(vertices, faces, built)
+
+    def delete(self):
+        self._stream_cancel = True
+        _tessellation.unregister(self)
+        _base3d.Base3D.delete(self)
@@ -0,0 +1,346 @@
+"""
+Occlusion culling.
+
+Frustum culling still draws every part that is hidden inside of an
+enclosure. After frustum culling the objects that take up the most room on
+screen are picked as occluders and their largest triangles get rasterized
+into a small depth buffer on the CPU. A hierarchy of that buffer is built
+where every level holds the farthest depth of 2x2 texels from the level
+below it. An object is hidden when the nearest corner of its bounding box is
+farther away than everything in the depth buffer that the box covers on
+screen, the level that is tested is picked so the box only covers a few
+texels.
+
+Everything here is done to be conservative. Only some of the triangles of an
+occluder are used, a texel is only covered when all of it is inside of a
+triangle and it holds the farthest depth of the triangle over the texel,
+triangles that cross the near plane are skipped and boxes that cross the near
+plane are always visible. All of that can only leave an
+object visible when it could have been culled, never the other way around.
+Translucent objects are never used as occluders.
+
+This module only needs numpy. Objects need a `rect` (list of bounding box
+corners) and `triangles` (list of renderers) like `Base3D` has.
+"""
+
+import math
+import weakref
+
+import numpy as np
+
+
+_EPSILON = 1e-6
+
+# limits the size of the temporary arrays when rasterizing
+_BATCH_SIZE = 1 << 20
+
+
+class OcclusionCuller:
+
+    def __init__(self, width: int = 256, height: int = 128, max_occluders: int = 16,
+                 occluder_triangles: int = 2048):
+
+        self.width = width
+        self.height = height
+        self.max_occluders = max_occluders
+        self.occluder_triangles = occluder_triangles
+
+        self._depth = None
+        self._levels = []
+        self._view_proj = None
+
+        # largest triangles of each object, only picked again when the
+        # render data of the object changes
+        self._triangle_cache = weakref.WeakKeyDictionary()
+
+        self.occluder_count = 0
+        self.culled_count = 0
+
+    @property
+    def depth(self) -> np.ndarray | None:
+        return self._depth
+
+    @property
+    def levels(self) -> list[np.ndarray]:
+        return self._levels
+
+    def _project(self, points: np.ndarray) -> np.ndarray:
+        ones = np.ones(points.shape[:-1] + (1,), dtype=np.float64)
+        return np.concatenate([points, ones], axis=-1) @ self._view_proj.T
+
+    def _occluder_triangles(self, obj) -> np.ndarray | None:
+        data = [item for renderer in obj.triangles if renderer.is_opaque
+                for item in renderer.data]
+
+        if not data:
+            return None
+
+        key = tuple(id(item[0]) for item in data)
+        cached = self._triangle_cache.get(obj, None)
+
+        if cached is None or cached[0] != key:
+            indices = []
+            for item in data:
+                if len(item) == 4:
+                    corners = item[0][:item[2], :3].astype(np.float64).reshape(-1, 3, 3)
+                else:
+                    corners = item[0].reshape(-1, 3, 3)
+
+                # the size of the triangles in the space they are stored in
+                # is good enough for picking the largest
+                area = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0],
+                                               corners[:, 2] - corners[:, 0]), axis=1)
+                indices.append(area)
+
+            areas = np.concatenate(indices)
+            count = min(self.occluder_triangles, len(areas))
+            largest = np.argpartition(-areas, count - 1)[:count] if count else areas[:0]
+
+            offsets = np.cumsum([0] + [len(area) for area in indices])
+            indices = [largest[(largest >= start) & (largest < stop)] - start
+                       for start, stop in zip(offsets[:-1], offsets[1:])]
+
+            cached = (key, indices)
+            self._triangle_cache[obj] = cached
+
+        res = []
+        for item, tri_indices in zip(data, cached[1]):
+            if not len(tri_indices):
+                continue
+
+            rows = (tri_indices[:, np.newaxis] * 3 + np.arange(3)).ravel()
+
+            if len(item) == 4:
+                matrix = item[3]
+                tris = item[0][rows, :3] @ matrix[:3, :3] + matrix[3, :3]
+            else:
+                tris = item[0].reshape(-1, 3)[rows]
+
+            res.append(tris.reshape(-1, 3, 3))
+
+        if not res:
+            return None
+
+        return np.concatenate(res)
+
+    def rasterize(self, tris: np.ndarray):
+        """
+        Rasterizes world space triangles (N, 3, 3) into the depth buffer.
+
+        A pixel is only covered when all four of its corners are inside of
+        the triangle and it gets the farthest depth the triangle has over the
+        pixel, the depth is the normalized device depth (-1.0 to 1.0). A gap
+        between occluders that is narrower than a pixel is never filled in.
+        """
+        width = self.width
+        height = self.height
+
+        clip = self._project(tris)
+        w = clip[..., 3]
+
+        front = np.all(w > _EPSILON, axis=1)
+        clip = clip[front]
+        w = w[front]
+
+        ndc = clip[..., :3] / w[..., np.newaxis]
+        sx = (ndc[..., 0] * 0.5 + 0.5) * width
+        sy = (ndc[..., 1] * 0.5 + 0.5) * height
+        sz = ndc[..., 2]
+
+        # first and last pixel that is entirely inside of the bounding box
+        x0 = np.maximum(np.ceil(sx.min(axis=1)), 0).astype(np.int64)
+        x1 = np.minimum(np.floor(sx.max(axis=1)) - 1, width - 1).astype(np.int64)
+        y0 = np.maximum(np.ceil(sy.min(axis=1)), 0).astype(np.int64)
+        y1 = np.minimum(np.floor(sy.max(axis=1)) - 1, height - 1).astype(np.int64)
+
+        box_w = x1 - x0 + 1
+        box_h = y1 - y0 + 1
+
+        area = ((sx[:, 1] - sx[:, 0]) * (sy[:, 2] - sy[:, 0]) -
+                (sx[:, 2] - sx[:, 0]) * (sy[:, 1] - sy[:, 0]))
+
+        valid = (box_w > 0) & (box_h > 0) & (np.abs(area) > _EPSILON) & np.all(sz <= 1.0, axis=1)
+        if not np.any(valid):
+            return
+
+        sx = sx[valid]
+        sy = sy[valid]
+        sz = sz[valid]
+        x0 = x0[valid]
+        y0 = y0[valid]
+        box_w = box_w[valid]
+        counts = box_w * box_h[valid]
+        inv_area = 1.0 / area[valid]
+
+        depth = self._depth.ravel()
+        ends = np.cumsum(counts)
+
+        start = 0
+        while start < len(counts):
+            # break the triangles up so the number of pixels being
+            # tested at one time stays bounded
+            base = ends[start - 1] if start else 0
+            stop = int(np.searchsorted(ends, base + _BATCH_SIZE, side='right'))
+            stop = max(stop, start + 1)
+
+            batch_counts = counts[start:stop]
+            tri = np.repeat(np.arange(start, stop), batch_counts)
+            first = np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+            local = np.arange(len(tri)) - first
+
+            px = x0[tri] + local % box_w[tri]
+            py = y0[tri] + local // box_w[tri]
+
+            tx = sx[tri]
+            ty = sy[tri]
+            tz = sz[tri]
+            scale = inv_area[tri]
+
+            inside = np.ones(len(tri), dtype=bool)
+            z = np.full(len(tri), -np.inf, dtype=np.float64)
+
+            # the weights and the depth change linearly across the screen so
+            # the pixel is inside when every corner is and the farthest
+            # depth is at one of the corners
+            for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+                cx = px + dx
+                cy = py + dy
+
+                w0 = ((tx[:, 1] - cx) * (ty[:, 2] - cy) - (tx[:, 2] - cx) * (ty[:, 1] - cy)) * scale
+                w1 = ((tx[:, 2] - cx) * (ty[:, 0] - cy) - (tx[:, 0] - cx) * (ty[:, 2] - cy)) * scale
+                w2 = 1.0 - w0 - w1
+
+                inside &= (w0 >= 0.0) & (w1 >= 0.0) & (w2 >= 0.0)
+                z = np.maximum(z, w0 * tz[:, 0] + w1 * tz[:, 1] + w2 * tz[:, 2])
+
+            np.minimum.at(depth, (py * self.width + px)[inside], z[inside])
+
+            start = stop
+
+    def _build_levels(self):
+        levels = [self._depth]
+        level = self._depth
+
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            h, w = level.shape
+            # empty space is infinitely far away which keeps the max
+            # conservative for odd sizes
+            padded = np.full((h + h % 2, w + w % 2), np.inf, dtype=np.float64)
+            padded[:h, :w] = level
+
+            level = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(axis=(1, 3))
+            levels.append(level)
+
+        self._levels = levels
+
+    @staticmethod
+    def _corners(mn: np.ndarray, mx: np.ndarray) -> np.ndarray:
+        # (N, 8, 3) corners for (N, 3) minimums and maximums
+        select = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=bool)
+        return np.where(select[np.newaxis], mx[:, np.newaxis], mn[:, np.newaxis])
+
+    def _screen_rects(self, mn: np.ndarray, mx: np.ndarray) -> tuple[np.ndarray, ...]:
+        # returns the pixels covered (x0, y0, x1, y1), the nearest depth and
+        # whether the box crosses the near plane for every box
+        clip = self._project(self._corners(mn, mx))
+        w = clip[..., 3]
+        near = np.any(w <= _EPSILON, axis=1)
+
+        w = np.where(w <= _EPSILON, 1.0, w)
+        ndc = clip[..., :3] / w[..., np.newaxis]
+        sx = (ndc[..., 0] * 0.5 + 0.5) * self.width
+        sy = (ndc[..., 1] * 0.5 + 0.5) * self.height
+
+        x0 = np.maximum(np.floor(sx.min(axis=1)), 0).astype(np.int64)
+        x1 = np.minimum(np.ceil(sx.max(axis=1)) - 1, self.width - 1).astype(np.int64)
+        y0 = np.maximum(np.floor(sy.min(axis=1)), 0).astype(np.int64)
+        y1 = np.minimum(np.ceil(sy.max(axis=1)) - 1, self.height - 1).astype(np.int64)
+
+        return x0, y0, x1, y1, ndc[..., 2].min(axis=1), near
+
+    def _test_rect(self, x0: int, y0: int, x1: int, y1: int, z_near: float) -> bool:
+        if x1 < x0 or y1 < y0:
+            return False
+
+        size = max(x1 - x0 + 1, y1 - y0 + 1)
+        # the level where the box only covers a few texels
+        level = 0 if size <= 4 else int(math.ceil(math.log2(size / 4.0)))
+        level = min(level, len(self._levels) - 1)
+
+        region = self._levels[level][y0 >> level:(y1 >> level) + 1,
+                                     x0 >> level:(x1 >> level) + 1]
+
+        return bool(z_near > region.max())
+
+    def is_occluded(self, mn: np.ndarray, mx: np.ndarray) -> bool:
+        """
+        Tests a bounding box against the depth buffer.
+        """
+        x0, y0, x1, y1, z_near, near = self._screen_rects(
+            np.asarray(mn, dtype=np.float64)[np.newaxis],
+            np.asarray(mx, dtype=np.float64)[np.newaxis])
+
+        if near[0]:
+            return False
+
+        return self._test_rect(int(x0[0]), int(y0[0]), int(x1[0]), int(y1[0]), float(z_near[0]))
+
+    @staticmethod
+    def _is_opaque(obj) -> bool:
+        return any(renderer.is_opaque for renderer in obj.triangles)
+
+    def cull(self, objects: list, view_proj: np.ndarray, keep=None) -> list:
+        """
+        Returns the objects that are not hidden behind other objects.
+
+        `keep` is an optional function, objects it returns `True` for are
+        never culled.
+        """
+        self._view_proj = np.asarray(view_proj, dtype=np.float64)
+        self._depth = np.full((self.height, self.width), np.inf, dtype=np.float64)
+        self.culled_count = 0
+
+        tested = [obj for obj in objects if obj.rect and (keep is None or not keep(obj))]
+        if not tested:
+            self.occluder_count = 0
+            self._build_levels()
+            return list(objects)
+
+        owners = np.array([i for i, obj in enumerate(tested) for _ in obj.rect])
+        mn = np.array([p1.as_numpy for obj in tested for p1, _ in obj.rect], dtype=np.float64)
+        mx = np.array([p2.as_numpy for obj in tested for _, p2 in obj.rect], dtype=np.float64)
+
+        x0, y0, x1, y1, z_near, near = self._screen_rects(mn, mx)
+
+        # the objects that cover the most pixels make the best occluders, a
+        # box the camera is inside of covers everything
+        pixels = np.where(near, np.inf,
+                          np.maximum(x1 - x0 + 1, 0) * np.maximum(y1 - y0 + 1, 0))
+        area = np.zeros(len(tested), dtype=np.float64)
+        np.add.at(area, owners, pixels)
+
+        occluders = [tested[i] for i in np.argsort(-area, kind='stable')
+                     if area[i] > 0 and self._is_opaque(tested[i])][:self.max_occluders]
+
+        for obj in occluders:
+            tris = self._occluder_triangles(obj)
+            if tris is not None:
+                self.rasterize(tris)
+
+        self.occluder_count = len(occluders)
+        self._build_levels()
+
+        visible = np.zeros(len(tested), dtype=bool)
+        for i in range(len(owners)):
+            owner = owners[i]
+            if visible[owner]:
+                continue
+
+            if near[i] or not self._test_rect(int(x0[i]), int(y0[i]), int(x1[i]),
+                                              int(y1[i]), float(z_near[i])):
+                visible[owner] = True
+
+        hidden = {id(obj) for obj, flag in zip(tested, visible) if not flag}
+        self.culled_count = len(hidden)
+
+        return [obj for obj in objects if id(obj) not in hidden]
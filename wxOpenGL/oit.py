@@ -0,0 +1,410 @@
+"""
+Weighted blended order independent transparency.
+
+Based on "Weighted Blended Order-Independent Transparency" by McGuire and
+Bavoil. Instead of sorting the translucent objects back to front every frame
+the translucent geometry gets rendered into 2 offscreen targets. The first
+target accumulates the premultiplied colors weighted by depth and the second
+target holds the product of (1 - alpha) which is the "revealage". A single
+full screen pass then blends the weighted average over what has already been
+rendered.
+
+Because nothing is sorted the result doesn't change when translucent parts
+intersect each other and the cost no longer grows with the number of
+translucent objects being sorted.
+
+The lighting in the shader mirrors the fixed function lighting that is set
+up in `Canvas.InitGL`, the headlight and `GLMaterial.set` so translucent parts
+look the same as they do when they are drawn by the fixed function pipeline.
+"""
+
+from typing import Callable
+
+from OpenGL import GL
+from OpenGL import error as _gl_error
+
+from . import shader as _shader
+from .errors import ShaderError
+from . import debug as _debug
+
+
+_ACCUM_VERTEX = '''
+#version 120
+
+varying vec3 v_normal;
+varying vec3 v_position;
+varying vec4 v_color;
+
+void main()
+{
+    vec4 eye = gl_ModelViewMatrix * gl_Vertex;
+
+    v_position = eye.xyz;
+    v_normal = normalize(gl_NormalMatrix * gl_Normal);
+    v_color = gl_Color;
+
+    gl_ClipVertex = eye;
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+'''
+
+_ACCUM_FRAGMENT = '''
+#version 120
+
+// 0 = accumulation target only, 1 = revealage target only, 2 = both (MRT)
+uniform int u_pass;
+uniform int u_light_count;
+
+varying vec3 v_normal;
+varying vec3 v_position;
+varying vec4 v_color;
+
+vec3 shade(vec3 n, vec3 view_dir)
+{
+    vec3 color = gl_FrontMaterial.emission.rgb +
+                 gl_LightModel.ambient.rgb * v_color.rgb;
+
+    for (int i = 0; i < 2; i++) {
+        if (i >= u_light_count)
+            break;
+
+        vec4 light_pos = gl_LightSource[i].position;
+        vec3 l;
+
+        if (light_pos.w == 0.0)
+            l = normalize(light_pos.xyz);
+        else
+            l = normalize(light_pos.xyz - v_position);
+
+        float atten = 1.0;
+
+        if (gl_LightSource[i].spotCutoff <= 90.0) {
+            float spot = dot(-l, normalize(gl_LightSource[i].spotDirection));
+
+            if (spot < gl_LightSource[i].spotCosCutoff)
+                atten = 0.0;
+            else
+                atten = pow(spot, gl_LightSource[i].spotExponent);
+        }
+
+        float n_dot_l = max(dot(n, l), 0.0);
+
+        color += atten * gl_LightSource[i].ambient.rgb * v_color.rgb;
+        color += atten * n_dot_l * gl_LightSource[i].diffuse.rgb * v_color.rgb;
+
+        if (n_dot_l > 0.0) {
+            vec3 h = normalize(l + view_dir);
+            float spec = pow(max(dot(n, h), 0.0), gl_FrontMaterial.shininess);
+            color += atten * spec * gl_LightSource[i].specular.rgb *
+                     gl_FrontMaterial.specular.rgb;
+        }
+    }
+
+    return clamp(color, 0.0, 1.0);
+}
+
+void main()
+{
+    vec3 n = normalize(v_normal);
+    if (!gl_FrontFacing)
+        n = -n;
+
+    vec3 color = shade(n, normalize(-v_position));
+    float alpha = v_color.a;
+
+    // equation 7 from the paper, tuned for a view distance of ~1000 units
+    float z = abs(v_position.z);
+    float weight = alpha * clamp(
+        10.0 / (1e-5 + pow(z / 5.0, 2.0) + pow(z / 200.0, 6.0)), 1e-2, 3e3);
+
+    vec4 accum = vec4(color * alpha, alpha) * weight;
+
+    if (u_pass == 0) {
+        gl_FragData[0] = accum;
+    } else if (u_pass == 1) {
+        gl_FragData[0] = vec4(alpha);
+    } else {
+        gl_FragData[0] = accum;
+        gl_FragData[1] = vec4(alpha);
+    }
+}
+'''
+
+_COMPOSITE_VERTEX = '''
+#version 120
+
+void main()
+{
+    gl_Position = gl_Vertex;
+}
+'''
+
+_COMPOSITE_FRAGMENT = '''
+#version 120
+
+uniform sampler2D u_accum;
+uniform sampler2D u_revealage;
+uniform vec2 u_origin;
+uniform vec2 u_size;
+
+void main()
+{
+    vec2 uv = (gl_FragCoord.xy - u_origin) / u_size;
+    float revealage = texture2D(u_revealage, uv).r;
+
+    // nothing translucent landed on this pixel
+    if (revealage >= 1.0)
+        discard;
+
+    vec4 accum = texture2D(u_accum, uv);
+    vec3 average = accum.rgb / clamp(accum.a, 1e-4, 5e4);
+
+    gl_FragColor = vec4(average, 1.0 - revealage);
+}
+'''
+
+
+class OITRenderer:
+    """
+    Offscreen accumulation buffers for the translucent pass.
+
+    Everything drawn by the callable passed to `render` is accumulated and
+    then composited over the framebuffer that was bound when `render` was
+    called. The depth of the opaque geometry is copied into the
+    accumulation framebuffer so translucent fragments that are behind
+    opaque objects get rejected.
+
+    If the hardware/driver is not able to do any part of this `is_supported`
+    becomes `False` and the canvas falls back to sorting the objects.
+    """
+
+    def __init__(self):
+        self._accum_program = _shader.ShaderProgram(_ACCUM_VERTEX, _ACCUM_FRAGMENT)
+        self._composite_program = _shader.ShaderProgram(_COMPOSITE_VERTEX, _COMPOSITE_FRAGMENT)
+
+        self._fbo = None
+        self._accum_tex = None
+        self._revealage_tex = None
+        self._depth_tex = None
+        self._size = (0, 0)
+
+        self._prev_fbo = 0
+        self._viewport = (0, 0, 0, 0)
+        self._supported = True
+
+    @property
+    def is_supported(self) -> bool:
+        return self._supported
+
+    @staticmethod
+    def _make_texture(internal_format, fmt, data_type, width, height):
+        tex = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, tex)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, internal_format, width, height,
+                        0, fmt, data_type, None)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        return tex
+
+    def _delete_buffers(self):
+        if self._fbo is not None:
+            GL.glDeleteFramebuffers(1, [self._fbo])
+            GL.glDeleteTextures(3, [self._accum_tex, self._revealage_tex, self._depth_tex])
+
+        self._fbo = None
+        self._accum_tex = None
+        self._revealage_tex = None
+        self._depth_tex = None
+        self._size = (0, 0)
+
+    @_debug.logfunc
+    def _ensure_buffers(self, width: int, height: int):
+        if self._fbo is not None and self._size == (width, height):
+            return
+
+        self._delete_buffers()
+
+        self._accum_tex = self._make_texture(GL.GL_RGBA16F, GL.GL_RGBA,
+                                             GL.GL_FLOAT, width, height)
+        self._revealage_tex = self._make_texture(GL.GL_R8, GL.GL_RED,
+                                                 GL.GL_UNSIGNED_BYTE, width, height)
+        self._depth_tex = self._make_texture(GL.GL_DEPTH_COMPONENT24, GL.GL_DEPTH_COMPONENT,
+                                             GL.GL_UNSIGNED_INT, width, height)
+
+        self._fbo = GL.glGenFramebuffers(1)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                  GL.GL_TEXTURE_2D, self._accum_tex, 0)
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT1,
+                                  GL.GL_TEXTURE_2D, self._revealage_tex, 0)
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_DEPTH_ATTACHMENT,
+                                  GL.GL_TEXTURE_2D, self._depth_tex, 0)
+
+        status = GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._prev_fbo)
+
+        if status != GL.GL_FRAMEBUFFER_COMPLETE:
+            self._delete_buffers()
+            raise ShaderError(f'OIT framebuffer is incomplete ({status})')
+
+        self._size = (width, height)
+
+    def _copy_depth(self):
+        x, y, w, h = self._viewport
+
+        try:
+            GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, self._prev_fbo)
+            GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, self._fbo)
+            GL.glBlitFramebuffer(x, y, x + w, y + h, 0, 0, w, h,
+                                 GL.GL_DEPTH_BUFFER_BIT, GL.GL_NEAREST)
+        except _gl_error.GLError:
+            # the depth formats don't match, copying into the depth texture
+            # converts the format for us.
+            GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, self._prev_fbo)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self._depth_tex)
+            GL.glCopyTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, x, y, w, h)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+
+    def _begin(self):
+        self._prev_fbo = int(GL.glGetIntegerv(GL.GL_DRAW_FRAMEBUFFER_BINDING))
+        self._viewport = tuple(int(v) for v in GL.glGetIntegerv(GL.GL_VIEWPORT))
+        _, _, w, h = self._viewport
+
+        headlight = bool(GL.glIsEnabled(GL.GL_LIGHT1))
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_COLOR_BUFFER_BIT |
+                        GL.GL_DEPTH_BUFFER_BIT | GL.GL_VIEWPORT_BIT)
+
+        try:
+            self._accum_program.build()
+            self._composite_program.build()
+            self._ensure_buffers(w, h)
+            self._copy_depth()
+        except (ShaderError, _gl_error.GLError):
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._prev_fbo)
+            GL.glPopAttrib()
+            self._supported = False
+            return False
+
+        GL.glViewport(0, 0, w, h)
+
+        # clear accumulation to 0 and revealage to 1
+        GL.glDrawBuffer(GL.GL_COLOR_ATTACHMENT0)
+        GL.glClearColor(0.0, 0.0, 0.0, 0.0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+
+        GL.glDrawBuffer(GL.GL_COLOR_ATTACHMENT1)
+        GL.glClearColor(1.0, 1.0, 1.0, 1.0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+
+        GL.glEnable(GL.GL_DEPTH_TEST)
+        GL.glDepthMask(GL.GL_FALSE)
+        GL.glEnable(GL.GL_BLEND)
+
+        GL.glUseProgram(self._accum_program.program)
+        self._accum_program.set_int('u_light_count', 2 if headlight else 1)
+
+        return True
+
+    def _set_pass(self, pass_num):
+        if pass_num == 2:
+            GL.glDrawBuffers(2, [GL.GL_COLOR_ATTACHMENT0, GL.GL_COLOR_ATTACHMENT1])
+            GL.glBlendFunci(0, GL.GL_ONE, GL.GL_ONE)
+            GL.glBlendFunci(1, GL.GL_ZERO, GL.GL_ONE_MINUS_SRC_COLOR)
+        elif pass_num == 0:
+            GL.glDrawBuffer(GL.GL_COLOR_ATTACHMENT0)
+            GL.glBlendFunc(GL.GL_ONE, GL.GL_ONE)
+        else:
+            GL.glDrawBuffer(GL.GL_COLOR_ATTACHMENT1)
+            GL.glBlendFunc(GL.GL_ZERO, GL.GL_ONE_MINUS_SRC_COLOR)
+
+        self._accum_program.set_int('u_pass', pass_num)
+
+    def _end(self, composite: bool):
+        GL.glUseProgram(0)
+        # the draw buffer selection is stored in the framebuffer object so
+        # binding the previous framebuffer gives us back its draw buffer.
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._prev_fbo)
+
+        x, y, w, h = self._viewport
+        GL.glViewport(x, y, w, h)
+
+        if composite:
+            self._composite()
+
+        GL.glPopAttrib()
+
+    @_debug.logfunc
+    def render(self, draw: Callable[[], None]) -> bool:
+        """
+        Draw translucent geometry using weighted blended OIT.
+
+        `draw` gets called to issue the draw calls for the translucent
+        geometry. It may be called 2 times if the driver doesn't support
+        per target blend functions (`glBlendFunci`, core in GL 4.0).
+
+        Returns `False` without calling `draw` if OIT is not able to be used,
+        the caller is then responsible for drawing the geometry some other way.
+        """
+        if not self._supported or not self._begin():
+            return False
+
+        try:
+            if GL.glBlendFunci:
+                self._set_pass(2)
+                draw()
+            else:
+                self._set_pass(0)
+                draw()
+                self._set_pass(1)
+                draw()
+        except:  # NOQA
+            self._end(False)
+            raise
+
+        self._end(True)
+        return True
+
+    def _composite(self):
+        GL.glDisable(GL.GL_DEPTH_TEST)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glDisable(GL.GL_CLIP_PLANE0)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+
+        GL.glActiveTexture(GL.GL_TEXTURE1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._revealage_tex)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._accum_tex)
+
+        x, y, w, h = self._viewport
+
+        with self._composite_program as program:
+            program.set_int('u_accum', 0)
+            program.set_int('u_revealage', 1)
+            program.set_vec2('u_origin', x, y)
+            program.set_vec2('u_size', w, h)
+
+            # the vertex shader passes the positions straight through so
+            # this covers the whole viewport no matter what the matrices are.
+            GL.glBegin(GL.GL_QUADS)
+            GL.glVertex2f(-1.0, -1.0)
+            GL.glVertex2f(1.0, -1.0)
+            GL.glVertex2f(1.0, 1.0)
+            GL.glVertex2f(-1.0, 1.0)
+            GL.glEnd()
+
+        GL.glActiveTexture(GL.GL_TEXTURE1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+    def delete(self):
+        self._delete_buffers()
+        self._accum_program.delete()
+        self._composite_program.delete()
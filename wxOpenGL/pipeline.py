@@ -0,0 +1,601 @@
+"""
+Shader based renderer for the objects in the scene.
+
+`TriangleRenderer` draws with the fixed function pipeline, client side
+vertex arrays that get sent to the video card every frame, `glMaterialfv`
+for the material and the OpenGL lights for the lighting. This draws the same
+data with GLSL 3.30 shaders instead:
+
+  * The vertices are uploaded to buffers one time and drawn from vertex
+    array objects. They only get uploaded again when the renderer gets new
+    data. Compact meshes (see `vertex_format`) keep their 12 bytes per
+    vertex on the video card, the shader turns them back into coordinates.
+  * Meshes with the same vertices are uploaded only once and the buffers are
+    shared by all of the canvases that share a context. Opaque objects
+    that use the same mesh and the same kind of material are drawn with a
+    single instanced draw call. The placement matrix and the color of every
+    object are per instance attributes.
+  * Materials are uniform blocks made from `GLMaterial.uniform_data`, one
+    buffer for every different material.
+  * The lights are in a uniform block that gets filled one time per frame,
+    the headlight comes from `Headlight.uniform_data`.
+  * The lighting is done per pixel with the same terms the fixed function
+    pipeline uses per vertex, so the objects look the same, only smoother.
+
+The canvas uses a compatibility context because the grid, the overlays,
+order independent transparency and the reflection are still drawn with the
+fixed function pipeline. The shaders are "#version 330 compatibility" so
+they follow the modelview and projection matrices and the clip plane the
+rest of the canvas sets up. If the video card doesn't have GLSL 3.30 the
+canvas keeps drawing with `TriangleRenderer`, see `Config.rendering.shaders`.
+"""
+
+from typing import TYPE_CHECKING
+
+import ctypes
+import hashlib
+import weakref
+
+import numpy as np
+from OpenGL import GL
+from OpenGL import error as _gl_error
+
+from . import shader as _shader
+from .errors import ShaderError
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import headlight as _headlight
+    from .objects import base3d as _base3d
+
+
+_VERTEX = '''
+#version 330 compatibility
+
+layout(location = 0) in vec3 a_position;
+layout(location = 1) in vec3 a_normal;
+// placement matrix of the instance, one column per attribute
+layout(location = 2) in vec4 a_model0;
+layout(location = 3) in vec4 a_model1;
+layout(location = 4) in vec4 a_model2;
+layout(location = 5) in vec4 a_model3;
+layout(location = 6) in vec4 a_color;
+
+out vec3 v_position;
+out vec3 v_normal;
+out vec4 v_color;
+
+void main()
+{
+    mat4 model = mat4(a_model0, a_model1, a_model2, a_model3);
+    vec4 eye = gl_ModelViewMatrix * (model * vec4(a_position, 1.0));
+
+    v_position = eye.xyz;
+    v_normal = mat3(gl_ModelViewMatrix) * (mat3(model) * a_normal);
+    v_color = a_color;
+
+    gl_ClipVertex = eye;
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+'''
+
+_FRAGMENT = '''
+#version 330 compatibility
+
+layout(std140) uniform Frame
+{
+    vec4 scene_ambient;
+    vec4 light_position;
+    vec4 light_ambient;
+    vec4 light_diffuse;
+    vec4 light_specular;
+    vec4 head_position;
+    // w is the cosine of the cutoff angle
+    vec4 head_direction;
+    vec4 head_color;
+    // x is the exponent, y is 1 when the headlight is on
+    vec4 head_params;
+};
+
+layout(std140) uniform Material
+{
+    vec4 mat_specular;
+    vec4 mat_emission;
+    // x is the shininess
+    vec4 mat_params;
+};
+
+in vec3 v_position;
+in vec3 v_normal;
+in vec4 v_color;
+
+out vec4 frag_color;
+
+vec3 shade(vec3 n, vec3 view_dir, vec3 l, float atten,
+           vec3 ambient, vec3 diffuse, vec3 specular)
+{
+    float n_dot_l = max(dot(n, l), 0.0);
+    vec3 color = atten * (ambient + n_dot_l * diffuse) * v_color.rgb;
+
+    if (n_dot_l > 0.0) {
+        vec3 h = normalize(l + view_dir);
+        float spec = pow(max(dot(n, h), 0.0), mat_params.x);
+        color += atten * spec * specular * mat_specular.rgb;
+    }
+
+    return color;
+}
+
+void main()
+{
+    vec3 n = normalize(v_normal);
+    if (!gl_FrontFacing)
+        n = -n;
+
+    vec3 view_dir = normalize(-v_position);
+
+    vec3 color = mat_emission.rgb + scene_ambient.rgb * v_color.rgb;
+    color += shade(n, view_dir, normalize(light_position.xyz), 1.0,
+                   light_ambient.rgb, light_diffuse.rgb, light_specular.rgb);
+
+    if (head_params.y > 0.0) {
+        vec3 l = normalize(head_position.xyz - v_position);
+        float spot = dot(-l, normalize(head_direction.xyz));
+
+        if (spot >= head_direction.w)
+            color += shade(n, view_dir, l, pow(spot, head_params.x),
+                           vec3(0.0), head_color.rgb, head_color.rgb);
+    }
+
+    frag_color = vec4(clamp(color, 0.0, 1.0), v_color.a);
+}
+'''
+
+# binding points of the uniform blocks
+_FRAME_BINDING = 0
+_MATERIAL_BINDING = 1
+
+# the global ambient light and GL_LIGHT0 the way `Canvas.InitGL` sets them
+# up. GL_LIGHT0 never gets a position so it is the default, pointing down
+# the z axis in eye space.
+_LIGHTS = np.array([0.2, 0.2, 0.2, 1.0,
+                    0.0, 0.0, 1.0, 0.0,
+                    0.5, 0.5, 0.5, 1.0,
+                    0.3, 0.3, 0.3, 1.0,
+                    0.5, 0.5, 0.5, 1.0], dtype=np.float32)
+
+# 16 values for the matrix and 4 for the color
+_INSTANCE_SIZE = 20
+_INSTANCE_STRIDE = _INSTANCE_SIZE * 4
+_COLOR_OFFSET = 16 * 4
+
+_IDENTITY = np.identity(4, dtype=np.float32).ravel()
+
+_GL_ERRORS = (ShaderError, _gl_error.GLError, _gl_error.NullFunctionError)
+
+
+class _Buffer:
+    # vertices of a single mesh on the video card. Buffers are shared by all
+    # of the contexts in a share group, vertex array objects are not, every
+    # pipeline makes its own for a buffer.
+
+    def __init__(self, vbo: int, count: int, layout: list[tuple[int, int, bool, int, int]]):
+        self.vbo = vbo
+        self.count = count
+        # (components, type, normalized, stride, offset) of the position and
+        # the normal
+        self.layout = layout
+
+    def delete(self):
+        GL.glDeleteBuffers(1, [self.vbo])
+        # lets the pipelines know to delete their vertex array objects
+        self.vbo = None
+
+
+class _Entry:
+    # what is on the video card for a single `TriangleRenderer`
+
+    def __init__(self):
+        self.version = -1
+        self.keys = []
+        self.buffers = []
+        # buffers that only this renderer uses and the digests of the shared
+        # ones it is holding a reference to
+        self.owned = []
+        self.shared = []
+
+
+def _make_buffer(buffers: list[tuple[np.ndarray, int, int, bool]], count: int) -> _Buffer:
+    # buffers is (array, components, type, normalized) for the position and
+    # the normal
+    data = b''.join(array.tobytes() for array, _, _, _ in buffers)
+
+    vbo = GL.glGenBuffers(1)
+    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
+    GL.glBufferData(GL.GL_ARRAY_BUFFER, len(data), data, GL.GL_STATIC_DRAW)
+    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    layout = []
+    offset = 0
+    for array, components, gl_type, normalized in buffers:
+        layout.append((components, gl_type, normalized, array.strides[0], offset))
+        offset += array.nbytes
+
+    return _Buffer(vbo, count, layout)
+
+
+class _Geometry:
+    """
+    Vertex buffers for a group of contexts that share with each other.
+
+    This is kept in `GLContext.resources` so canvases that draw the same
+    scene upload every mesh one time and not one time for each canvas.
+    """
+
+    def __init__(self):
+        self.entries = weakref.WeakKeyDictionary()
+        # digest of the vertices -> [buffer, number of renderers using it]
+        self.shared = {}
+        # id of a compact position array -> (weak reference, digest) so the
+        # arrays don't get hashed more than one time
+        self.digests = {}
+        # entries of renderers that have been garbage collected, the GL
+        # objects can only be deleted when a context is current
+        self.garbage = []
+
+    def collect(self):
+        while self.garbage:
+            entry = self.garbage.pop()
+            self.release(entry.owned, entry.shared)
+
+    def release(self, owned: list[_Buffer], shared: list[bytes]):
+        for buffer in owned:
+            buffer.delete()
+
+        for digest in shared:
+            item = self.shared[digest]
+            item[1] -= 1
+
+            if item[1] == 0:
+                item[0].delete()
+                del self.shared[digest]
+
+    def digest(self, positions: np.ndarray, nrmls: np.ndarray) -> bytes:
+        key = id(positions)
+        cached = self.digests.get(key, None)
+
+        if cached is not None and cached[0]() is positions:
+            return cached[1]
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(positions.tobytes())
+        digest.update(nrmls.tobytes())
+        digest = digest.digest()
+
+        def _remove(_, k=key, digests=self.digests):
+            digests.pop(k, None)
+
+        self.digests[key] = (weakref.ref(positions, _remove), digest)
+        return digest
+
+    def get_entry(self, renderer: "_base3d.TriangleRenderer") -> _Entry:
+        data = renderer.data
+        keys = [id(item[0]) for item in data]
+
+        entry = self.entries.get(renderer, None)
+        if entry is None:
+            entry = _Entry()
+            self.entries[renderer] = entry
+            weakref.finalize(renderer, self.garbage.append, entry)
+        elif entry.version == renderer.version and entry.keys == keys:
+            return entry
+
+        buffers = []
+        owned = []
+        shared = []
+
+        # the new buffers are looked up before the old ones get released,
+        # a compact mesh that only this renderer uses would otherwise get
+        # deleted and uploaded again every time the object moves
+        for item in data:
+            if len(item) == 4:
+                # compact meshes don't change when the object moves, only
+                # the matrix does and that is read when drawing. Meshes that
+                # are the same get shared.
+                positions, nrmls, count, _ = item
+                digest = self.digest(positions, nrmls)
+
+                record = self.shared.get(digest, None)
+                if record is None:
+                    buffer = _make_buffer(
+                        [(np.ascontiguousarray(positions), 3, GL.GL_SHORT, False),
+                         (np.ascontiguousarray(nrmls), 3, GL.GL_BYTE, True)],
+                        count)
+                    record = self.shared[digest] = [buffer, 0]
+
+                record[1] += 1
+                shared.append(digest)
+                buffers.append(record[0])
+            else:
+                # these are in world space, they get uploaded again when
+                # the object moves
+                tris, nrmls, count = item
+                buffer = _make_buffer(
+                    [(np.ascontiguousarray(tris.reshape(-1, 3), dtype=np.float32),
+                      3, GL.GL_FLOAT, False),
+                     (np.ascontiguousarray(nrmls.reshape(-1, 3), dtype=np.float32),
+                      3, GL.GL_FLOAT, False)],
+                    count)
+
+                owned.append(buffer)
+                buffers.append(buffer)
+
+        self.release(entry.owned, entry.shared)
+
+        entry.buffers = buffers
+        entry.owned = owned
+        entry.shared = shared
+        entry.version = renderer.version
+        entry.keys = keys
+
+        return entry
+
+
+class ShaderPipeline:
+    """
+    `resources` is `GLContext.resources` of the context the pipeline draws
+    with, the vertex buffers are kept there so they are shared with the
+    other contexts in the group. Each pipeline only has its own vertex
+    array objects, those can't be shared between contexts.
+    """
+
+    def __init__(self, resources: dict | None = None):
+        if resources is None:
+            resources = {}
+
+        self._program = _shader.ShaderProgram(_VERTEX, _FRAGMENT)
+
+        self._frame_ubo = None
+        self._instance_vbo = None
+        # material uniform data -> uniform buffer
+        self._materials = {}
+
+        self._geometry = resources.setdefault('pipeline.geometry', _Geometry())
+        # id of a buffer -> (buffer, vertex array object)
+        self._vaos = {}
+
+        self._supported = True
+
+        self.draw_calls = 0
+        self.instances = 0
+
+    @property
+    def is_supported(self) -> bool:
+        return self._supported
+
+    @_debug.logfunc
+    def _build(self):
+        if self._frame_ubo is not None:
+            return
+
+        self._program.build()
+        program = self._program.program
+
+        GL.glUniformBlockBinding(program, GL.glGetUniformBlockIndex(program, 'Frame'),
+                                 _FRAME_BINDING)
+        GL.glUniformBlockBinding(program, GL.glGetUniformBlockIndex(program, 'Material'),
+                                 _MATERIAL_BINDING)
+
+        self._frame_ubo = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, self._frame_ubo)
+        GL.glBufferData(GL.GL_UNIFORM_BUFFER, 36 * 4, None, GL.GL_DYNAMIC_DRAW)
+        GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, 0)
+
+        self._instance_vbo = GL.glGenBuffers(1)
+
+    @_debug.logfunc
+    def begin_frame(self, view: np.ndarray, headlight: "_headlight.Headlight | None") -> bool:
+        """
+        Upload the lights for the frame, `view` is the view matrix of the
+        camera.
+
+        Returns `False` if shaders can't be used, the canvas then draws with
+        the fixed function pipeline.
+        """
+        if not self._supported:
+            return False
+
+        data = np.zeros(36, dtype=np.float32)
+        data[:20] = _LIGHTS
+
+        if headlight is not None:
+            data[20:] = headlight.uniform_data(view)
+
+        try:
+            self._build()
+            self._geometry.collect()
+            self._collect()
+
+            GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, self._frame_ubo)
+            GL.glBufferSubData(GL.GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+            GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, 0)
+        except _GL_ERRORS:
+            self._supported = False
+            return False
+
+        return True
+
+    def _collect(self):
+        # vertex array objects of buffers that have been deleted, possibly
+        # by the pipeline of another canvas
+        for key, (buffer, vao) in list(self._vaos.items()):
+            if buffer.vbo is None:
+                GL.glDeleteVertexArrays(1, [vao])
+                del self._vaos[key]
+
+    def _get_vao(self, buffer: _Buffer) -> int:
+        item = self._vaos.get(id(buffer), None)
+        if item is not None:
+            return item[1]
+
+        vao = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer.vbo)
+
+        for index, (components, gl_type, normalized, stride, offset) in enumerate(buffer.layout):
+            GL.glEnableVertexAttribArray(index)
+            GL.glVertexAttribPointer(index, components, gl_type, normalized,
+                                     stride, ctypes.c_void_p(offset))
+
+        # the instance attributes point into the instance buffer, they get
+        # pointed at the right place for every draw
+        for index in range(2, 7):
+            GL.glEnableVertexAttribArray(index)
+            GL.glVertexAttribDivisor(index, 1)
+
+        GL.glBindVertexArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+        self._vaos[id(buffer)] = (buffer, vao)
+        return vao
+
+    def _get_material(self, data: bytes) -> int:
+        ubo = self._materials.get(data, None)
+
+        if ubo is None:
+            ubo = GL.glGenBuffers(1)
+            GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, ubo)
+            GL.glBufferData(GL.GL_UNIFORM_BUFFER, len(data), data, GL.GL_STATIC_DRAW)
+            GL.glBindBuffer(GL.GL_UNIFORM_BUFFER, 0)
+            self._materials[data] = ubo
+
+        return ubo
+
+    @_debug.logfunc
+    def draw(self, renderers: list["_base3d.TriangleRenderer"]) -> bool:
+        """
+        Draw the renderers, opaque ones first.
+
+        The translucent renderers are drawn one at a time in the order they
+        are in. Returns `False` if nothing was drawn because shaders can't be
+        used.
+        """
+        if not self._supported or self._frame_ubo is None:
+            return False
+
+        if not renderers:
+            return True
+
+        # (buffer, material) -> instances for the opaque objects, the
+        # translucent ones keep their order
+        batches = {}
+        ordered = []
+
+        try:
+            for renderer in renderers:
+                entry = self._geometry.get_entry(renderer)
+                material = renderer.material
+                key = material.uniform_data().tobytes()
+                color = material.color
+
+                for item, buffer in zip(renderer.data, entry.buffers):
+                    if len(item) == 4:
+                        matrix = item[3]
+                    else:
+                        matrix = None
+
+                    if renderer.is_opaque:
+                        batches.setdefault((buffer, key), []).append((matrix, color))
+                    else:
+                        ordered.append(((buffer, key), [(matrix, color)]))
+        except _GL_ERRORS:
+            self._supported = False
+            return False
+
+        groups = list(batches.items()) + ordered
+        count = sum(len(instances) for _, instances in groups)
+
+        data = np.empty((count, _INSTANCE_SIZE), dtype=np.float32)
+        row = 0
+
+        for _, instances in groups:
+            for matrix, color in instances:
+                if matrix is None:
+                    data[row, :16] = _IDENTITY
+                else:
+                    # the matrices are for row vectors, the rows of it are
+                    # the columns GLSL wants
+                    data[row, :16] = matrix.ravel()
+
+                data[row, 16:] = color
+                row += 1
+
+        GL.glUseProgram(self._program.program)
+
+        try:
+            GL.glBindBufferBase(GL.GL_UNIFORM_BUFFER, _FRAME_BINDING, self._frame_ubo)
+
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self._instance_vbo)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, data.nbytes, data, GL.GL_STREAM_DRAW)
+
+            row = 0
+            material = None
+
+            for (buffer, key), instances in groups:
+                if key != material:
+                    GL.glBindBufferBase(GL.GL_UNIFORM_BUFFER, _MATERIAL_BINDING,
+                                        self._get_material(key))
+                    material = key
+
+                GL.glBindVertexArray(self._get_vao(buffer))
+
+                offset = row * _INSTANCE_STRIDE
+                for i in range(4):
+                    GL.glVertexAttribPointer(2 + i, 4, GL.GL_FLOAT, False, _INSTANCE_STRIDE,
+                                             ctypes.c_void_p(offset + i * 16))
+
+                GL.glVertexAttribPointer(6, 4, GL.GL_FLOAT, False, _INSTANCE_STRIDE,
+                                         ctypes.c_void_p(offset + _COLOR_OFFSET))
+
+                GL.glDrawArraysInstanced(GL.GL_TRIANGLES, 0, buffer.count, len(instances))
+
+                row += len(instances)
+                self.draw_calls += 1
+                self.instances += len(instances)
+
+        except _GL_ERRORS:
+            self._supported = False
+            return False
+        finally:
+            # the rest of the canvas uses client side arrays, those break if
+            # a buffer is left bound
+            GL.glBindVertexArray(0)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+            GL.glUseProgram(0)
+
+        return True
+
+    def delete(self):
+        """
+        Delete the GL objects of this pipeline.
+
+        The vertex buffers are left alone, other canvases in the share group
+        may still be drawing them. They get deleted when the renderers that
+        use them are garbage collected.
+        """
+        for _, vao in self._vaos.values():
+            GL.glDeleteVertexArrays(1, [vao])
+
+        self._vaos.clear()
+
+        for ubo in self._materials.values():
+            GL.glDeleteBuffers(1, [ubo])
+
+        self._materials.clear()
+
+        if self._frame_ubo is not None:
+            GL.glDeleteBuffers(2, [self._frame_ubo, self._instance_vbo])
+
+        self._frame_ubo = None
+        self._instance_vbo = None
+        self._program.delete()
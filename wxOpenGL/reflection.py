@@ -0,0 +1,293 @@
+"""
+Floor reflection rendered to a texture.
+
+The mirrored scene used to be drawn straight into the framebuffer every
+single frame which doubled the number of triangles being rendered. Now the
+mirrored scene gets rendered into an offscreen texture at a fraction of the
+window size and small objects are left out of it. The texture is then
+projected onto the floor using the matrices the reflection was rendered
+with, this keeps a stale reflection lined up with the floor while the camera
+is moving.
+
+The texture only gets rendered again when the camera or the scene changes.
+While things are moving it is limited to `Config.floor.reflection_update_rate`
+updates a second.
+"""
+
+from typing import TYPE_CHECKING
+
+import time
+
+import wx
+import numpy as np
+from OpenGL import GL
+from OpenGL import error as _gl_error
+
+from . import shader as _shader
+from .errors import ShaderError
+from . import config as _config
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+
+_VERTEX = '''
+#version 120
+
+uniform mat4 u_reflection_matrix;
+
+varying vec4 v_tex;
+
+void main()
+{
+    v_tex = u_reflection_matrix * gl_Vertex;
+    gl_Position = ftransform();
+}
+'''
+
+_FRAGMENT = '''
+#version 120
+
+uniform sampler2D u_reflection;
+uniform float u_strength;
+
+varying vec4 v_tex;
+
+void main()
+{
+    vec4 color = texture2DProj(u_reflection, v_tex);
+    gl_FragColor = vec4(color.rgb, color.a * u_strength);
+}
+'''
+
+# maps clip space [-1, 1] to texture space [0, 1]
+_BIAS = np.array([[0.5, 0.0, 0.0, 0.5],
+                  [0.0, 0.5, 0.0, 0.5],
+                  [0.0, 0.0, 0.5, 0.5],
+                  [0.0, 0.0, 0.0, 1.0]], dtype=np.float64)
+
+
+def _get_matrix(pname) -> np.ndarray:
+    # OpenGL hands back column-major data, transposing makes it row-major
+    return np.array(GL.glGetDoublev(pname), dtype=np.float64).reshape((4, 4)).T
+
+
+class FloorReflection:
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+        self._program = _shader.ShaderProgram(_VERTEX, _FRAGMENT)
+
+        self._fbo = None
+        self._color_tex = None
+        self._depth_rb = None
+        self._size = (0, 0)
+
+        self._key = None
+        self._last_render = 0.0
+        self._pending = None
+        self._matrix = np.identity(4, dtype=np.float64)
+        self._supported = True
+
+    @property
+    def is_supported(self) -> bool:
+        return self._supported
+
+    def _delete_buffers(self):
+        if self._fbo is not None:
+            GL.glDeleteFramebuffers(1, [self._fbo])
+            GL.glDeleteTextures(1, [self._color_tex])
+            GL.glDeleteRenderbuffers(1, [self._depth_rb])
+
+        self._fbo = None
+        self._color_tex = None
+        self._depth_rb = None
+        self._size = (0, 0)
+
+    @_debug.logfunc
+    def _ensure_buffers(self, width: int, height: int, prev_fbo: int):
+        if self._fbo is not None and self._size == (width, height):
+            return
+
+        self._delete_buffers()
+
+        self._color_tex = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._color_tex)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, width, height,
+                        0, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, None)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+        self._depth_rb = GL.glGenRenderbuffers(1)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self._depth_rb)
+        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_DEPTH_COMPONENT24, width, height)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, 0)
+
+        self._fbo = GL.glGenFramebuffers(1)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                  GL.GL_TEXTURE_2D, self._color_tex, 0)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_DEPTH_ATTACHMENT,
+                                     GL.GL_RENDERBUFFER, self._depth_rb)
+
+        status = GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, prev_fbo)
+
+        if status != GL.GL_FRAMEBUFFER_COMPLETE:
+            self._delete_buffers()
+            raise ShaderError(f'reflection framebuffer is incomplete ({status})')
+
+        self._size = (width, height)
+
+    @staticmethod
+    def _filter_objects(objects: list) -> list:
+        # LOD for the reflection, small parts are not worth drawing 2 times
+        min_size = Config.floor.reflection_min_size
+        if min_size <= 0.0:
+            return objects
+
+        res = []
+        for obj in objects:
+            for p1, p2 in obj.rect:
+                if max(p2.x - p1.x, p2.y - p1.y, p2.z - p1.z) >= min_size:
+                    res.append(obj)
+                    break
+
+        return res
+
+    def _schedule_refresh(self, delay: float):
+        if self._pending is not None and self._pending.IsRunning():
+            return
+
+        # make sure the reflection catches up once the motion stops
+        self._pending = wx.CallLater(max(1, int(delay * 1000)), self.canvas.Refresh, False)
+
+    @_debug.logfunc
+    def update(self, objects: list) -> bool:
+        """
+        Render the mirrored scene into the texture if it is out of date.
+
+        This needs to be called after the projection and the camera have been
+        set. Returns `False` if rendering to a texture is not supported, the
+        canvas then has to draw the reflection directly.
+        """
+        if not self._supported:
+            return False
+
+        x, y, w, h = (int(v) for v in GL.glGetIntegerv(GL.GL_VIEWPORT))
+        scale = min(1.0, max(0.05, Config.floor.reflection_scale))
+
+        key = (self.canvas.camera.version, self.canvas.scene_version, w, h,
+               scale, Config.floor.reflection_min_size, Config.floor.ground_height)
+
+        if key == self._key:
+            return True
+
+        now = time.perf_counter()
+        rate = Config.floor.reflection_update_rate
+        if self._key is not None and rate > 0.0:
+            remaining = (1.0 / rate) - (now - self._last_render)
+            if remaining > 0.0:
+                self._schedule_refresh(remaining)
+                return True
+
+        tw = max(1, int(w * scale))
+        th = max(1, int(h * scale))
+
+        prev_fbo = int(GL.glGetIntegerv(GL.GL_DRAW_FRAMEBUFFER_BINDING))
+
+        try:
+            self._program.build()
+            self._ensure_buffers(tw, th, prev_fbo)
+        except (ShaderError, _gl_error.GLError):
+            self._supported = False
+            return False
+
+        projection = _get_matrix(GL.GL_PROJECTION_MATRIX)
+        modelview = _get_matrix(GL.GL_MODELVIEW_MATRIX)
+        self._matrix = _BIAS @ projection @ modelview
+
+        ground_height = Config.floor.ground_height
+
+        GL.glPushAttrib(GL.GL_VIEWPORT_BIT | GL.GL_COLOR_BUFFER_BIT | GL.GL_ENABLE_BIT)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+        GL.glViewport(0, 0, tw, th)
+        GL.glClearColor(0.0, 0.0, 0.0, 0.0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+
+        GL.glPushMatrix()
+        # Reflect across the floor plane (flip the Y-axis)
+        GL.glTranslatef(0.0, ground_height, 0.0)
+        GL.glScalef(1.0, -1.0, 1.0)
+        GL.glTranslatef(0.0, -ground_height, 0.0)
+
+        # Enable clipping to avoid rendering anything that is below the floor
+        GL.glEnable(GL.GL_CLIP_PLANE0)
+        GL.glClipPlane(GL.GL_CLIP_PLANE0, [0.0, 1.0, 0.0, -ground_height])
+
+        try:
+            # order independent transparency is not used for the reflection,
+            # its buffers are sized to the canvas and would end up being
+            # reallocated every time the reflection gets rendered.
+            self.canvas.draw_scene(self._filter_objects(objects))
+        finally:
+            GL.glDisable(GL.GL_CLIP_PLANE0)
+            GL.glPopMatrix()
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, prev_fbo)
+            GL.glPopAttrib()
+
+        self._key = key
+        self._last_render = now
+        return True
+
+    @_debug.logfunc
+    def draw(self):
+        """
+        Draw the reflection texture onto the floor.
+        """
+        if self._fbo is None:
+            return
+
+        size = Config.floor.distance
+        ground_height = Config.floor.ground_height
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_DEPTH_BUFFER_BIT | GL.GL_COLOR_BUFFER_BIT)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        GL.glDepthMask(GL.GL_FALSE)
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._color_tex)
+
+        with self._program as program:
+            program.set_int('u_reflection', 0)
+            program.set_float('u_strength', Config.floor.reflection_strength / 100.0)
+            program.set_matrix('u_reflection_matrix', self._matrix)
+
+            GL.glBegin(GL.GL_QUADS)
+            GL.glVertex3f(-size, ground_height, -size)
+            GL.glVertex3f(-size, ground_height, size)
+            GL.glVertex3f(size, ground_height, size)
+            GL.glVertex3f(size, ground_height, -size)
+            GL.glEnd()
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        GL.glPopAttrib()
+
+    def invalidate(self):
+        self._key = None
+
+    def delete(self):
+        if self._pending is not None:
+            self._pending.Stop()
+            self._pending = None
+
+        self._delete_buffers()
+        self._program.delete()
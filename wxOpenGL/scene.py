@@ -0,0 +1,89 @@
+"""
+Objects shared between canvases.
+
+A `Scene` holds the objects that get rendered. Every canvas is attached to
+a scene, by default each canvas gets a scene of its own. Passing the same
+scene to more than one canvas (split views, previews) renders the same
+objects in all of them, the meshes only exist one time in memory. Each canvas
+still has its own camera and does its own culling.
+
+The scene can be passed to an object in place of a canvas. Adding, removing
+or changing an object refreshes every canvas that is attached to the scene.
+
+    scene = wxOpenGL.Scene()
+    perspective = wxOpenGL.Canvas(parent, scene=scene)
+    top = wxOpenGL.Canvas(parent, share=perspective)
+
+    model = wxOpenGL.MeshModel(scene, material, selected_material, True, 'part.step')
+"""
+
+from typing import TYPE_CHECKING, Self
+
+import weakref
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+    from .objects import base3d as _base3d
+
+
+class Scene:
+
+    def __init__(self):
+        self._objects: list["_base3d.Base3D"] = []
+        self._canvases = weakref.WeakSet()
+        self._version = 0
+        self._ref_count = 0
+
+    @property
+    def objects(self) -> list["_base3d.Base3D"]:
+        return self._objects
+
+    @property
+    def canvases(self) -> list["_canvas.Canvas"]:
+        return list(self._canvases)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def attach(self, canvas: "_canvas.Canvas"):
+        self._canvases.add(canvas)
+
+    def detach(self, canvas: "_canvas.Canvas"):
+        self._canvases.discard(canvas)
+
+    def InvalidateScene(self):
+        """
+        Something in the scene has changed, all of the canvases need to draw
+        it again.
+        """
+        self._version += 1
+        self.Refresh(False)
+
+    def AddObject(self, obj: "_base3d.Base3D"):
+        with self:
+            self._objects.insert(0, obj)
+
+        self.InvalidateScene()
+
+    def RemoveObject(self, obj: "_base3d.Base3D"):
+        try:
+            self._objects.remove(obj)
+        except:  # NOQA
+            return
+
+        self.InvalidateScene()
+
+    def __enter__(self) -> Self:
+        self._ref_count += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._ref_count -= 1
+
+    def Refresh(self, *args, **kwargs):
+        if self._ref_count:
+            return
+
+        for canvas in list(self._canvases):
+            canvas.Refresh(*args, **kwargs)
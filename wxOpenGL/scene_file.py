@@ -0,0 +1,393 @@
+"""
+Native scene file.
+
+Opening a project used to mean reading every model file again and building
+every object from scratch, tessellating a STEP file and calculating the
+normals is where nearly all of that time goes. A scene file stores the
+objects along with the mesh data and the render buffers that have already
+been built so none of that has to be done again.
+
+The file is laid out like this
+
+    header      magic, version, offset and size of the metadata
+    sections    raw array data, every section starts on a 64 byte boundary
+    metadata    JSON that describes the objects, materials and transforms
+                and where the arrays for each object are in the file
+
+When a scene is loaded the file is memory mapped and the arrays are views
+into the mapping. Nothing gets read until it is used and the operating system
+pages the data in as it is needed. The mapping is copy on write, moving an
+object changes the arrays in memory and does not touch the file.
+
+Arrays that are shared between objects (several `MeshModel` objects made from
+the same file) are only stored one time.
+
+    wxOpenGL.save_scene('project.wxgl', canvas)
+
+    objects = wxOpenGL.load_scene('project.wxgl', canvas)
+"""
+
+from typing import TYPE_CHECKING
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .errors import SceneFileError
+from . import gl_materials as _glm
+from . import debug as _debug
+from .geometry import point as _point
+from .geometry import angle as _angle
+from .objects import base3d as _base3d
+from .objects import mesh_model as _mesh_model
+from .objects import mesh_generic as _mesh_generic
+from .objects import mesh_assembly as _mesh_assembly
+
+if TYPE_CHECKING:
+    from . import Canvas as _Canvas
+    from . import scene as _scene
+
+
+MAGIC = b'WXGLSCN\x00'
+VERSION = 1
+
+# magic, version, reserved, metadata offset, metadata size
+_HEADER = struct.Struct('<8sIIQQ')
+_ALIGNMENT = 64
+
+
+class _Writer:
+
+    def __init__(self, f):
+        self._f = f
+        self._arrays = {}
+        self._sections = []
+
+    def _pad(self):
+        remainder = self._f.tell() % _ALIGNMENT
+        if remainder:
+            self._f.write(b'\x00' * (_ALIGNMENT - remainder))
+
+    def add(self, array: np.ndarray) -> int:
+        key = id(array)
+
+        if key in self._arrays:
+            return self._arrays[key][0]
+
+        index = len(self._sections)
+        # keeps the array alive so the id doesn't get reused
+        self._arrays[key] = (index, array)
+
+        data = np.ascontiguousarray(array)
+
+        self._pad()
+        self._sections.append(dict(
+            offset=self._f.tell(),
+            dtype=data.dtype.str,
+            shape=list(data.shape)
+        ))
+        self._f.write(memoryview(data).cast('B'))
+
+        return index
+
+    @property
+    def sections(self) -> list[dict]:
+        return self._sections
+
+
+def _save_material(material: _glm.GLMaterial) -> dict:
+    return dict(
+        type=type(material).__name__,
+        color=[float(item) for item in material._color],  # NOQA
+        x_ray=material.x_ray,
+        x_ray_color=[float(item) for item in material.x_ray_color]
+    )
+
+
+def _load_material(data: dict) -> _glm.GLMaterial:
+    cls = getattr(_glm, data['type'], None)
+
+    if not isinstance(cls, type) or not issubclass(cls, _glm.GLMaterial):
+        cls = _glm.GenericMaterial
+
+    material = cls(data['color'])
+    material.x_ray = data['x_ray']
+    material.x_ray_color = data['x_ray_color']
+
+    return material
+
+
+class _Table:
+    # stores items that can be shared by more than one object one time
+
+    def __init__(self, func):
+        self._func = func
+        self._items = {}
+        self.values = []
+
+    def add(self, item) -> int:
+        key = id(item)
+        if key not in self._items:
+            self._items[key] = (len(self.values), item)
+            self.values.append(self._func(item))
+
+        return self._items[key][0]
+
+
+def _as_list(point: _point.Point) -> list[float]:
+    return [float(item) for item in point.as_float]
+
+
+def _save_object(obj: _base3d.Base3D, writer: _Writer, materials: _Table,
+                 positions: _Table, angles: _Table, assemblies: _Table) -> dict:
+
+    meshes = []
+    for items in obj._mesh:  # NOQA
+        meshes.append([writer.add(np.asarray(item)) for item in items[:2]] +
+                      [int(item) for item in items[2:]])
+
+    built = []
+    for renderer in obj.triangles:
+        for item in renderer.data:
+            record = dict(
+                arrays=[writer.add(item[0]), writer.add(item[1])],
+                count=int(item[2])
+            )
+
+            if len(item) == 4:
+                record['matrix'] = np.asarray(item[3], dtype=np.float64).ravel().tolist()
+
+            built.append(record)
+
+    rect = [[_as_list(p1), _as_list(p2)] for p1, p2 in obj.rect]
+
+    res = dict(
+        type=type(obj).__name__,
+        material=materials.add(obj._material),  # NOQA
+        selected_material=materials.add(obj._selected_material),  # NOQA
+        selected=obj.is_selected,
+        smooth=obj.smooth,
+        crease_angle=obj.crease_angle,
+        compact=obj.compact,
+        reduce_settings=obj._reduce_settings,  # NOQA
+        position=positions.add(obj.position),
+        angle=angles.add(obj.angle),
+        meshes=meshes,
+        built=built,
+        rect=rect
+    )
+
+    if isinstance(obj, _mesh_model.MeshModel) and obj._model_data is not None:  # NOQA
+        res['file'] = obj._model_data.file  # NOQA
+
+    if isinstance(obj, _mesh_assembly.AssemblyPart):
+        res['assembly'] = assemblies.add(obj.assembly)
+        res['name'] = obj.name
+        res['path'] = list(obj.path)
+        res['matrix'] = np.asarray(obj.matrix, dtype=np.float64).ravel().tolist()
+
+    return res
+
+
+def _save_assembly(assembly: _mesh_assembly.MeshAssembly) -> dict:
+    data = assembly._assembly_data  # NOQA
+
+    return dict(
+        file=None if data is None else data.file,
+        unique_mesh_count=assembly.unique_mesh_count
+    )
+
+
+@_debug.logfunc
+def save(file: str | os.PathLike, objects: "_Canvas | _scene.Scene | list[_base3d.Base3D]"):
+    """
+    Save objects to a scene file.
+
+    `objects` is either a list of objects or a canvas/scene, in which case
+    all of the objects in it are saved. The file gets written to a temporary
+    file first and then moved into place so an existing file is never left
+    half written.
+    """
+    if not isinstance(objects, (list, tuple)):
+        objects = objects.objects
+
+    # the focal point and anything else that belongs to a single canvas
+    # is not part of the scene
+    objects = [obj for obj in objects if isinstance(obj, _base3d.Base3D) and
+               not getattr(obj, 'canvas_local', False)]
+
+    file = os.fspath(file)
+    temp_file = file + '.tmp'
+
+    materials = _Table(_save_material)
+    positions = _Table(_as_list)
+    angles = _Table(lambda a: [float(item) for item in a.as_quat])
+    assemblies = _Table(_save_assembly)
+
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(b'\x00' * _HEADER.size)
+
+            writer = _Writer(f)
+            records = [_save_object(obj, writer, materials, positions, angles, assemblies)
+                       for obj in objects]
+
+            metadata = json.dumps(dict(
+                sections=writer.sections,
+                materials=materials.values,
+                positions=positions.values,
+                angles=angles.values,
+                assemblies=assemblies.values,
+                objects=records
+            )).encode('utf-8')
+
+            offset = f.tell()
+            f.write(metadata)
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, offset, len(metadata)))
+
+        os.replace(temp_file, file)
+    except:  # NOQA
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def _read_header(file: str) -> tuple[int, int]:
+    with open(file, 'rb') as f:
+        header = f.read(_HEADER.size)
+
+    if len(header) != _HEADER.size:
+        raise SceneFileError(f'"{file}" is not a scene file')
+
+    magic, version, _, offset, size = _HEADER.unpack(header)
+
+    if magic != MAGIC:
+        raise SceneFileError(f'"{file}" is not a scene file')
+
+    if version > VERSION:
+        raise SceneFileError(f'"{file}" was saved with a newer version ({version})')
+
+    return offset, size
+
+
+def _load_assembly(canvas, data: dict, position: _point.Point,
+                   angle: _angle.Angle) -> _mesh_assembly.MeshAssembly:
+
+    assembly = _mesh_assembly.MeshAssembly.__new__(_mesh_assembly.MeshAssembly)
+    assembly.canvas = canvas
+    assembly._position = position  # NOQA
+    assembly._angle = angle  # NOQA
+    assembly._assembly_data = None  # NOQA
+    assembly._unique_mesh_count = data['unique_mesh_count']  # NOQA
+    assembly._shared_meshes = {}  # NOQA
+    assembly._shared_tris = {}  # NOQA
+
+    position.bind(assembly._update_position)  # NOQA
+    assembly._parts = []  # NOQA
+
+    return assembly
+
+
+_TYPES = {
+    'MeshModel': _mesh_model.MeshModel,
+    'MeshGeneric': _mesh_generic.MeshGeneric,
+    'AssemblyPart': _mesh_assembly.AssemblyPart
+}
+
+
+@_debug.logfunc
+def load(file: str | os.PathLike, canvas: "_Canvas | _scene.Scene") -> list[_base3d.Base3D]:
+    """
+    Load the objects in a scene file into a canvas or a scene.
+
+    Objects of classes that are not part of wxOpenGL come back as
+    `MeshGeneric` objects.
+    """
+    file = os.fspath(file)
+    offset, size = _read_header(file)
+
+    # copy on write, changes to the arrays are never written to the file
+    buffer = np.memmap(file, dtype=np.uint8, mode='c')
+
+    try:
+        metadata = json.loads(bytes(buffer[offset:offset + size]).decode('utf-8'))
+    except ValueError as err:
+        raise SceneFileError(f'"{file}" is damaged') from err
+
+    arrays = []
+    for section in metadata['sections']:
+        dtype = np.dtype(section['dtype'])
+        shape = tuple(section['shape'])
+        start = section['offset']
+        stop = start + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+        arrays.append(buffer[start:stop].view(dtype).reshape(shape))
+
+    materials = [_load_material(item) for item in metadata['materials']]
+    positions = [_point.Point(*item) for item in metadata['positions']]
+    angles = [_angle.Angle.from_quat(item) for item in metadata['angles']]
+
+    assemblies = []
+    res = []
+
+    with canvas:
+        for record in metadata['objects']:
+            position = positions[record['position']]
+            angle = angles[record['angle']]
+
+            data = [[arrays[mesh[0]], arrays[mesh[1]]] + mesh[2:]
+                    for mesh in record['meshes']]
+
+            built = []
+            for item, (p1, p2) in zip(record['built'], record['rect']):
+                render = [arrays[item['arrays'][0]], arrays[item['arrays'][1]], item['count']]
+                if 'matrix' in item:
+                    render.append(np.array(item['matrix'], dtype=np.float64).reshape(4, 4))
+
+                built.append([render, _point.Point(*p1), _point.Point(*p2)])
+
+            cls = _TYPES.get(record['type'], _mesh_generic.MeshGeneric)
+            obj = cls.__new__(cls)
+
+            if cls is _mesh_model.MeshModel:
+                obj._model_data = None  # NOQA
+                obj._stream_thread = None  # NOQA
+                obj._stream_cancel = False  # NOQA
+                obj._stream_error = None  # NOQA
+                obj._solids = []  # NOQA
+            elif cls is _mesh_assembly.AssemblyPart:
+                index = record['assembly']
+
+                while len(assemblies) <= index:
+                    assemblies.append(None)
+
+                if assemblies[index] is None:
+                    assemblies[index] = _load_assembly(
+                        canvas, metadata['assemblies'][index], position, angle)
+
+                obj.assembly = assemblies[index]
+                obj.name = record['name']
+                obj.path = tuple(record['path'])
+                obj.matrix = np.array(record['matrix'], dtype=np.float64).reshape(4, 4)
+                obj.assembly._parts.append(obj)  # NOQA
+
+            _base3d.Base3D.__init__(
+                obj, canvas, materials[record['material']],
+                materials[record['selected_material']], record['smooth'],
+                data, position, angle, built, record['crease_angle'])
+
+            obj._compact = record['compact']  # NOQA
+            obj._reduce_settings = record['reduce_settings']  # NOQA
+
+            if record['selected']:
+                obj.set_selected(True)
+
+            res.append(obj)
+
+    canvas.Refresh(False)
+
+    return res
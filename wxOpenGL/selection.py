@@ -0,0 +1,422 @@
+"""
+Box and lasso selection.
+
+Holding shift and dragging with the left mouse button draws a box, holding
+shift and control draws a lasso. What gets selected depends on the
+direction of the drag, the same way most CAD programs do it:
+
+    left to right   window, only objects that are completely inside
+    right to left   crossing, objects that are inside or are touching
+
+A lasso uses crossing when `Config.selection.lasso_crossing` is set.
+
+The bounding box corners of every object are stacked into one array and
+projected to the screen with a single matrix multiply, the classification
+is done on the whole array as well so there are no per object python loops
+other than collecting the boxes, and that only happens when the scene
+changes. With `Config.selection.precise` the objects that the boxes say are
+touching get checked again using the vertices of their meshes, a box can
+touch the selection without the part inside of it doing so.
+
+The lasso test treats an object as touching when one of its corners is in
+the lasso or a point of the lasso is inside of the object on screen.
+"""
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from OpenGL import GL
+
+from . import config as _config
+from . import debug as _debug
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+
+
+Config = _config.Config
+
+OUTSIDE = 0
+CROSSING = 1
+INSIDE = 2
+
+# lasso points closer than this (pixels) to the previous one are dropped
+_LASSO_SPACING = 3.0
+
+
+class _Boxes:
+    # the bounding boxes of every object in the scene stacked together
+
+    def __init__(self, objects: list):
+        self.objects = objects
+
+        corners = []
+        owners = []
+
+        for index, obj in enumerate(objects):
+            for bb in obj.bb:
+                corners.append(bb)
+                owners.append(index)
+
+        self.corners = np.array(corners, dtype=np.float64).reshape(-1, 8, 3)
+        self.owners = np.array(owners, dtype=np.int64)
+        self.part_count = np.bincount(self.owners, minlength=len(objects))
+
+
+def project(points: np.ndarray, matrix: np.ndarray,
+            viewport) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project world points to window coordinates (top left origin).
+
+    `matrix` is projection @ modelview for column vectors. Returns the
+    (..., 2) window coordinates and a mask of the points that are in front
+    of the camera.
+    """
+    vx, vy, vw, vh = (float(item) for item in viewport)
+
+    clip = points @ matrix[:3, :3].T + matrix[:3, 3]
+    w = points @ matrix[3, :3] + matrix[3, 3]
+
+    in_front = w > 1e-9
+    w = np.where(in_front, w, 1.0)
+
+    res = np.empty(points.shape[:-1] + (2,), dtype=np.float64)
+    res[..., 0] = vx + (clip[..., 0] / w + 1.0) * vw * 0.5
+    res[..., 1] = vh - (vy + (clip[..., 1] / w + 1.0) * vh * 0.5)
+
+    return res, in_front
+
+
+class PolygonMask:
+    """
+    A polygon filled in on a pixel grid.
+
+    Testing every point against every edge of a lasso is points x edges
+    work, with 10,000 objects and a few hundred lasso points that is too
+    slow to do while dragging. The polygon gets filled in one row of pixels
+    at a time instead (rows x edges work) and testing a point is then just
+    looking up the pixel it is in.
+    """
+
+    def __init__(self, polygon: np.ndarray):
+        self.polygon = polygon
+
+        x0, y0 = np.floor(polygon.min(axis=0))
+        x1, y1 = np.ceil(polygon.max(axis=0))
+        self.x0 = x0
+        self.y0 = y0
+
+        width = int(x1 - x0) + 1
+        height = int(y1 - y0) + 1
+
+        # pixel centers of every row
+        y = y0 + np.arange(height, dtype=np.float64)[:, None] + 0.5
+
+        px1 = polygon[:, 0]
+        py1 = polygon[:, 1]
+        px2 = np.roll(px1, -1)
+        py2 = np.roll(py1, -1)
+
+        straddles = (py1 > y) != (py2 > y)
+        dy = np.where(py2 == py1, 1e-12, py2 - py1)
+        cross_x = px1 + (y - py1) * (px2 - px1) / dy
+
+        rows, edges = np.nonzero(straddles)
+        # every edge flips the pixels that are to the right of it
+        cols = np.floor(cross_x[rows, edges] - x0 - 0.5).astype(np.int64) + 1
+        cols = np.clip(cols, 0, width)
+
+        flips = np.zeros((height, width + 1), dtype=np.int32)
+        np.add.at(flips, (rows, cols), 1)
+
+        self.mask = (np.cumsum(flips, axis=1)[:, :width] % 2) == 1
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        cols = np.floor(points[..., 0] - self.x0).astype(np.int64)
+        rows = np.floor(points[..., 1] - self.y0).astype(np.int64)
+
+        height, width = self.mask.shape
+        valid = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+
+        res = np.zeros(points.shape[:-1], dtype=bool)
+        res[valid] = self.mask[rows[valid], cols[valid]]
+
+        return res
+
+
+def _region_test(points: np.ndarray, rect: tuple | None, mask: PolygonMask | None) -> np.ndarray:
+    if mask is None:
+        x1, y1, x2, y2 = rect
+        return ((points[..., 0] >= x1) & (points[..., 0] <= x2) &
+                (points[..., 1] >= y1) & (points[..., 1] <= y2))
+
+    return mask.contains(points)
+
+
+def classify_boxes(corners: np.ndarray, matrix: np.ndarray, viewport,
+                   rect: tuple | None = None, polygon: np.ndarray | None = None,
+                   mask: PolygonMask | None = None) -> np.ndarray:
+    """
+    Classify (M, 8, 3) box corners against a screen rectangle
+    (x1, y1, x2, y2) or a polygon. Returns OUTSIDE, CROSSING or INSIDE for
+    every box.
+    """
+    if not len(corners):
+        return np.zeros(0, dtype=np.int8)
+
+    if polygon is not None and mask is None:
+        mask = PolygonMask(polygon)
+
+    screen, in_front = project(corners, matrix, viewport)
+
+    if polygon is not None:
+        rx1, ry1 = polygon.min(axis=0)
+        rx2, ry2 = polygon.max(axis=0)
+    else:
+        rx1, ry1, rx2, ry2 = rect
+
+    # boxes that are partly behind the camera cover an unknown part of the
+    # screen, they can touch the selection but are never inside of it
+    big = np.float64(1e12)
+    low = np.where(in_front[..., None], screen, big).min(axis=1)
+    high = np.where(in_front[..., None], screen, -big).max(axis=1)
+    partly_behind = ~in_front.all(axis=1)
+    low[partly_behind] = -big
+    high[partly_behind] = big
+
+    any_front = in_front.any(axis=1)
+    overlaps = (any_front & (low[:, 0] <= rx2) & (high[:, 0] >= rx1) &
+                (low[:, 1] <= ry2) & (high[:, 1] >= ry1))
+
+    res = np.zeros(len(corners), dtype=np.int8)
+    if not np.any(overlaps):
+        return res
+
+    if polygon is None:
+        inside = overlaps & ~partly_behind & (low[:, 0] >= rx1) & (high[:, 0] <= rx2) & \
+                 (low[:, 1] >= ry1) & (high[:, 1] <= ry2)
+        res[overlaps] = CROSSING
+        res[inside] = INSIDE
+        return res
+
+    candidates = np.nonzero(overlaps)[0]
+    corner_in = _region_test(screen[candidates], None, mask) & in_front[candidates]
+
+    inside = corner_in.all(axis=1) & ~partly_behind[candidates]
+
+    # a lasso that is drawn inside of a large box doesn't have any of the
+    # corners in it
+    vertex_in = ((polygon[None, :, 0] >= low[candidates, 0:1]) &
+                 (polygon[None, :, 0] <= high[candidates, 0:1]) &
+                 (polygon[None, :, 1] >= low[candidates, 1:2]) &
+                 (polygon[None, :, 1] <= high[candidates, 1:2])).any(axis=1)
+
+    crossing = corner_in.any(axis=1) | vertex_in
+
+    res[candidates[crossing]] = CROSSING
+    res[candidates[inside]] = INSIDE
+
+    return res
+
+
+def _mesh_vertices(obj) -> np.ndarray:
+    # world position of every vertex that gets drawn for the object
+    res = []
+
+    for renderer in obj.triangles:
+        for item in renderer.data:
+            if len(item) == 4:
+                positions, _, count, matrix = item
+                res.append(positions[:count, :3] @ matrix[:3, :3] + matrix[3, :3])
+            else:
+                tris, _, count = item[:3]
+                res.append(np.asarray(tris, dtype=np.float64).reshape(-1, 3)[:count])
+
+    if not res:
+        return np.zeros((0, 3), dtype=np.float64)
+
+    return np.concatenate(res)
+
+
+def _classify_precise(obj, matrix: np.ndarray, viewport, rect, mask) -> int:
+    vertices = _mesh_vertices(obj)
+    if not len(vertices):
+        return OUTSIDE
+
+    screen, in_front = project(vertices, matrix, viewport)
+    inside = _region_test(screen, rect, mask) & in_front
+
+    if inside.all():
+        return INSIDE
+
+    if inside.any():
+        return CROSSING
+
+    return OUTSIDE
+
+
+class Selector:
+    """
+    Finds the objects of a canvas that are in a box or a lasso.
+    """
+
+    def __init__(self, canvas: "_canvas.Canvas"):
+        self.canvas = canvas
+        self._boxes = None
+        self._boxes_key = None
+
+    def _get_boxes(self) -> _Boxes:
+        key = self.canvas.scene_version
+
+        if key != self._boxes_key:
+            objects = [obj for obj in self.canvas.objects if obj.bb and
+                       not getattr(obj, 'canvas_local', False)]
+
+            self._boxes = _Boxes(objects)
+            self._boxes_key = key
+
+        return self._boxes
+
+    @_debug.logfunc
+    def classify(self, rect: tuple | None = None,
+                 polygon: np.ndarray | None = None,
+                 precise: bool | None = None) -> tuple[list, np.ndarray]:
+        """
+        Returns the objects and OUTSIDE, CROSSING or INSIDE for each one.
+        """
+        camera = self.canvas.camera
+        if camera.view_matrix is None:
+            return [], np.zeros(0, dtype=np.int8)
+
+        if precise is None:
+            precise = Config.selection.precise
+
+        if rect is not None:
+            x1, y1, x2, y2 = rect
+            rect = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+        matrix = camera.view_projection_matrix
+        viewport = camera.viewport
+
+        mask = None if polygon is None else PolygonMask(polygon)
+
+        boxes = self._get_boxes()
+        parts = classify_boxes(boxes.corners, matrix, viewport, rect, polygon, mask)
+
+        # an object is inside when all of its parts are and is touching
+        # when any of them are
+        counts = np.bincount(boxes.owners, weights=parts == INSIDE,
+                             minlength=len(boxes.objects))
+        touching = np.bincount(boxes.owners, weights=parts != OUTSIDE,
+                               minlength=len(boxes.objects))
+
+        res = np.zeros(len(boxes.objects), dtype=np.int8)
+        res[touching > 0] = CROSSING
+        res[(counts == boxes.part_count) & (boxes.part_count > 0)] = INSIDE
+
+        if precise:
+            for index in np.nonzero(res == CROSSING)[0]:
+                res[index] = _classify_precise(boxes.objects[index], matrix, viewport, rect, mask)
+
+        return boxes.objects, res
+
+    def select(self, rect: tuple | None = None, polygon: np.ndarray | None = None,
+               crossing: bool = False, precise: bool | None = None) -> list:
+        objects, res = self.classify(rect, polygon, precise)
+        keep = res != OUTSIDE if crossing else res == INSIDE
+
+        return [obj for obj, flag in zip(objects, keep) if flag]
+
+
+class SelectionTool:
+    """
+    The box or lasso being dragged with the mouse.
+    """
+
+    def __init__(self, canvas: "_canvas.Canvas", x: int, y: int, lasso: bool):
+        self.canvas = canvas
+        self.is_lasso = lasso
+        self.points = [(float(x), float(y))]
+
+    def update(self, x: int, y: int):
+        point = (float(x), float(y))
+
+        if self.is_lasso:
+            last = self.points[-1]
+            if np.hypot(point[0] - last[0], point[1] - last[1]) < _LASSO_SPACING:
+                return
+
+            self.points.append(point)
+        else:
+            self.points[1:] = [point]
+
+        self.canvas.InvalidateLocal()
+        self.canvas.Refresh(False)
+
+    @property
+    def is_crossing(self) -> bool:
+        if self.is_lasso:
+            return Config.selection.lasso_crossing
+
+        # dragged right to left
+        return len(self.points) > 1 and self.points[1][0] < self.points[0][0]
+
+    def finish(self, add: bool = False) -> list:
+        self.canvas.InvalidateLocal()
+
+        if len(self.points) < 2 or (self.is_lasso and len(self.points) < 3):
+            self.canvas.Refresh(False)
+            return []
+
+        if self.is_lasso:
+            objects = self.canvas.selector.select(
+                polygon=np.array(self.points, dtype=np.float64), crossing=self.is_crossing)
+        else:
+            (x1, y1), (x2, y2) = self.points[:2]
+            objects = self.canvas.selector.select(rect=(x1, y1, x2, y2), crossing=self.is_crossing)
+
+        self.canvas.SetSelection(objects, add)
+        return objects
+
+    @_debug.logfunc
+    def draw(self, width: int, height: int):
+        if len(self.points) < 2:
+            return
+
+        if self.is_lasso:
+            points = self.points
+        else:
+            (x1, y1), (x2, y2) = self.points[:2]
+            points = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+        GL.glPushAttrib(GL.GL_ENABLE_BIT | GL.GL_LINE_BIT | GL.GL_CURRENT_BIT)
+        GL.glDisable(GL.GL_LIGHTING)
+        GL.glDisable(GL.GL_DEPTH_TEST)
+
+        if self.is_crossing:
+            # dashed for crossing, the same as most CAD programs
+            GL.glEnable(GL.GL_LINE_STIPPLE)
+            GL.glLineStipple(1, 0x00FF)
+
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glPushMatrix()
+        GL.glLoadIdentity()
+        GL.glOrtho(0.0, width, height, 0.0, -1.0, 1.0)
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+        GL.glPushMatrix()
+        GL.glLoadIdentity()
+
+        GL.glLineWidth(1.0)
+        GL.glColor4f(*Config.selection.color)
+
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glVertexPointer(2, GL.GL_DOUBLE, 0, np.array(points, dtype=np.float64))
+        GL.glDrawArrays(GL.GL_LINE_LOOP, 0, len(points))
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+
+        GL.glPopMatrix()
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glPopMatrix()
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+
+        GL.glPopAttrib()
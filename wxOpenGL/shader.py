@@ -0,0 +1,114 @@
+import numpy as np
+from OpenGL import GL
+
+from .errors import ShaderError
+from . import debug as _debug
+
+
+class ShaderProgram:
+    """
+    Small wrapper around a GLSL program.
+
+    The program is compiled lazily the first time it is used because a GL
+    context has to be current in order to compile it. Uniform locations are
+    cached so looking them up every frame doesn't cost a driver round trip.
+    """
+
+    def __init__(self, vertex_source: str, fragment_source: str):
+        self._vertex_source = vertex_source
+        self._fragment_source = fragment_source
+        self._program = None
+        self._locations = {}
+
+    @staticmethod
+    def _compile(source: str, shader_type) -> int:
+        shader = GL.glCreateShader(shader_type)
+        GL.glShaderSource(shader, source)
+        GL.glCompileShader(shader)
+
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            log = GL.glGetShaderInfoLog(shader)
+            GL.glDeleteShader(shader)
+
+            if isinstance(log, bytes):
+                log = log.decode('utf-8')
+
+            raise ShaderError(log)
+
+        return shader
+
+    @_debug.logfunc
+    def build(self) -> None:
+        if self._program is not None:
+            return
+
+        vertex = self._compile(self._vertex_source, GL.GL_VERTEX_SHADER)
+        try:
+            fragment = self._compile(self._fragment_source, GL.GL_FRAGMENT_SHADER)
+        except ShaderError:
+            GL.glDeleteShader(vertex)
+            raise
+
+        program = GL.glCreateProgram()
+        GL.glAttachShader(program, vertex)
+        GL.glAttachShader(program, fragment)
+        GL.glLinkProgram(program)
+
+        # the shaders are owned by the program once it is linked
+        GL.glDeleteShader(vertex)
+        GL.glDeleteShader(fragment)
+
+        if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+            log = GL.glGetProgramInfoLog(program)
+            GL.glDeleteProgram(program)
+
+            if isinstance(log, bytes):
+                log = log.decode('utf-8')
+
+            raise ShaderError(log)
+
+        self._program = program
+
+    @property
+    def program(self) -> int:
+        return self._program
+
+    def location(self, name: str) -> int:
+        try:
+            return self._locations[name]
+        except KeyError:
+            loc = GL.glGetUniformLocation(self._program, name)
+            self._locations[name] = loc
+            return loc
+
+    def set_int(self, name: str, value: int) -> None:
+        GL.glUniform1i(self.location(name), int(value))
+
+    def set_float(self, name: str, value: float) -> None:
+        GL.glUniform1f(self.location(name), float(value))
+
+    def set_vec2(self, name: str, x: float, y: float) -> None:
+        GL.glUniform2f(self.location(name), float(x), float(y))
+
+    def set_vec4(self, name: str, x: float, y: float, z: float, w: float) -> None:
+        GL.glUniform4f(self.location(name), float(x), float(y), float(z), float(w))
+
+    def set_matrix(self, name: str, matrix) -> None:
+        # matrices in this library are row-major numpy arrays so we have
+        # OpenGL do the transpose for us.
+        GL.glUniformMatrix4fv(self.location(name), 1, GL.GL_TRUE,
+                              np.asarray(matrix, dtype=np.float32))
+
+    def __enter__(self) -> "ShaderProgram":
+        self.build()
+        GL.glUseProgram(self._program)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        GL.glUseProgram(0)
+
+    def delete(self) -> None:
+        if self._program is not None:
+            GL.glDeleteProgram(self._program)
+            self._program = None
+            self._locations.clear()
@@ -0,0 +1,146 @@
+"""
+View dependent refinement of B-rep models.
+
+Models are first tessellated using `model_loader.TessellationPolicy` which
+keeps the whole model to a triangle budget. When the camera gets close to a
+solid the triangles may be large enough to see, when that happens the solid
+gets tessellated again in a background thread using a deflection that keeps
+the error under `Config.tessellation.pixel_error` pixels. The OCP shape from
+the original load is used so the file doesn't get read again.
+
+Only `MeshModel` objects made with `refine=True` take part in this. Solids
+are only ever made finer, a solid that has been refined keeps the extra
+triangles when the camera moves away.
+"""
+
+from typing import TYPE_CHECKING
+
+import queue
+import threading
+import weakref
+
+import numpy as np
+import wx
+
+from . import config as _config
+from . import model_loader as _model_loader
+
+if TYPE_CHECKING:
+    from . import canvas as _canvas
+    from .objects import mesh_model as _mesh_model
+
+
+Config = _config.Config
+
+# a solid only gets tessellated again when the deflection it needs is at
+# least this many times finer than what it has, this keeps small camera
+# moves from queueing up work.
+_REFINE_FACTOR = 2.0
+
+_objects = weakref.WeakSet()
+_pending = set()
+_queue = queue.Queue()
+_worker = None
+
+
+def register(obj: "_mesh_model.MeshModel"):
+    _objects.add(obj)
+
+
+def unregister(obj: "_mesh_model.MeshModel"):
+    _objects.discard(obj)
+
+
+def _start_worker():
+    global _worker
+
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_run, daemon=True)
+        _worker.start()
+
+
+def update(canvas: "_canvas.Canvas", objects: list, viewport_height: int, fov: float):
+    """
+    Called by the canvas every frame with the objects that are in view.
+    """
+    if not Config.tessellation.refine or not _objects:
+        return
+
+    eye = canvas.camera.eye.as_numpy
+    policy = _model_loader.TessellationPolicy()
+    queued = False
+
+    for obj in objects:
+        if obj not in _objects:
+            continue
+
+        solids = obj.solids
+
+        for index, (p1, p2) in enumerate(obj.rect):
+            key = (id(obj), index)
+            if key in _pending:
+                continue
+
+            solid = solids[index]
+
+            p1 = p1.as_numpy
+            p2 = p2.as_numpy
+            distance = np.linalg.norm((p1 + p2) / 2.0 - eye) - np.linalg.norm(p2 - p1) / 2.0
+            # the camera can be inside of the bounding box
+            distance = max(float(distance), 0.1)
+
+            linear = policy.view_deflection(distance, viewport_height, fov)
+            linear = max(linear, solid.size * policy.min_deflection)
+
+            if linear * _REFINE_FACTOR > solid.linear:
+                continue
+
+            # the angle gets finer by the same amount
+            angular = max(solid.angular * linear / solid.linear, policy.angular_deflection)
+
+            _pending.add(key)
+            _queue.put((key, weakref.ref(obj), index, solid, linear, angular))
+            queued = True
+
+    if queued:
+        _start_worker()
+
+
+def _run():
+    while True:
+        key, ref, index, solid, linear, angular = _queue.get()
+        obj = ref()
+
+        if obj is None or obj not in _objects:
+            _pending.discard(key)
+            continue
+
+        try:
+            vertices, faces = _model_loader.tessellate(solid.shape, linear, angular)
+
+            if Config.mesh.optimize:
+                vertices, faces = _model_loader.optimize_mesh(vertices, faces)
+
+            built = obj._compute_mesh(vertices, faces)  # NOQA
+        except:  # NOQA
+            # leave the solid the way it is, it won't get tried again
+            solid.linear = 0.0
+            _pending.discard(key)
+            continue
+
+        wx.CallAfter(_apply, key, ref, index, solid, linear, angular, vertices, faces, built)
+
+
+def _apply(key, ref, index, solid, linear, angular, vertices, faces, built):
+    _pending.discard(key)
+
+    obj = ref()
+    if obj is None or obj not in _objects:
+        return
+
+    solid.vertices = vertices
+    solid.faces = faces
+    solid.linear = linear
+    solid.angular = angular
+
+    obj.replace_mesh(index, vertices, faces, built)
@@ -0,0 +1,372 @@
+"""
+Headless thumbnails of model files.
+
+Making preview images of a library of parts used to mean opening a canvas
+for every file. `render_thumbnails` renders them without any windows,
+spread across a pool of processes. Every process gets its own offscreen
+OpenGL context (OSMesa by default, see `Config.thumbnails.platform`) and
+renders with the same loader, normals and `TriangleRenderer` the canvas
+uses. Each part is framed from its bounding box.
+
+The images are named after a hash of the file contents and the settings
+they were rendered with. When the same files get rendered again only the
+files that changed (or the ones rendered with different settings) get
+rendered, the rest are already there.
+
+    results = wxOpenGL.render_thumbnails(files, 'thumbnails')
+
+    for result in results:
+        print(result.file, result.thumbnail, result.error)
+
+The processes are started with "spawn". The platform that PyOpenGL uses
+gets picked when it is first imported, that has to happen in the new
+process after `PYOPENGL_PLATFORM` has been set and can't happen in a fork
+of a process that already has a GUI running.
+"""
+
+from typing import Iterable
+
+import concurrent.futures
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from .errors import CaptureError
+from . import config as _config
+from . import debug as _debug
+
+
+Config = _config.Config
+
+# bumped when something changes that makes the old thumbnails look different
+VERSION = 2
+
+# narrow so the parts don't look distorted
+_FIELD_OF_VIEW = 30.0
+# direction the parts are looked at from, front right and above
+_VIEW_DIRECTION = np.array([1.0, 0.8, 1.2], dtype=np.float64)
+_VIEW_DIRECTION /= np.linalg.norm(_VIEW_DIRECTION)
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+class ThumbnailResult:
+    """
+    Outcome of rendering a single file.
+
+    `thumbnail` is the path to the image, it is `None` if the file could not
+    be rendered and `error` then holds the reason why. `cached` is set when
+    the image was already there from an earlier run.
+    """
+
+    def __init__(self, file: str, thumbnail: str | None, cached: bool, error: str | None):
+        self.file = file
+        self.thumbnail = thumbnail
+        self.cached = cached
+        self.error = error
+
+    def __repr__(self):
+        return (f'ThumbnailResult(file={self.file!r}, thumbnail={self.thumbnail!r}, '
+                f'cached={self.cached}, error={self.error!r})')
+
+
+# settings of this process that change how a model gets loaded, the worker
+# processes start out with the defaults so these get handed to them
+_LOAD_SETTINGS = dict(
+    mesh=dict(optimize=bool, weld_tolerance=float, crease_angle=float),
+    tessellation=dict(triangle_budget=int, min_deflection=float, max_deflection=float,
+                      angular_deflection=float, max_angular_deflection=float)
+)
+
+
+def _settings(width: int, height: int) -> dict:
+    # everything in here gets hashed and everything in here gets used by
+    # the workers, a thumbnail is only reused if it was made the same way
+    return dict(
+        version=VERSION,
+        width=width,
+        height=height,
+        supersample=int(Config.thumbnails.supersample),
+        margin=float(Config.thumbnails.margin),
+        color=[float(item) for item in Config.thumbnails.color],
+        background=[float(item) for item in Config.thumbnails.background],
+        load={section: {name: kind(getattr(getattr(Config, section), name))
+                        for name, kind in names.items()}
+              for section, names in _LOAD_SETTINGS.items()}
+    )
+
+
+def _apply_settings(settings: dict):
+    for section, values in settings['load'].items():
+        config = getattr(Config, section)
+
+        for name, value in values.items():
+            setattr(config, name, value)
+
+
+def file_hash(file: str, settings: dict | None = None) -> str:
+    """
+    Hash of the contents of a file and the settings it gets rendered with.
+    """
+    digest = hashlib.sha256()
+
+    with open(file, 'rb') as f:
+        while True:
+            block = f.read(_HASH_BLOCK_SIZE)
+            if not block:
+                break
+
+            digest.update(block)
+
+    if settings is not None:
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def _thumbnail_path(output_dir: str, file: str, digest: str) -> str:
+    name = os.path.splitext(os.path.basename(file))[0]
+    return os.path.join(output_dir, f'{name}-{digest[:16]}.png')
+
+
+# state of a worker process, every process has a single context that all of
+# the files it is handed get rendered with
+_context = None
+_buffer = None
+_size = (0, 0)
+
+
+def _init_worker(width: int, height: int, settings: dict):
+    global _context
+    global _buffer
+    global _size
+
+    _apply_settings(settings)
+
+    from OpenGL import GL
+    from OpenGL import arrays
+    from OpenGL import osmesa
+
+    _context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not _context:
+        raise CaptureError('unable to create an OSMesa context')
+
+    _buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(_context, _buffer, GL.GL_UNSIGNED_BYTE, width, height):
+        raise CaptureError('unable to make the OSMesa context current')
+
+    _size = (width, height)
+
+    # same lighting the canvas uses, the light sits at the camera
+    GL.glEnable(GL.GL_DEPTH_TEST)
+    GL.glEnable(GL.GL_LIGHTING)
+    GL.glShadeModel(GL.GL_SMOOTH)
+    GL.glColorMaterial(GL.GL_FRONT, GL.GL_AMBIENT_AND_DIFFUSE)
+    GL.glEnable(GL.GL_COLOR_MATERIAL)
+    GL.glEnable(GL.GL_NORMALIZE)
+
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_AMBIENT, [0.5, 0.5, 0.5, 1.0])
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_DIFFUSE, [0.6, 0.6, 0.6, 1.0])
+    GL.glLightfv(GL.GL_LIGHT0, GL.GL_SPECULAR, [0.5, 0.5, 0.5, 1.0])
+    GL.glEnable(GL.GL_LIGHT0)
+
+    GL.glViewport(0, 0, width, height)
+
+
+def _frame(low: np.ndarray, high: np.ndarray, aspect: float,
+           margin: float) -> tuple[np.ndarray, np.ndarray, float, float]:
+    # camera that fits the bounding sphere of the box into the view
+    center = (low + high) / 2.0
+    radius = max(float(np.linalg.norm(high - low)) / 2.0, 1e-6)
+
+    half_fov = math.radians(_FIELD_OF_VIEW) / 2.0
+    if aspect < 1.0:
+        # the horizontal field of view is the narrower one
+        half_fov = math.atan(math.tan(half_fov) * aspect)
+
+    distance = radius * margin / math.sin(half_fov)
+    eye = center + _VIEW_DIRECTION * distance
+
+    near = max(distance - radius * 1.5, distance * 1e-3)
+    far = distance + radius * 1.5
+
+    return eye, center, near, far
+
+
+def _render(file: str, thumbnail: str, settings: dict) -> ThumbnailResult:
+    try:
+        from OpenGL import GL
+        from OpenGL import GLU
+        from PIL import Image
+
+        from . import model_loader as _model_loader
+        from . import normals as _normals
+        from . import gl_materials as _glm
+        from .objects import base3d as _base3d
+
+        data = _model_loader.load(file)
+        data = [item for item in data if len(item[1])]
+
+        # same as `MeshModel`, only B-rep models get a crease angle
+        if _model_loader.is_brep_file(file):
+            crease_angle = settings['load']['mesh']['crease_angle']
+        else:
+            crease_angle = None
+
+        if not data:
+            return ThumbnailResult(file, None, False, 'file has no geometry')
+
+        low = np.min([vertices.min(axis=0) for vertices, _ in data], axis=0)
+        high = np.max([vertices.max(axis=0) for vertices, _ in data], axis=0)
+
+        renderer = _base3d.TriangleRenderer(
+            [list(_normals.smooth_normals(np.asarray(vertices, dtype=np.float64),
+                                          faces, crease_angle))
+             for vertices, faces in data],
+            _glm.GenericMaterial(settings['color']))
+
+        width, height = _size
+        eye, center, near, far = _frame(low, high, width / height, settings['margin'])
+
+        GL.glClearColor(*settings['background'])
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glLoadIdentity()
+        GLU.gluPerspective(_FIELD_OF_VIEW, width / height, near, far)
+
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+        GL.glLoadIdentity()
+        # light position is in eye space when the modelview is the identity
+        GL.glLightfv(GL.GL_LIGHT0, GL.GL_POSITION, [0.0, 0.0, 1.0, 0.0])
+        GLU.gluLookAt(*eye, *center, 0.0, 1.0, 0.0)
+
+        renderer()
+        GL.glFinish()
+
+        GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+        pixels = GL.glReadPixels(0, 0, width, height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+        pixels = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+
+        image = Image.fromarray(np.ascontiguousarray(np.flipud(pixels)), 'RGBA')
+
+        supersample = settings['supersample']
+        if supersample > 1:
+            image = image.reduce(supersample)
+
+        # written under a temporary name so an image that is cut short by a
+        # crash never gets mistaken for a finished one
+        temp_file = thumbnail + '.tmp'
+        image.save(temp_file, format='png')
+        os.replace(temp_file, thumbnail)
+    except Exception as err:  # NOQA
+        return ThumbnailResult(file, None, False, f'{type(err).__name__}: {err}')
+
+    return ThumbnailResult(file, thumbnail, False, None)
+
+
+class _Platform:
+    # PYOPENGL_PLATFORM has to be in the environment when the worker
+    # processes get started, they copy the environment of this process
+
+    def __init__(self, platform: str):
+        self._platform = platform
+        self._saved = None
+
+    def __enter__(self):
+        self._saved = os.environ.get('PYOPENGL_PLATFORM', None)
+        os.environ['PYOPENGL_PLATFORM'] = self._platform
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._saved is None:
+            del os.environ['PYOPENGL_PLATFORM']
+        else:
+            os.environ['PYOPENGL_PLATFORM'] = self._saved
+
+
+@_debug.logfunc
+def render_thumbnails(files: Iterable[str | os.PathLike], output_dir: str | os.PathLike,
+                      size: int | tuple[int, int] | None = None,
+                      processes: int | None = None) -> list[ThumbnailResult]:
+    """
+    Render a PNG thumbnail of every file into `output_dir`.
+
+    `size` is the size of the images, a single number makes square images.
+    It defaults to `Config.thumbnails.size`. `processes` defaults to
+    `Config.thumbnails.processes`, 0 uses one process per CPU.
+
+    Files whose thumbnail is already in `output_dir` are not rendered again.
+    The results are in the same order as `files`.
+    """
+    if size is None:
+        size = Config.thumbnails.size
+
+    if isinstance(size, (int, float)):
+        width = height = int(size)
+    else:
+        width, height = (int(item) for item in size)
+
+    output_dir = os.fspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    settings = _settings(width, height)
+    supersample = max(1, settings['supersample'])
+
+    results = []
+    pending = []
+
+    for file in files:
+        file = os.path.abspath(os.fspath(file))
+
+        try:
+            digest = file_hash(file, settings)
+        except OSError as err:
+            results.append(ThumbnailResult(file, None, False, f'{type(err).__name__}: {err}'))
+            continue
+
+        thumbnail = _thumbnail_path(output_dir, file, digest)
+
+        if os.path.exists(thumbnail):
+            results.append(ThumbnailResult(file, thumbnail, True, None))
+        else:
+            results.append(None)
+            pending.append((len(results) - 1, file, thumbnail))
+
+    if not pending:
+        return results
+
+    if processes is None:
+        processes = Config.thumbnails.processes
+
+    if processes <= 0:
+        processes = os.cpu_count() or 1
+
+    processes = min(processes, len(pending))
+
+    with _Platform(Config.thumbnails.platform):
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(width * supersample, height * supersample, settings)
+        ) as executor:
+
+            futures = {executor.submit(_render, file, thumbnail, settings): (index, file)
+                       for index, file, thumbnail in pending}
+
+            for future in concurrent.futures.as_completed(futures):
+                index, file = futures[future]
+
+                try:
+                    results[index] = future.result()
+                except Exception as err:  # NOQA
+                    # the worker process died (a crash in the loader or
+                    # the context could not be made)
+                    results[index] = ThumbnailResult(file, None, False,
+                                                     f'{type(err).__name__}: {err}')
+
+    return results
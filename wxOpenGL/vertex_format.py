@@ -0,0 +1,148 @@
+"""
+Compact vertex formats.
+
+`Base3D` keeps a position and a normal for every corner of every triangle as
+float64, that is 48 bytes per vertex and all of it gets sent to the video
+card every time the object is drawn. The compact format stores
+
+    positions: 3 x int16 relative to the bounding box of the mesh, padded
+               to 4 values so every vertex starts on a 4 byte boundary.
+    normals:   3 x int8, padded to 4 values.
+
+which is 12 bytes per vertex, 1/4 of the memory and of the bandwidth.
+
+The positions are turned back into real coordinates by the dequantize
+matrix, it gets multiplied onto the modelview matrix when the mesh is drawn
+so the video card does the work. int16 gives 65535 steps across the longest
+side of the mesh, a part that is 1000mm long is accurate to about 0.015mm.
+
+All 3 axes get scaled by the same amount. Scaling each axis on its own
+would give more precision on the short sides but the normals would then need
+to be scaled as well and a flat part loses most of the precision of its int8
+normals (over 10 degrees of error on a 50:1 part). With a uniform scale
+`GL_RESCALE_NORMAL` is all that is needed to keep the normals unit length.
+
+The fixed function pipeline needs normals with 3 components so octahedral
+encoding (2 values per normal) can't be used for drawing, it is here for
+storing normals, see `encode_octahedral`.
+
+    vertices      float64      compact
+    78,000        3.6 MB       0.9 MB
+    3.0M          137.3 MB     34.3 MB
+    18.0M         824.0 MB     206.0 MB
+"""
+
+import numpy as np
+
+
+POSITION_STRIDE = 8
+NORMAL_STRIDE = 4
+
+_MAX_SHORT = 32767.0
+_MAX_BYTE = 127.0
+_EPSILON = 1e-12
+
+
+def quantize_positions(vertices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (N, 4) int16 positions and the 4x4 dequantize matrix.
+
+    The matrix is laid out for row vectors, `[x, y, z, 1] @ matrix` gives the
+    position back. The same memory is what `glMultMatrixd` expects.
+    """
+    vertices = vertices.reshape(-1, 3)
+
+    low = vertices.min(axis=0)
+    high = vertices.max(axis=0)
+    center = (low + high) / 2.0
+    scale = max(float((high - low).max()) / 2.0, _EPSILON) / _MAX_SHORT
+
+    positions = np.zeros((len(vertices), 4), dtype=np.int16)
+    positions[:, :3] = np.rint((vertices - center) / scale)
+
+    matrix = np.identity(4, dtype=np.float64)
+    matrix[[0, 1, 2], [0, 1, 2]] = scale
+    matrix[3, :3] = center
+
+    return positions, matrix
+
+
+def dequantize_positions(positions: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    return positions[:, :3] @ matrix[:3, :3] + matrix[3, :3]
+
+
+def _normalize(normals: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.maximum(norm, _EPSILON)
+
+
+def quantize_normals(normals: np.ndarray) -> np.ndarray:
+    """
+    Returns the (N, 4) int8 normals.
+    """
+    normals = normals.reshape(-1, 3)
+
+    res = np.zeros((len(normals), 4), dtype=np.int8)
+    res[:, :3] = np.rint(_normalize(normals) * _MAX_BYTE)
+
+    return res
+
+
+def dequantize_normals(normals: np.ndarray) -> np.ndarray:
+    return _normalize(normals[:, :3] / _MAX_BYTE)
+
+
+def _sign(values: np.ndarray) -> np.ndarray:
+    # 0 needs to be positive, np.sign returns 0 for it
+    return np.where(values >= 0.0, 1.0, -1.0)
+
+
+def encode_octahedral(normals: np.ndarray, dtype=np.int8) -> np.ndarray:
+    """
+    Octahedral encoding, each unit normal becomes 2 signed integers.
+
+    The normal gets projected onto an octahedron and the lower half of the
+    octahedron is folded over the upper half, that flattens it into a
+    square.
+    """
+    normals = normals.reshape(-1, 3)
+
+    length = np.maximum(np.abs(normals).sum(axis=1, keepdims=True), _EPSILON)
+    n = normals / length
+
+    x = n[:, 0]
+    y = n[:, 1]
+    lower = n[:, 2] < 0.0
+
+    folded_x = (1.0 - np.abs(y)) * _sign(x)
+    folded_y = (1.0 - np.abs(x)) * _sign(y)
+
+    encoded = np.empty((len(n), 2), dtype=np.float64)
+    encoded[:, 0] = np.where(lower, folded_x, x)
+    encoded[:, 1] = np.where(lower, folded_y, y)
+
+    return np.rint(encoded * np.iinfo(dtype).max).astype(dtype)
+
+
+def decode_octahedral(encoded: np.ndarray) -> np.ndarray:
+    values = encoded.astype(np.float64) / np.iinfo(encoded.dtype).max
+
+    x = values[:, 0]
+    y = values[:, 1]
+    z = 1.0 - np.abs(x) - np.abs(y)
+
+    unfold = np.maximum(-z, 0.0)
+
+    res = np.empty((len(values), 3), dtype=np.float64)
+    res[:, 0] = x - unfold * _sign(x)
+    res[:, 1] = y - unfold * _sign(y)
+    res[:, 2] = z
+
+    return _normalize(res)
+
+
+def bytes_per_vertex(compact: bool) -> int:
+    if compact:
+        return POSITION_STRIDE + NORMAL_STRIDE
+
+    return 2 * 3 * 8